@@ -3,6 +3,17 @@ ASGI config for adoptaapi project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Besides the regular API, this entry point serves the live peticion events
+(``/api/peticiones/eventos/``, see peticiones.eventos), which need a server
+that keeps many idle connections open cheaply, e.g.::
+
+    uvicorn adoptaapi.asgi:application
+
+Requests served here are resolved with ASGI_URLCONF, which routes the animal
+and peticion list/retrieve actions to their async versions (see
+adoptaapi.asincrono). Compare against gunicorn with
+``python manage.py bench_servidores``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
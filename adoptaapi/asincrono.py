@@ -0,0 +1,223 @@
+"""
+Vistas asíncronas para los listados de lectura más usados, bajo ASGI.
+
+DRF es síncrono: con uvicorn cada petición a un ViewSet se ejecuta en el único
+hilo de `sync_to_async(thread_sensitive=True)`, así que las peticiones
+concurrentes se atienden de una en una. `AsyncReadMixin` añade al ViewSet
+versiones asíncronas de algunas acciones (`alist`, `aretrieve`, `a<accion>`)
+que recorren el mismo ciclo de DRF (autenticación, permisos, ETag, réplica,
+filtros, paginación, serializador) pero consultan la base de datos con el ORM
+asíncrono; el resto (cálculo del ETag, serialización, render JSON) es Python
+puro y se queda en el bucle de eventos. Tampoco se usa la caché síncrona: las
+versiones para el ETag y la réplica se leen antes con `aget_versiones` y las
+vistas usan `cache.aget`/`aset`, porque con Redis serían llamadas de red
+bloqueando el bucle.
+
+Solo el servidor ASGI las usa: `AsgiUrlconfMiddleware` cambia la URLconf de
+las peticiones ASGI a ASGI_URLCONF, donde estas rutas van delante de las de
+siempre. Bajo WSGI (gunicorn) nada cambia. Los métodos distintos de GET/HEAD
+que lleguen a una ruta asíncrona se pasan a la vista síncrona de ROOT_URLCONF.
+
+Las acciones asíncronas no pueden tocar el ORM síncrono (Django lanza
+SynchronousOnlyOperation): los querysets se construyen igual que en la versión
+síncrona y solo se evalúan con `async for` / `aget`.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse
+from django.urls import path, re_path, resolve
+from django.utils.decorators import sync_and_async_middleware
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .condicional import ConditionalGetMixin
+from .routers import REPLICA, _usar_replica
+from .versiones import aget_versiones
+
+
+class AsyncReadMixin:
+    """
+    Mixin para ViewSets con acciones de lectura asíncronas. Cada acción de
+    `async_actions` necesita un método `a<accion>`; `alist` y `aretrieve` ya
+    están implementados a partir de get_queryset/filter_queryset.
+    """
+    async_actions = ('list', 'retrieve')
+
+    @classmethod
+    def as_async_view(cls, action, **initkwargs):
+        actions = {'get': action, 'head': action}
+
+        async def view(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await _vista_sincrona(request)
+            self = cls(**initkwargs)
+            self.action_map = actions
+            return await self.adispatch(request, *args, **kwargs)
+
+        view.cls = cls
+        view.initkwargs = initkwargs
+        view.actions = actions
+        return csrf_exempt(markcoroutinefunction(view))
+
+    async def adispatch(self, request, *args, **kwargs):
+        """dispatch() de APIView con la autenticación y la acción asíncronas."""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        self._replica_token = None
+        try:
+            await self._aautenticar(request)
+            # initial() comprueba los permisos antes de leer las versiones; aquí también
+            self.check_permissions(request)
+            await self._aprecargar_versiones()
+            self.initial(request, *args, **kwargs)
+            response = await getattr(self, f'a{self.action}')(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        finally:
+            if self._replica_token is not None:
+                _usar_replica.reset(self._replica_token)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return await _renderizar(self.response)
+
+    async def _aautenticar(self, request):
+        """Request._authenticate() con los autenticadores que saben hacerlo sin bloquear."""
+        for authenticator in request.authenticators:
+            try:
+                if hasattr(authenticator, 'aauthenticate'):
+                    user_auth_tuple = await authenticator.aauthenticate(request)
+                elif isinstance(authenticator, SessionAuthentication):
+                    user_auth_tuple = await _asesion(authenticator, request)
+                else:
+                    user_auth_tuple = await sync_to_async(authenticator.authenticate)(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+        request._not_authenticated()
+
+    async def _aprecargar_versiones(self):
+        """Versiones que leerán ConditionalGetMixin y ReadReplicaMixin (ver versiones_vista)."""
+        if not settings.VERSIONES_COMPARTIDAS or not hasattr(self, 'get_version_scopes'):
+            return
+        if not isinstance(self, ConditionalGetMixin) and REPLICA not in settings.DATABASES:
+            return
+        scopes = self.get_version_scopes()
+        if scopes:
+            self.versiones_precargadas = (scopes, await aget_versiones(*scopes))
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer([obj async for obj in queryset], many=True)
+        return Response(serializer.data)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        return Response(self.get_serializer(instance).data)
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        return await self.paginator.apaginate_queryset(queryset, self.request, view=self)
+
+    async def aget_object(self):
+        """get_object() de GenericAPIView con `aget`."""
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        filter_kwargs = {self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        try:
+            obj = await queryset.aget(**filter_kwargs)
+        except queryset.model.DoesNotExist:
+            raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+        except (TypeError, ValueError, ValidationError):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+
+async def _asesion(authenticator, request):
+    """SessionAuthentication.authenticate() leyendo el usuario con request.auser()."""
+    user = await request._request.auser()
+    if not user or not user.is_active:
+        return None
+    authenticator.enforce_csrf(request)
+    return (user, None)
+
+
+async def _vista_sincrona(request):
+    match = resolve(request.path_info, urlconf=settings.ROOT_URLCONF)
+    return await sync_to_async(match.func)(request, *match.args, **match.kwargs)
+
+
+async def _renderizar(response):
+    """
+    Renderiza la respuesta de DRF y la devuelve como HttpResponse: Django
+    renderizaría un TemplateResponse en un hilo. El JSON se renderiza aquí; el
+    API navegable puede consultar la base de datos y va a un hilo.
+    """
+    if not isinstance(response, Response):
+        return response
+    if isinstance(response.accepted_renderer, JSONRenderer):
+        response.render()
+    else:
+        await sync_to_async(response.render)()
+    http = HttpResponse(response.content, status=response.status_code)
+    for header, value in response.items():
+        http[header] = value
+    return http
+
+
+def rutas_asincronas(prefijo, viewset, basename):
+    """
+    URLs de las acciones asíncronas de `viewset` con el mismo formato que las
+    de DefaultRouter (`prefijo/`, `prefijo/<pk>/`, `prefijo/<url_path>/`, ...).
+    """
+    # Como en DefaultRouter, `prefijo/<url_path>/` de las acciones de listado no es un detalle
+    reservadas = '|'.join(accion.url_path for accion in viewset.get_extra_actions() if not accion.detail)
+    excluir = f'(?!(?:{reservadas})/$)' if reservadas else ''
+    lookup = f'(?P<{viewset.lookup_url_kwarg or viewset.lookup_field}>{excluir}[^/.]+)'
+    rutas = []
+    for accion in viewset.async_actions:
+        if accion == 'list':
+            rutas.append(path(f'{prefijo}/', viewset.as_async_view(accion, basename=basename, detail=False)))
+        elif accion == 'retrieve':
+            vista = viewset.as_async_view(accion, basename=basename, detail=True)
+            rutas.append(re_path(rf'^{prefijo}/{lookup}/$', vista))
+        else:
+            extra = getattr(viewset, accion)
+            vista = viewset.as_async_view(accion, basename=basename, detail=extra.detail, **extra.kwargs)
+            if extra.detail:
+                rutas.append(re_path(rf'^{prefijo}/{lookup}/{extra.url_path}/$', vista))
+            else:
+                rutas.append(path(f'{prefijo}/{extra.url_path}/', vista))
+    return rutas
+
+
+@sync_and_async_middleware
+def AsgiUrlconfMiddleware(get_response):
+    """Las peticiones servidas por ASGI se resuelven con ASGI_URLCONF."""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            request.urlconf = settings.ASGI_URLCONF
+            return await get_response(request)
+    else:
+        def middleware(request):
+            if isinstance(request, ASGIRequest):
+                request.urlconf = settings.ASGI_URLCONF
+            return get_response(request)
+    return middleware
@@ -0,0 +1,35 @@
+"""
+Comprobaciones de arranque (`manage.py check`) de la configuración del proyecto.
+"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+from .routers import REPLICA
+
+# Backends cuyo contenido no ven los demás procesos
+CACHES_LOCALES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def comprobar_versiones_compartidas(app_configs, **kwargs):
+    """Los contadores de adoptaapi.versiones tienen que verlos todos los workers."""
+    avisos = []
+    local = settings.CACHES['default']['BACKEND'] in CACHES_LOCALES
+    if settings.VERSIONES_COMPARTIDAS and local:
+        avisos.append(Warning(
+            'VERSIONES_COMPARTIDAS está activo con una caché local a cada proceso.',
+            hint='Con varios workers los ETags pueden responder 304 con datos antiguos y la réplica '
+                 'servir lecturas atrasadas. Configura REDIS_URL o ejecuta un único proceso.',
+            id='adoptaapi.W001',
+        ))
+    if REPLICA in settings.DATABASES and not settings.VERSIONES_COMPARTIDAS:
+        avisos.append(Warning(
+            'Hay una réplica configurada pero VERSIONES_COMPARTIDAS está desactivado: '
+            'todas las lecturas irán al primario.',
+            hint='Configura REDIS_URL para que los workers compartan los contadores de versión.',
+            id='adoptaapi.W002',
+        ))
+    return avisos
@@ -0,0 +1,66 @@
+"""
+GET condicionales (ETag / If-None-Match) para vistas DRF.
+
+El ETag de una respuesta se deriva de las versiones de los ámbitos de los que
+depende (ver adoptaapi.versiones), la URL y el formato, así que se calcula sin
+tocar la base de datos. Si el cliente envía el mismo ETag en If-None-Match, la
+vista responde 304 antes de consultar ni serializar nada.
+
+Sin VERSIONES_COMPARTIDAS no se emiten ETags: con contadores por proceso otro
+worker respondería 304 con datos ya modificados.
+"""
+import hashlib
+
+from django.conf import settings
+from django.http import HttpResponseNotModified
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+from .versiones import versiones_vista
+
+
+class _NoModificado(Exception):
+    pass
+
+
+class ConditionalGetMixin:
+    """
+    Mixin para APIView/ViewSet. Las vistas implementan `get_version_scopes()`
+    devolviendo los ámbitos cuya versión cambia cuando cambia la respuesta
+    (una tupla vacía desactiva el ETag) y deben incrementar esas versiones con
+    `bump()` en cada escritura que afecte a los datos.
+    """
+
+    def get_version_scopes(self):
+        return ()
+
+    def get_etag(self, request):
+        scopes = self.get_version_scopes()
+        if not scopes or not settings.VERSIONES_COMPARTIDAS:
+            return None
+        versiones = ':'.join(str(v) for v in versiones_vista(self, scopes))
+        base = f'{request.user.pk}|{request.accepted_renderer.format}|{request.get_full_path()}|{versiones}'
+        return f'W/"{hashlib.md5(base.encode()).hexdigest()}"'
+
+    def initial(self, request, *args, **kwargs):
+        # After authentication and permission checks, so 304s are never leaked
+        super().initial(request, *args, **kwargs)
+        self.etag = None
+        if request.method in ('GET', 'HEAD'):
+            self.etag = self.get_etag(request)
+            if self.etag and get_conditional_response(request, etag=self.etag) is not None:
+                raise _NoModificado()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, _NoModificado):
+            return HttpResponseNotModified()
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        etag = getattr(self, 'etag', None)
+        if etag and response.status_code in (200, 304):
+            response['ETag'] = etag
+            # Respuestas por usuario: solo caché del navegador, revalidando siempre
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ('Authorization', 'Cookie'))
+        return response
@@ -0,0 +1,93 @@
+"""
+Exportación en streaming (CSV o JSONL) de querysets grandes.
+
+Las filas se leen con `values_list(...).iterator(chunk_size=...)` y se
+escriben en la respuesta a medida que se generan, así que la memoria es
+constante aunque el historial tenga cientos de miles de filas.
+
+Bajo ASGI el cuerpo tiene que ser un iterador asíncrono: Django consumiría
+un iterador síncrono entero con `sync_to_async(list)` antes de enviar nada.
+"""
+import csv
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+FORMATOS = {'csv': 'text/csv; charset=utf-8', 'jsonl': 'application/x-ndjson'}
+CHUNK_SIZE = 2000
+
+
+class _Eco:
+    """Pseudo-fichero para csv.writer: devuelve la línea en lugar de escribirla."""
+
+    def write(self, valor):
+        return valor
+
+
+def _csv(columnas):
+    """Cabecera y función que convierte una fila en su línea CSV."""
+    writer = csv.writer(_Eco())
+    # BOM para que Excel abra bien los acentos
+    return ['\ufeff', writer.writerow(columnas)], writer.writerow
+
+
+def _jsonl(columnas):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    return [], lambda fila: encoder.encode(dict(zip(columnas, fila))) + '\n'
+
+
+# Un trozo por fila supondría una escritura al socket por fila: se agrupan `tamano` líneas
+def _en_bloques(filas, cabecera, linea, tamano):
+    bloque = list(cabecera)
+    for fila in filas:
+        bloque.append(linea(fila))
+        if len(bloque) >= tamano:
+            yield ''.join(bloque)
+            bloque = []
+    if bloque:
+        yield ''.join(bloque)
+
+
+async def _afilas(filas, tamano):
+    """
+    Filas de `iterator()` leídas de `tamano` en `tamano` en el hilo de la base
+    de datos. (`aiterator()` de un values_list ejecuta la consulta dentro del
+    bucle de eventos y Django lo rechaza con SynchronousOnlyOperation.)
+    """
+    siguientes = sync_to_async(lambda: list(islice(filas, tamano)))
+    while bloque := await siguientes():
+        for fila in bloque:
+            yield fila
+
+
+async def _aen_bloques(filas, cabecera, linea, tamano):
+    bloque = list(cabecera)
+    async for fila in filas:
+        bloque.append(linea(fila))
+        if len(bloque) >= tamano:
+            yield ''.join(bloque)
+            bloque = []
+    if bloque:
+        yield ''.join(bloque)
+
+
+def exportar(queryset, columnas, formato, nombre, request=None, chunk_size=CHUNK_SIZE):
+    """
+    Devuelve una StreamingHttpResponse con `columnas` (lookups de `values_list`)
+    de `queryset` en `formato` ('csv' o 'jsonl'), como descarga `nombre.<formato>`.
+    Si `request` llegó por ASGI el cuerpo se genera de forma asíncrona.
+    """
+    cabecera, linea = _csv(columnas) if formato == 'csv' else _jsonl(columnas)
+    filas = queryset.values_list(*columnas)
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        filas = _afilas(filas.iterator(chunk_size=chunk_size), chunk_size)
+        cuerpo = _aen_bloques(filas, cabecera, linea, chunk_size)
+    else:
+        cuerpo = _en_bloques(filas.iterator(chunk_size=chunk_size), cabecera, linea, chunk_size)
+    response = StreamingHttpResponse(cuerpo, content_type=FORMATOS[formato])
+    response['Content-Disposition'] = f'attachment; filename="{nombre}.{formato}"'
+    return response
@@ -0,0 +1,183 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from datetime import date, time
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    Opt-in keyset (cursor) pagination.
+
+    Only paginates when the client sends `cursor` or `page_size`, so existing
+    clients keep receiving the plain unpaginated list. Each page is fetched with
+    a `WHERE (a, b) > (last_a, last_b) ... LIMIT n` condition over `ordering`
+    instead of an OFFSET, so every request does bounded work no matter how deep
+    the client has scrolled.
+
+    `ordering` must end with a unique, non-null field (usually `id`) so the
+    position of a row is never ambiguous. Fields may be prefixed with '-'.
+    Set `opt_in = False` to always paginate with the default page size.
+    """
+    ordering = ('id',)
+    opt_in = True
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def get_default_page_size(self):
+        return getattr(settings, 'FEED_PAGE_SIZE', 20)
+
+    def get_max_page_size(self):
+        return getattr(settings, 'FEED_MAX_PAGE_SIZE', 100)
+
+    def get_ordering(self, request, queryset, view):
+        return tuple(self.ordering)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.get_default_page_size()
+        if page_size <= 0:
+            return self.get_default_page_size()
+        return min(page_size, self.get_max_page_size())
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self._page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self._set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() for async views, fetching the page with the async ORM."""
+        queryset = self._page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self._set_page([obj async for obj in queryset])
+
+    def _page_queryset(self, queryset, request, view):
+        """The (lazy) query for the requested page plus one row, or None when not paginating."""
+        params = request.query_params
+        if self.opt_in and self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset)
+        if position is not None:
+            queryset = queryset.filter(self._after(position))
+        return queryset[:self.page_size + 1]
+
+    def _set_page(self, results):
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def _after(self, position):
+        """Builds the lexicographic `row > position` condition for the ordering."""
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            term = Q(**{f'{name}__{lookup}': position[i]})
+            for previous, value in zip(self.ordering[:i], position[:i]):
+                term &= Q(**{previous.lstrip('-'): value})
+            condition |= term
+        return condition
+
+    def _position(self, instance):
+        return [getattr(instance, field.lstrip('-')) for field in self.ordering]
+
+    def decode_cursor(self, request, queryset=None):
+        """
+        Position encoded in the `cursor` parameter. Each value must be a scalar
+        and, given the queryset, valid for its ordering field; anything else is
+        a 404 rather than an error when the filter is evaluated.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        # Ordering fields are non-null, so null is never a valid position either
+        if not all(isinstance(value, (str, int, float)) and not isinstance(value, bool) for value in position):
+            raise NotFound(self.invalid_cursor_message)
+        if queryset is not None:
+            try:
+                position = [
+                    _ordering_field(queryset, field.lstrip('-')).to_python(value)
+                    for field, value in zip(self.ordering, position)
+                ]
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def encode_cursor(self, position):
+        # isoformat() keeps microseconds, unlike DjangoJSONEncoder which would
+        # truncate datetimes and make the cursor skip rows
+        position = [v.isoformat() if isinstance(v, (date, time)) else v for v in position]
+        data = json.dumps(position, cls=DjangoJSONEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+
+    def get_next_cursor(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self._position(self.page[-1]))
+
+    def get_next_link(self):
+        cursor = self.get_next_cursor()
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('next_cursor', self.get_next_cursor()),
+            ('has_more', self.has_next),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'next_cursor': {'type': 'string', 'nullable': True},
+                'has_more': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
+
+
+def _ordering_field(queryset, name):
+    """Model field (or annotation output field) an ordering name refers to."""
+    if name in queryset.query.annotations:
+        return queryset.query.annotations[name].output_field
+    opts = queryset.model._meta
+    field = None
+    for part in name.split(LOOKUP_SEP):
+        field = opts.get_field(part)
+        if field.is_relation:
+            opts = field.related_model._meta
+    return field
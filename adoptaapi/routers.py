@@ -0,0 +1,76 @@
+"""
+Enrutado de lecturas a la réplica de base de datos.
+
+Solo se leen de la réplica las peticiones GET/HEAD de las vistas que usan
+`ReadReplicaMixin` (listados de animales y peticiones); el resto del código,
+y cualquier escritura, va siempre a 'default'. Sin réplica configurada
+(SQLite, o PostgreSQL sin DB_REPLICA_HOST) el router no cambia nada.
+
+Las réplicas van con retraso. Para no servir (y cachear con un ETag nuevo)
+datos anteriores a una escritura, si alguno de los ámbitos de la vista
+(`get_version_scopes`, ver adoptaapi.versiones) ha cambiado hace menos de
+DB_REPLICA_LAG_SECONDS, la petición lee del primario. Esa comprobación
+necesita contadores compartidos entre workers: sin VERSIONES_COMPARTIDAS todas
+las lecturas van al primario.
+"""
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from .versiones import versiones_vista
+
+REPLICA = 'replica'
+
+_usar_replica = ContextVar('usar_replica', default=False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _usar_replica.get() and REPLICA in settings.DATABASES:
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Misma base de datos lógica
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
+
+
+class ReadReplicaMixin:
+    """
+    Mixin para vistas DRF: las lecturas de los métodos seguros van a la réplica.
+    La autenticación y los permisos se resuelven antes, contra el primario.
+    """
+
+    def get_version_scopes(self):
+        return ()
+
+    def _cambios_recientes(self):
+        if not settings.VERSIONES_COMPARTIDAS:
+            # Otro worker puede haber escrito sin que este lo sepa
+            return True
+        scopes = self.get_version_scopes()
+        if not scopes:
+            return False
+        limite = time.time_ns() - settings.DB_REPLICA_LAG_SECONDS * 1_000_000_000
+        return max(versiones_vista(self, scopes)) > limite
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (request.method in ('GET', 'HEAD') and REPLICA in settings.DATABASES
+                and not self._cambios_recientes()):
+            self._replica_token = _usar_replica.set(True)
+
+    def dispatch(self, request, *args, **kwargs):
+        self._replica_token = None
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self._replica_token is not None:
+                _usar_replica.reset(self._replica_token)
@@ -53,10 +53,12 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework.authtoken',
+    'django_filters',
     'usuarios',
     'animales',
     'peticiones',
     'contacto',
+    'correos',
     'corsheaders',
     'cloudinary',
 ]
@@ -70,9 +72,12 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'adoptaapi.asincrono.AsgiUrlconfMiddleware',
 ]
 
 ROOT_URLCONF = 'adoptaapi.urls'
+# Used instead of ROOT_URLCONF for requests served by adoptaapi.asgi (async read views)
+ASGI_URLCONF = 'adoptaapi.urls_asgi'
 
 TEMPLATES = [
     {
@@ -95,13 +100,122 @@ WSGI_APPLICATION = 'adoptaapi.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+# DB_ENGINE=postgresql switches to PostgreSQL (requires psycopg); SQLite otherwise.
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+
+# SQLite profile for small deployments (SQLITE_TUNING, on by default; see bench_sqlite).
+# WAL lets feed reads run while a Decision insert is being written; with
+# synchronous=NORMAL a commit only fsyncs at checkpoints (safe in WAL mode).
+# IMMEDIATE transactions take the write lock up front, so concurrent writers
+# wait on the busy timeout instead of failing with "database is locked".
+SQLITE_TUNED_OPTIONS = {
+    'timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 20)),  # seconds
+    'transaction_mode': 'IMMEDIATE',
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', 128 * 1024 * 1024))};"
+        f"PRAGMA cache_size=-{int(os.getenv('SQLITE_CACHE_KB', 20000))};"  # negative = KiB
+        'PRAGMA temp_store=MEMORY;'
+    ),
 }
 
+if DB_ENGINE == 'postgresql':
+    def _postgres(host, port):
+        config = {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'adoptaapi'),
+            'USER': os.getenv('DB_USER', 'adoptaapi'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': host,
+            'PORT': port,
+            'OPTIONS': {},
+        }
+        if os.getenv('DB_POOL', 'False') == 'True':
+            # psycopg connection pool (Django >= 5.1); incompatible with persistent connections
+            config['OPTIONS']['pool'] = {
+                'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+                'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+                'timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+            }
+            config['CONN_MAX_AGE'] = 0
+        else:
+            config['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', 60))  # seconds, persistent connections
+            config['CONN_HEALTH_CHECKS'] = True
+        return config
+
+    DATABASES = {
+        'default': _postgres(os.getenv('DB_HOST', 'localhost'), os.getenv('DB_PORT', '5432')),
+    }
+    if os.getenv('DB_REPLICA_HOST'):
+        # Read replica for the views using adoptaapi.routers.ReadReplicaMixin. Replica lag is detected with
+        # the shared version counters: without REDIS_URL (VERSIONES_COMPARTIDAS) every read stays on the primary.
+        DATABASES['replica'] = _postgres(os.getenv('DB_REPLICA_HOST'), os.getenv('DB_REPLICA_PORT', '5432'))
+        DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            # Overridable so benchmark servers can run against a seeded copy (see bench_servidores)
+            'NAME': os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {},
+        }
+    }
+    if os.getenv('SQLITE_TUNING', 'True') == 'True':
+        DATABASES['default']['OPTIONS'] = dict(SQLITE_TUNED_OPTIONS)
+
+DATABASE_ROUTERS = ['adoptaapi.routers.ReplicaRouter']
+# Reads go to the primary while the data they depend on changed less than this many seconds ago
+DB_REPLICA_LAG_SECONDS = int(os.getenv('DB_REPLICA_LAG_SECONDS', 5))
+
+
+# Cache
+# In-process memory by default; set REDIS_URL to share the cache between workers.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# The version counters of adoptaapi.versiones (ETags / 304s, replica lag detection) must be shared by
+# every worker. Without REDIS_URL they are per process, so ETags are disabled and reads stay on the
+# primary; set VERSIONES_COMPARTIDAS=True only when the app runs as a single process.
+VERSIONES_COMPARTIDAS = os.getenv('VERSIONES_COMPARTIDAS', 'True' if REDIS_URL else 'False') == 'True'
+
+# Cached responses of the public animal list/retrieve (anonymous visitors), in seconds.
+# Invalidated on every Animal change; the TTL bounds staleness across workers without REDIS_URL.
+ANIMAL_RESPONSE_CACHE_TTL = int(os.getenv('ANIMAL_RESPONSE_CACHE_TTL', 60))
+
+# Token authentication cache (usuarios.authentication.CachedTokenAuthentication)
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 1024))  # in-process LRU entries
+AUTH_TOKEN_CACHE_LOCAL_TTL = int(os.getenv('AUTH_TOKEN_CACHE_LOCAL_TTL', 30))  # seconds
+# Shared cache alias for the second level ('' disables it); only useful with a shared backend
+AUTH_TOKEN_CACHE = os.getenv('AUTH_TOKEN_CACHE', 'default' if REDIS_URL else '')
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', 300))  # seconds
+
+# Live peticion events for company dashboards (peticiones.eventos, served under ASGI).
+# The in-process broker only reaches connections of the same process; use Redis with several workers.
+PETICIONES_EVENTOS_BROKER = os.getenv(
+    'PETICIONES_EVENTOS_BROKER',
+    'peticiones.eventos.RedisBroker' if REDIS_URL else 'peticiones.eventos.InProcessBroker',
+)
+PETICIONES_EVENTOS_KEEPALIVE = int(os.getenv('PETICIONES_EVENTOS_KEEPALIVE', 15))  # seconds between pings
+# Lifetime of the single-use tickets that open the event stream from a browser (EventSource cannot send
+# headers). They live in the default cache, so with several workers it has to be shared (REDIS_URL).
+PETICIONES_EVENTOS_TICKET_TTL = int(os.getenv('PETICIONES_EVENTOS_TICKET_TTL', 30))
+# Cached per-animal petition summary (PeticionViewSet.resumen), in seconds; invalidated on petition changes,
+# the TTL bounds staleness across workers without REDIS_URL.
+PETICIONES_RESUMEN_CACHE_TTL = int(os.getenv('PETICIONES_RESUMEN_CACHE_TTL', 60))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -151,6 +265,23 @@ cloudinary.config(
   secure = True
 )
 
+# Animal image uploads
+# Backend: 'animales.storage.CloudinaryImageStorage' or 'animales.storage.LocalImageStorage' (MEDIA_ROOT)
+ANIMAL_IMAGE_STORAGE = os.getenv('ANIMAL_IMAGE_STORAGE', 'animales.storage.CloudinaryImageStorage')
+ANIMAL_IMAGE_UPLOAD_TIMEOUT = int(os.getenv('ANIMAL_IMAGE_UPLOAD_TIMEOUT', 30))  # seconds per upload, from when it starts
+ANIMAL_IMAGE_UPLOAD_WORKERS = int(os.getenv('ANIMAL_IMAGE_UPLOAD_WORKERS', 8))
+# Deferred mode: save the animal immediately and fill the image URLs when uploads finish
+ANIMAL_IMAGE_UPLOAD_DEFERRED = os.getenv('ANIMAL_IMAGE_UPLOAD_DEFERRED', 'False') == 'True'
+# Local preprocessing before upload: resize, strip EXIF, recompress and generate a thumbnail
+ANIMAL_IMAGE_PREPROCESS = os.getenv('ANIMAL_IMAGE_PREPROCESS', 'True') == 'True'
+ANIMAL_IMAGE_MAX_DIMENSION = int(os.getenv('ANIMAL_IMAGE_MAX_DIMENSION', 1600))  # px, longest side
+ANIMAL_IMAGE_FORMAT = os.getenv('ANIMAL_IMAGE_FORMAT', 'WEBP')  # 'WEBP' or 'JPEG'
+ANIMAL_IMAGE_QUALITY = int(os.getenv('ANIMAL_IMAGE_QUALITY', 80))
+ANIMAL_THUMBNAIL_SIZE = int(os.getenv('ANIMAL_THUMBNAIL_SIZE', 400))  # px, longest side
+
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -159,7 +290,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'usuarios.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -176,6 +307,10 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Cursor pagination (opt-in with ?page_size= or ?cursor=)
+FEED_PAGE_SIZE = int(os.getenv('FEED_PAGE_SIZE', 20))
+FEED_MAX_PAGE_SIZE = int(os.getenv('FEED_MAX_PAGE_SIZE', 100))
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True  # Or configure CORS_ALLOWED_ORIGINS for specific domains
 
@@ -208,6 +343,14 @@ EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = 'newtailsoporte@gmail.com'  # Your Gmail address
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')  # Load from .env file
+DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+
+# Outgoing email queue (sent by `python manage.py enviar_correos --loop`)
+CORREOS_MAX_INTENTOS = int(os.getenv('CORREOS_MAX_INTENTOS', 5))
+CORREOS_BACKOFF_SEGUNDOS = int(os.getenv('CORREOS_BACKOFF_SEGUNDOS', 60))  # doubled on each retry
+CORREOS_BACKOFF_MAX_SEGUNDOS = int(os.getenv('CORREOS_BACKOFF_MAX_SEGUNDOS', 3600))
+# A claimed batch is not picked up by other workers for this long (retried if the worker dies)
+CORREOS_RECLAMO_SEGUNDOS = int(os.getenv('CORREOS_RECLAMO_SEGUNDOS', 300))
 
 # You can also configure other CORS settings like:
 # CORS_ALLOW_METHODS = [...]
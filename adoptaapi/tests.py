@@ -0,0 +1,169 @@
+import asyncio
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.test import AsyncClient, Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from animales.benchmarks import crear_adoptantes, crear_animales, crear_usuario
+from animales.models import Animal
+from peticiones.models import Peticion
+from .routers import REPLICA, ReplicaRouter, _usar_replica
+from .versiones import get_version
+
+
+class ReplicaTests(TransactionTestCase):
+    """
+    ReadReplicaMixin + ReplicaRouter con una segunda conexión SQLite como
+    réplica. Apunta a la misma base de datos de test (como una réplica sin
+    retraso), así que lo que se comprueba es por qué conexión va cada consulta.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Se añade tras la preparación de la clase: el runner solo crea las bases de datos de settings
+        replica = dict(connections.settings['default'], TEST={'MIRROR': 'default'})
+        connections.settings[REPLICA] = replica
+        cls.databases = {'default', REPLICA}
+        cls._databases = override_settings(DATABASES={**settings.DATABASES, REPLICA: replica})
+        cls._databases.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._databases.disable()
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        cls.databases = {'default'}
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.empresa = crear_usuario('protectora@example.com', 'EMPRESA', 'Madrid')
+        crear_animales(self.empresa, 3)
+        self.client = APIClient()
+
+    def _consultas(self, url):
+        with CaptureQueriesContext(connections['default']) as primario, \
+                CaptureQueriesContext(connections[REPLICA]) as replica:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(primario), len(replica)
+
+    @override_settings(VERSIONES_COMPARTIDAS=True, DB_REPLICA_LAG_SECONDS=0)
+    def test_lecturas_a_la_replica(self):
+        # Un contador que no está en la caché cuenta como recién cambiado
+        get_version('animales')
+        primario, replica = self._consultas('/api/animales/')
+        self.assertEqual(primario, 0)
+        self.assertGreater(replica, 0)
+        # El ContextVar se restablece al terminar la petición
+        self.assertEqual(ReplicaRouter().db_for_read(Animal), None)
+
+    @override_settings(VERSIONES_COMPARTIDAS=True, DB_REPLICA_LAG_SECONDS=60)
+    def test_tras_una_escritura_lee_del_primario(self):
+        Animal.objects.first().save()  # post_save: bump('animales')
+        primario, replica = self._consultas('/api/animales/')
+        self.assertGreater(primario, 0)
+        self.assertEqual(replica, 0)
+
+    @override_settings(VERSIONES_COMPARTIDAS=False, DB_REPLICA_LAG_SECONDS=0)
+    def test_sin_versiones_compartidas_lee_del_primario(self):
+        get_version('animales')
+        primario, replica = self._consultas('/api/animales/')
+        self.assertGreater(primario, 0)
+        self.assertEqual(replica, 0)
+
+    def test_router(self):
+        router = ReplicaRouter()
+        token = _usar_replica.set(True)
+        try:
+            self.assertEqual(router.db_for_read(Animal), REPLICA)
+            self.assertEqual(router.db_for_write(Animal), 'default')
+        finally:
+            _usar_replica.reset(token)
+        self.assertIsNone(router.db_for_read(Animal))
+        self.assertFalse(router.allow_migrate(REPLICA, 'animales'))
+        self.assertTrue(router.allow_migrate('default', 'animales'))
+
+
+@override_settings(VERSIONES_COMPARTIDAS=True)
+class AsincronoTests(TestCase):
+    """Las vistas de adoptaapi.asincrono (ASGI) responden lo mismo que las síncronas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        empresa = crear_usuario('protectora@example.com', 'EMPRESA', 'Madrid')
+        animales = crear_animales(empresa, 4)
+        adoptantes = crear_adoptantes(3, 'Madrid')
+        Peticion.objects.bulk_create([
+            Peticion(animal_id=animales[i], usuario=adoptante, estado=('Pendiente', 'Rechazada')[i % 2])
+            for i, adoptante in enumerate(adoptantes)
+        ])
+        cls.animal_id = animales[0]
+        cls.cabeceras = {
+            'anonimo': {},
+            'empresa': {'Authorization': f'Token {Token.objects.create(user=empresa).key}'},
+            'adoptante': {'Authorization': f'Token {Token.objects.create(user=adoptantes[0]).key}'},
+        }
+
+    def setUp(self):
+        cache.clear()
+
+    async def _aget(self, url, cabeceras):
+        return await AsyncClient().get(url, headers=cabeceras)
+
+    def _comparar(self, url, quien):
+        cabeceras = self.cabeceras[quien]
+        sincrona = Client().get(url, headers=cabeceras)
+        asincrona = async_to_sync(self._aget)(url, cabeceras)
+        self.assertEqual(asincrona.status_code, sincrona.status_code)
+        self.assertEqual(asincrona.content, sincrona.content)
+        self.assertEqual(asincrona.get('ETag'), sincrona.get('ETag'))
+        return asincrona
+
+    def test_mismas_respuestas(self):
+        casos = [
+            ('/api/animales/', 'anonimo'),
+            ('/api/animales/?page_size=2', 'anonimo'),
+            (f'/api/animales/{self.animal_id}/', 'anonimo'),
+            ('/api/animales/0/', 'anonimo'),
+            ('/api/animales/?page_size=2', 'empresa'),
+            ('/api/animales/', 'adoptante'),
+            ('/api/peticiones/', 'empresa'),
+            ('/api/peticiones/?page_size=1', 'empresa'),
+            ('/api/peticiones/bandeja/?estado=Pendiente', 'empresa'),
+            ('/api/peticiones/bandeja/?estado=Nada', 'empresa'),
+            ('/api/peticiones/pendientes/', 'empresa'),
+            ('/api/peticiones/', 'adoptante'),
+            ('/api/peticiones/', 'anonimo'),
+        ]
+        for url, quien in casos:
+            with self.subTest(url=url, quien=quien):
+                self._comparar(url, quien)
+
+    def test_no_usa_la_cache_sincrona_en_el_bucle(self):
+        en_el_bucle = []
+
+        def vigilar(metodo):
+            def envoltorio(*args, **kwargs):
+                try:
+                    asyncio.get_running_loop()
+                    en_el_bucle.append(metodo.__name__)
+                except RuntimeError:
+                    pass
+                return metodo(*args, **kwargs)
+            return envoltorio
+
+        with mock.patch.multiple(cache, **{nombre: vigilar(getattr(cache, nombre))
+                                           for nombre in ('get', 'get_many', 'set', 'add')}):
+            for url, quien in [('/api/animales/', 'anonimo'), ('/api/peticiones/', 'empresa')]:
+                response = async_to_sync(self._aget)(url, self.cabeceras[quien])
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(en_el_bucle, [])
@@ -0,0 +1,19 @@
+"""
+URLconf de las peticiones servidas por ASGI (ver adoptaapi.asincrono).
+
+Las acciones de lectura con versión asíncrona van delante; todo lo demás se
+resuelve igual que en adoptaapi.urls.
+"""
+from django.urls import include, path
+
+from adoptaapi.asincrono import rutas_asincronas
+from animales.views import AnimalViewSet
+from peticiones.views import PeticionViewSet
+
+urlpatterns = [
+    path('api/', include(
+        rutas_asincronas('animales', AnimalViewSet, basename='animales')
+        + rutas_asincronas('peticiones', PeticionViewSet, basename='peticion')
+    )),
+    path('', include('adoptaapi.urls')),
+]
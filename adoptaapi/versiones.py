@@ -0,0 +1,95 @@
+"""
+Contadores de versión por ámbito para invalidar cachés de respuestas.
+
+En lugar de borrar claves una a una, cada ámbito ('animales',
+'usuario:7', ...) tiene un número de versión en la caché por defecto que se
+incrementa cuando cambian sus datos; las claves y ETags que lo incluyen dejan
+de coincidir y las entradas antiguas caducan solas.
+
+La versión es la marca de tiempo (ns) del último cambio, así que también sirve
+como Last-Modified del ámbito, y si la caché pierde un contador (reinicio,
+expulsión) se regenera con la hora actual sin repetir un valor ya usado.
+
+Los contadores solo son fiables si todos los workers ven la misma caché
+(REDIS_URL): con la caché en memoria, una escritura en un proceso no cambia la
+versión en los demás. Por eso los ETags y la detección del retraso de la
+réplica se desactivan salvo con VERSIONES_COMPARTIDAS (ver adoptaapi.checks).
+"""
+import time
+
+from django.core.cache import cache
+
+PREFIJO = 'version:'
+
+
+def _nueva():
+    return time.time_ns()
+
+
+def get_version(ambito):
+    """Versión actual de `ambito`."""
+    clave = PREFIJO + ambito
+    version = cache.get(clave)
+    if version is None:
+        version = _nueva()
+        # add() no pisa el valor si otro proceso lo acaba de crear
+        if not cache.add(clave, version, timeout=None):
+            version = cache.get(clave, version)
+    return version
+
+
+def get_versiones(*ambitos):
+    """Versiones de varios ámbitos en una sola consulta a la caché."""
+    claves = [PREFIJO + ambito for ambito in ambitos]
+    encontradas = cache.get_many(claves)
+    return tuple(
+        encontradas[clave] if clave in encontradas else get_version(ambito)
+        for clave, ambito in zip(claves, ambitos)
+    )
+
+
+async def aget_version(ambito):
+    """get_version() sin bloquear el bucle de eventos (vistas ASGI)."""
+    clave = PREFIJO + ambito
+    version = await cache.aget(clave)
+    if version is None:
+        version = _nueva()
+        if not await cache.aadd(clave, version, timeout=None):
+            version = await cache.aget(clave, version)
+    return version
+
+
+async def aget_versiones(*ambitos):
+    """get_versiones() sin bloquear el bucle de eventos (vistas ASGI)."""
+    claves = [PREFIJO + ambito for ambito in ambitos]
+    encontradas = await cache.aget_many(claves)
+    return tuple([
+        encontradas[clave] if clave in encontradas else await aget_version(ambito)
+        for clave, ambito in zip(claves, ambitos)
+    ])
+
+
+def versiones_vista(view, scopes):
+    """
+    Versiones de `scopes` para ConditionalGetMixin y ReadReplicaMixin. Las
+    vistas asíncronas las leen antes de initial() (ver AsyncReadMixin) y las
+    dejan en `view.versiones_precargadas` para no tocar la caché desde el bucle.
+    """
+    precargadas = getattr(view, 'versiones_precargadas', None)
+    if precargadas is not None and precargadas[0] == scopes:
+        return precargadas[1]
+    return get_versiones(*scopes)
+
+
+def fecha_version(version):
+    """Marca de tiempo (segundos) correspondiente a una versión."""
+    return version // 1_000_000_000
+
+
+def bump(*ambitos):
+    """Invalida todo lo cacheado bajo `ambitos`."""
+    ahora = _nueva()
+    claves = [PREFIJO + ambito for ambito in ambitos]
+    actuales = cache.get_many(claves)
+    # Siempre crece, aunque el reloj vaya por detrás del último valor guardado
+    cache.set_many({clave: max(ahora, actuales.get(clave, 0) + 1) for clave in claves}, timeout=None)
@@ -0,0 +1,219 @@
+"""
+Utilidades compartidas por los comandos de benchmark (`manage.py bench_*`).
+
+Los benchmarks se ejecutan siempre sobre una base de datos de test creada para
+la ocasión y destruida al terminar, nunca sobre `db.sqlite3` ni producción.
+"""
+import asyncio
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from django.db import connection
+
+from peticiones.models import Peticion
+from usuarios.models import CustomUser, PROVINCIAS_CHOICES
+from .models import Animal, Decision
+
+
+@contextmanager
+def isolated_database(verbosity=0, test_name=None):
+    """
+    Crea una base de datos de test vacía (con migraciones) y la destruye al salir.
+    `test_name` fuerza el nombre (p. ej. un fichero, ya que SQLite usa memoria por defecto).
+    """
+    old_name = connection.settings_dict['NAME']
+    if test_name:
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = test_name
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+
+
+def measure(fn, repeat=20, warmup=2):
+    """Ejecuta `fn` varias veces y devuelve percentiles de latencia en milisegundos."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentiles(samples)
+
+
+def percentiles(samples):
+    """p50/p95/p99/max/mean de una lista de latencias en milisegundos."""
+    samples = sorted(samples)
+    if not samples:
+        return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0, 'mean': 0.0}
+    return {
+        'p50': statistics.median(samples),
+        'p95': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        'p99': samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        'max': samples[-1],
+        'mean': statistics.fmean(samples),
+    }
+
+
+def crear_usuario(username, tipo, provincia, **extra):
+    return CustomUser.objects.create_user(
+        username=username, email=username, password='benchmark',
+        tipo=tipo, provincia=provincia, **extra
+    )
+
+
+def crear_animales(empresa, n, batch_size=5000, **overrides):
+    """Inserta `n` animales sintéticos para `empresa` y devuelve sus ids."""
+    hoy = date.today()
+    animales = []
+    for i in range(n):
+        datos = dict(
+            empresa=empresa,
+            provincia=empresa.provincia,  # bulk_create no dispara pre_save
+            fecha_creacion=hoy - timedelta(days=i % 365),
+            nombre=f'Animal {i}',
+            especie='perro' if i % 2 else 'gato',
+            genero='macho' if i % 3 else 'hembra',
+            fecha_nacimiento=hoy - timedelta(days=200 + (i * 37) % 5000),
+            tamano=('pequeño', 'mediano', 'grande')[i % 3],
+            raza='Mestizo',
+            temperamento='Tranquilo y cariñoso',
+            historia='Rescatado de la calle.',
+            apto_ninos=('excelente', 'bueno', 'precaucion', 'noRecomendado', 'desconocido')[i % 5],
+            compatibilidad_mascotas=('excelente', 'bienConPerros', 'bienConGatos', 'selectivo',
+                                     'prefiereSolo', 'desconocido')[i % 6],
+            apto_piso_pequeno=('ideal', 'bueno', 'requiereEspacio', 'soloConJardin', 'desconocido')[i % 5],
+            esterilizado=bool(i % 2),
+            problema_salud=(i % 7 == 0),
+        )
+        datos.update(overrides)
+        animales.append(Animal(**datos))
+    creados = Animal.objects.bulk_create(animales, batch_size=batch_size)
+    return [a.pk for a in creados]
+
+
+def crear_adoptantes(n, provincia, prefijo='adoptante', batch_size=5000):
+    """Inserta `n` usuarios USUARIO sin contraseña utilizable (sin el coste del hash) y los devuelve."""
+    CustomUser.objects.bulk_create(
+        [
+            CustomUser(username=f'{prefijo}{i}@bench.local', email=f'{prefijo}{i}@bench.local',
+                       tipo='USUARIO', provincia=provincia, nombre=f'Adoptante {i}', password='!')
+            for i in range(n)
+        ],
+        batch_size=batch_size,
+    )
+    return list(CustomUser.objects.filter(username__startswith=f'{prefijo}', username__endswith='@bench.local'))
+
+
+def crear_decisiones(usuario, animal_ids, batch_size=5000):
+    Decision.objects.bulk_create(
+        [Decision(usuario=usuario, animal_id=animal_id, tipo_decision='IGNORAR') for animal_id in animal_ids],
+        batch_size=batch_size,
+    )
+
+
+def sembrar(empresas=20, animales=5000, adoptantes=500, decisiones=200, peticiones=20, semilla=42):
+    """
+    Dataset sintético reproducible: `empresas` protectoras repartidas entre las
+    provincias de PROVINCIAS_CHOICES, `animales` animales repartidos entre ellas,
+    `adoptantes` usuarios en esas mismas provincias con hasta `decisiones`
+    decisiones cada uno sobre animales de su provincia, y hasta `peticiones`
+    peticiones pendientes por protectora. Devuelve un SimpleNamespace con las
+    protectoras, los adoptantes y los ids de animales por provincia.
+    """
+    rnd = random.Random(semilla)
+    provincias = [codigo for codigo, _ in PROVINCIAS_CHOICES][:empresas]
+
+    CustomUser.objects.bulk_create([
+        CustomUser(username=f'protectora{i}@bench.local', email=f'protectora{i}@bench.local',
+                   tipo='EMPRESA', provincia=provincias[i % len(provincias)],
+                   nombre_empresa=f'Protectora {i}', es_aprobada=True, password='!')
+        for i in range(empresas)
+    ])
+    protectoras = list(CustomUser.objects.filter(tipo='EMPRESA', username__startswith='protectora').order_by('id'))
+
+    por_provincia = {}
+    for i, protectora in enumerate(protectoras):
+        n = animales // empresas + (1 if i < animales % empresas else 0)
+        por_provincia.setdefault(protectora.provincia, []).extend(crear_animales(protectora, n))
+
+    usuarios = []
+    for i, provincia in enumerate(provincias):
+        n = adoptantes // len(provincias) + (1 if i < adoptantes % len(provincias) else 0)
+        if n:
+            usuarios += crear_adoptantes(n, provincia, prefijo=f'adoptante-p{i}-')
+
+    historial = []
+    for usuario in usuarios:
+        candidatos = por_provincia.get(usuario.provincia, [])
+        for animal_id in rnd.sample(candidatos, min(decisiones, len(candidatos))):
+            historial.append(Decision(usuario=usuario, animal_id=animal_id,
+                                      tipo_decision=rnd.choice(('IGNORAR', 'IGNORAR', 'SOLICITAR'))))
+    Decision.objects.bulk_create(historial, batch_size=5000)
+
+    pendientes = []
+    adoptantes_por_provincia = {}
+    for usuario in usuarios:
+        adoptantes_por_provincia.setdefault(usuario.provincia, []).append(usuario)
+    for protectora in protectoras:
+        candidatos = adoptantes_por_provincia.get(protectora.provincia, [])
+        suyos = list(Animal.objects.filter(empresa=protectora).values_list('id', flat=True)[:peticiones])
+        for animal_id, usuario in zip(suyos, rnd.sample(candidatos, min(len(suyos), len(candidatos)))):
+            pendientes.append(Peticion(animal_id=animal_id, usuario=usuario))
+    Peticion.objects.bulk_create(pendientes, batch_size=5000)
+
+    return SimpleNamespace(empresas=protectoras, adoptantes=usuarios, animales=por_provincia)
+
+
+async def carga_http(host, port, ruta, cabeceras=None, concurrencia=50, segundos=10):
+    """
+    Lanza `concurrencia` clientes HTTP/1.1 contra `ruta` durante `segundos`, cada
+    uno con su conexión (keep-alive si el servidor lo permite), y devuelve
+    latencias (ms), códigos de estado y errores de conexión.
+    """
+    lineas = [f'GET {ruta} HTTP/1.1', f'Host: {host}:{port}', 'Accept: application/json']
+    lineas += [f'{nombre}: {valor}' for nombre, valor in (cabeceras or {}).items()]
+    peticion = ('\r\n'.join(lineas) + '\r\n\r\n').encode()
+    latencias, estados, errores = [], {}, 0
+    fin = time.perf_counter() + segundos
+
+    async def cliente():
+        nonlocal errores
+        reader = writer = None
+        while time.perf_counter() < fin:
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(host, port)
+                inicio = time.perf_counter()
+                writer.write(peticion)
+                cabecera = await reader.readuntil(b'\r\n\r\n')
+                estado = int(cabecera.split(b' ', 2)[1])
+                campos = {}
+                for linea in cabecera.split(b'\r\n')[1:]:
+                    nombre, _, valor = linea.partition(b':')
+                    campos[nombre.strip().lower()] = valor.strip().lower()
+                cerrar = campos.get(b'connection') == b'close'
+                if b'content-length' in campos:
+                    await reader.readexactly(int(campos[b'content-length']))
+                else:
+                    await reader.read()
+                    cerrar = True
+                latencias.append((time.perf_counter() - inicio) * 1000)
+                estados[estado] = estados.get(estado, 0) + 1
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                errores += 1
+                cerrar = True
+            if cerrar and writer is not None:
+                writer.close()
+                reader = writer = None
+        if writer is not None:
+            writer.close()
+
+    await asyncio.gather(*(cliente() for _ in range(concurrencia)))
+    return {'latencias': latencias, 'estados': estados, 'errores': errores, 'segundos': segundos}
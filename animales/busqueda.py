@@ -0,0 +1,113 @@
+"""
+Búsqueda de texto y facetas sobre animales.
+
+El texto se busca en nombre, raza, temperamento e historia con el índice de
+la base de datos (migración 0012):
+
+- SQLite: tabla FTS5 `animales_animal_fts`, mantenida por triggers. Cada
+  término se busca como prefijo ("perr" encuentra "perro") y sin acentos.
+- PostgreSQL: índice GIN sobre `to_tsvector('spanish', ...)`.
+- Cualquier otro caso (p. ej. SQLite sin FTS5): `icontains` término a término.
+
+Las facetas cuentan, para cada campo, los animales de cada valor aplicando la
+búsqueda y el resto de filtros pero no el del propio campo, para que el
+cliente pueda ofrecer las demás opciones con su recuento.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, Count, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Animal
+
+FTS_TABLE = 'animales_animal_fts'
+CAMPOS_TEXTO = ('nombre', 'raza', 'temperamento', 'historia')
+FACETAS = ('especie', 'tamano', 'genero', 'apto_ninos', 'compatibilidad_mascotas')
+
+POSTGRES_VECTOR = (
+    "to_tsvector('spanish', coalesce(animales_animal.nombre, '') || ' ' || "
+    "coalesce(animales_animal.raza, '') || ' ' || coalesce(animales_animal.temperamento, '') || ' ' || "
+    "coalesce(animales_animal.historia, ''))"
+)
+
+
+def _terminos(texto):
+    return re.findall(r'\w+', texto.lower())
+
+
+def _fts_disponible():
+    # Una consulta a sqlite_master por búsqueda; no cachear: los tests crean otra base de datos
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        return cursor.fetchone() is not None
+
+
+def buscar_texto(queryset, texto):
+    """Filtra `queryset` a los animales cuyo texto contiene todos los términos de `texto`."""
+    terminos = _terminos(texto)
+    if not terminos:
+        return queryset
+
+    if connection.vendor == 'sqlite' and _fts_disponible():
+        consulta = ' '.join(f'"{termino}"*' for termino in terminos)
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (consulta,)
+        ))
+
+    if connection.vendor == 'postgresql':
+        return queryset.alias(coincide=RawSQL(
+            f"{POSTGRES_VECTOR} @@ plainto_tsquery('spanish', %s)", (' '.join(terminos),),
+            output_field=BooleanField(),
+        )).filter(coincide=True)
+
+    for termino in terminos:
+        condicion = Q()
+        for campo in CAMPOS_TEXTO:
+            condicion |= Q(**{f'{campo}__icontains': termino})
+        queryset = queryset.filter(condicion)
+    return queryset
+
+
+def leer_filtros(params):
+    """
+    Lee los filtros de facetas de los query params (`especie=perro,gato`).
+    Devuelve `(filtros, errores)`; los valores se validan contra las opciones del modelo.
+    """
+    filtros, errores = {}, {}
+    for campo in FACETAS:
+        valor = params.get(campo)
+        if not valor:
+            continue
+        valores = valor.split(',')
+        validos = dict(Animal._meta.get_field(campo).choices)
+        invalidos = [v for v in valores if v not in validos]
+        if invalidos:
+            errores[campo] = [f"Valor inválido: {', '.join(invalidos)}. Valores permitidos: {', '.join(validos)}."]
+        else:
+            filtros[campo] = valores
+    return filtros, errores
+
+
+def aplicar_filtros(queryset, filtros, excepto=None):
+    for campo, valores in filtros.items():
+        if campo != excepto:
+            queryset = queryset.filter(**{f'{campo}__in': valores})
+    return queryset
+
+
+def facetas(queryset, filtros):
+    """`{campo: [{'valor', 'etiqueta', 'total'}, ...]}` para cada campo de FACETAS."""
+    resultado = {}
+    for campo in FACETAS:
+        etiquetas = dict(Animal._meta.get_field(campo).choices)
+        filas = (
+            aplicar_filtros(queryset, filtros, excepto=campo)
+            .order_by().values_list(campo).annotate(total=Count('id')).order_by('-total', campo)
+        )
+        resultado[campo] = [
+            {'valor': valor, 'etiqueta': etiquetas.get(valor, valor), 'total': total}
+            for valor, total in filas
+        ]
+    return resultado
+
@@ -0,0 +1,151 @@
+"""
+Motor de compatibilidad entre el perfil de un adoptante y los animales del feed.
+
+Los animales candidatos se codifican como vectores de enteros pequeños (un
+código por atributo) y el perfil del usuario como un vector de pesos, de modo
+que la puntuación de todo el feed se calcula con operaciones NumPy en bloque
+en lugar de un bucle Python por animal.
+"""
+from datetime import date
+
+import numpy as np
+
+# Puntuación (0-1) de cada valor de las opciones del modelo Animal.
+# El último valor de cada tabla se usa también para valores desconocidos.
+APTO_NINOS = {
+    'excelente': 1.0, 'bueno': 0.75, 'precaucion': 0.25, 'noRecomendado': 0.0, 'desconocido': 0.5,
+}
+COMPATIBILIDAD_MASCOTAS = {
+    'excelente': 1.0, 'bienConPerros': 0.75, 'bienConGatos': 0.75, 'selectivo': 0.4,
+    'prefiereSolo': 0.0, 'desconocido': 0.5,
+}
+APTO_PISO_PEQUENO = {
+    'ideal': 1.0, 'bueno': 0.75, 'requiereEspacio': 0.25, 'soloConJardin': 0.0, 'desconocido': 0.5,
+}
+TAMANO = {'pequeño': 1.0, 'mediano': 0.5, 'grande': 0.0}
+
+EDAD_SENIOR_DIAS = 8 * 365
+EDAD_CACHORRO_DIAS = 365
+
+# (factor, peso). El orden define las columnas de la matriz de puntuaciones.
+FACTORES = (
+    ('ninos', 2.0),
+    ('mascotas', 1.0),
+    ('espacio', 1.0),
+    ('tamano', 1.0),
+    ('salud', 1.0),
+    ('edad', 1.0),
+    ('tranquilo', 1.0),
+)
+PESOS = np.array([peso for _, peso in FACTORES], dtype=np.float32)
+
+CAMPOS = ('id', 'apto_ninos', 'compatibilidad_mascotas', 'apto_piso_pequeno', 'tamano',
+          'problema_salud', 'fecha_nacimiento')
+
+
+def _tabla(puntos):
+    codigos = {valor: i for i, valor in enumerate(puntos)}
+    return codigos, np.array(list(puntos.values()), dtype=np.float32)
+
+
+_TABLAS = {
+    'apto_ninos': _tabla(APTO_NINOS),
+    'compatibilidad_mascotas': _tabla(COMPATIBILIDAD_MASCOTAS),
+    'apto_piso_pequeno': _tabla(APTO_PISO_PEQUENO),
+    'tamano': _tabla(TAMANO),
+}
+
+
+def _codificar(valores, campo):
+    """Convierte una columna de valores de texto en códigos int8 (índice en la tabla)."""
+    codigos, puntos = _TABLAS[campo]
+    desconocido = len(puntos) - 1
+    return np.fromiter((codigos.get(v, desconocido) for v in valores), dtype=np.int8, count=len(valores))
+
+
+def codificar_animales(filas, hoy=None):
+    """
+    Codifica filas `values_list(*CAMPOS)` en un diccionario de arrays:
+    ids, un código int8 por atributo categórico, `salud` (bool) y `edad` en días.
+    """
+    hoy = hoy or date.today()
+    columnas = list(zip(*filas)) or [()] * len(CAMPOS)
+    ids, ninos, mascotas, espacio, tamano, salud, nacimiento = columnas
+    n = len(ids)
+    nacimiento = np.fromiter((d.toordinal() for d in nacimiento), dtype=np.int32, count=n)
+    return {
+        'ids': np.fromiter(ids, dtype=np.int64, count=n),
+        'apto_ninos': _codificar(ninos, 'apto_ninos'),
+        'compatibilidad_mascotas': _codificar(mascotas, 'compatibilidad_mascotas'),
+        'apto_piso_pequeno': _codificar(espacio, 'apto_piso_pequeno'),
+        'tamano': _codificar(tamano, 'tamano'),
+        'salud': np.fromiter(salud, dtype=bool, count=n),
+        'edad': hoy.toordinal() - nacimiento,
+    }
+
+
+def perfil_usuario(user):
+    """Vector de pesos del adoptante: un factor solo cuenta si su perfil lo activa."""
+    activos = np.array([
+        user.tiene_ninos,
+        user.tiene_otros_animales,
+        not user.tipo_vivienda,  # tipo_vivienda=True indica vivienda grande
+        user.prefiere_pequenos,
+        not user.acepta_enfermos,
+        not user.acepta_viejos,
+        user.busca_tranquilo,
+    ], dtype=bool)
+    return PESOS * activos
+
+
+def puntuar(codificados, pesos):
+    """
+    Devuelve `(total, factores)`: la puntuación media ponderada (0-1) de cada
+    animal y la matriz n x len(FACTORES) con la puntuación de cada factor.
+    """
+    if not len(codificados['ids']):
+        return np.empty(0, dtype=np.float32), np.empty((0, len(FACTORES)), dtype=np.float32)
+    factores = np.column_stack([
+        _TABLAS['apto_ninos'][1][codificados['apto_ninos']],
+        _TABLAS['compatibilidad_mascotas'][1][codificados['compatibilidad_mascotas']],
+        _TABLAS['apto_piso_pequeno'][1][codificados['apto_piso_pequeno']],
+        _TABLAS['tamano'][1][codificados['tamano']],
+        (~codificados['salud']).astype(np.float32),
+        (codificados['edad'] < EDAD_SENIOR_DIAS).astype(np.float32),
+        np.where(codificados['edad'] < EDAD_CACHORRO_DIAS, 0.25, 1.0).astype(np.float32),
+    ])
+
+    peso_total = pesos.sum()
+    if peso_total == 0:
+        return np.ones(len(factores), dtype=np.float32), factores
+    return factores @ pesos / peso_total, factores
+
+
+def mejores(total, limite):
+    """Índices de los `limite` mejores animales, de mayor a menor puntuación.
+    A igual puntuación se respeta el orden original del feed."""
+    n = len(total)
+    if limite < n:
+        candidatos = np.argpartition(-total, limite - 1)[:limite]
+    else:
+        candidatos = np.arange(n)
+    return candidatos[np.lexsort((candidatos, -total[candidatos]))]
+
+
+def ranking(queryset, user, limite=20):
+    """
+    Puntúa todos los animales de `queryset` para `user` y devuelve los `limite`
+    mejores como lista de `(animal_id, puntuacion, desglose)`, donde el
+    desglose asigna a cada factor activo su puntuación.
+    """
+    filas = list(queryset.order_by('fecha_creacion', 'id').values_list(*CAMPOS))
+    codificados = codificar_animales(filas)
+    pesos = perfil_usuario(user)
+    total, factores = puntuar(codificados, pesos)
+
+    activos = [i for i, peso in enumerate(pesos) if peso]
+    resultado = []
+    for i in mejores(total, limite):
+        desglose = {FACTORES[j][0]: round(float(factores[i, j]), 2) for j in activos}
+        resultado.append((int(codificados['ids'][i]), round(float(total[i]), 3), desglose))
+    return resultado
@@ -0,0 +1,47 @@
+from datetime import date
+
+import django_filters
+
+from .models import Animal
+
+
+class ChoiceInFilter(django_filters.BaseInFilter, django_filters.ChoiceFilter):
+    """Uno o varios valores separados por comas (`?especie=perro,gato`), validados contra las opciones."""
+
+
+def _hace_anios(anios, hoy=None):
+    hoy = hoy or date.today()
+    try:
+        return hoy.replace(year=hoy.year - anios)
+    except ValueError:  # 29 de febrero
+        return hoy.replace(year=hoy.year - anios, day=28)
+
+
+class AnimalFilter(django_filters.FilterSet):
+    """
+    Filtros del listado de animales (`GET /api/animales/`).
+    La edad se filtra en años cumplidos a partir de `fecha_nacimiento`.
+    """
+    especie = ChoiceInFilter(choices=Animal.ESPECIE_CHOICES)
+    tamano = ChoiceInFilter(choices=Animal.TAMANO_CHOICES)
+    genero = ChoiceInFilter(choices=Animal.GENERO_CHOICES)
+    apto_ninos = ChoiceInFilter(choices=Animal.APTITUD_NINOS)
+    compatibilidad_mascotas = ChoiceInFilter(choices=Animal.COMPATIBILIDAD)
+    apto_piso_pequeno = ChoiceInFilter(choices=Animal.APTITUD_ESPACIO)
+    esterilizado = django_filters.BooleanFilter()
+    problema_salud = django_filters.BooleanFilter()
+    edad_min = django_filters.NumberFilter(method='filtrar_edad_min', min_value=0)
+    edad_max = django_filters.NumberFilter(method='filtrar_edad_max', min_value=0)
+
+    class Meta:
+        model = Animal
+        fields = ['especie', 'tamano', 'genero', 'apto_ninos', 'compatibilidad_mascotas',
+                  'apto_piso_pequeno', 'esterilizado', 'problema_salud']
+
+    def filtrar_edad_min(self, queryset, name, value):
+        # Al menos `value` años cumplidos: nacido como tarde hace `value` años
+        return queryset.filter(fecha_nacimiento__lte=_hace_anios(int(value)))
+
+    def filtrar_edad_max(self, queryset, name, value):
+        # Como mucho `value` años cumplidos: aún no ha cumplido `value + 1`
+        return queryset.filter(fecha_nacimiento__gt=_hace_anios(int(value) + 1))
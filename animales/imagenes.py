@@ -0,0 +1,61 @@
+"""
+Preprocesado local de las fotos de animales antes de subirlas.
+
+Los móviles de las protectoras generan JPEGs de 8-12 MB; aquí se reducen a
+`ANIMAL_IMAGE_MAX_DIMENSION`, se recomprimen (WebP por defecto), se descartan
+los metadatos EXIF y se genera una miniatura.
+
+Pillow abre el fichero de forma perezosa y lo decodifica leyendo del propio
+`UploadedFile` (en disco para subidas grandes), sin cargarlo entero con
+`read()`. En JPEG, `draft()` hace que el decodificador reduzca la imagen al
+vuelo (escalado DCT), así que nunca se descomprime a tamaño completo.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+EXTENSIONES = {'WEBP': 'webp', 'JPEG': 'jpg', 'PNG': 'png'}
+
+
+def _abrir(archivo, max_dimension):
+    archivo.seek(0)
+    imagen = Image.open(archivo)
+    if imagen.format == 'JPEG':
+        imagen.draft('RGB', (max_dimension, max_dimension))
+    # Aplica la orientación EXIF a los píxeles; el EXIF no se copia al guardar
+    imagen = ImageOps.exif_transpose(imagen)
+    if imagen.mode not in ('RGB', 'RGBA'):
+        imagen = imagen.convert('RGBA' if 'transparency' in imagen.info else 'RGB')
+    return imagen
+
+
+def _guardar(imagen, formato, calidad, nombre):
+    if formato == 'JPEG' and imagen.mode != 'RGB':
+        imagen = imagen.convert('RGB')
+    buffer = BytesIO()
+    imagen.save(buffer, format=formato, quality=calidad, optimize=True)
+    return ContentFile(buffer.getvalue(), name=f'{nombre}.{EXTENSIONES[formato]}')
+
+
+def preprocesar_imagen(archivo):
+    """
+    Devuelve `{'imagen': ContentFile, 'miniatura': ContentFile}` con la foto
+    redimensionada y recomprimida y su miniatura. Lanza `PIL.UnidentifiedImageError`
+    u `OSError` si el fichero no es una imagen válida.
+    """
+    max_dimension = settings.ANIMAL_IMAGE_MAX_DIMENSION
+    formato = settings.ANIMAL_IMAGE_FORMAT
+    calidad = settings.ANIMAL_IMAGE_QUALITY
+    nombre = os.path.splitext(os.path.basename(getattr(archivo, 'name', '') or 'imagen'))[0]
+
+    imagen = _abrir(archivo, max_dimension)
+    imagen.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    principal = _guardar(imagen, formato, calidad, nombre)
+
+    lado = settings.ANIMAL_THUMBNAIL_SIZE
+    imagen.thumbnail((lado, lado), Image.LANCZOS)
+    miniatura = _guardar(imagen, formato, calidad, f'{nombre}_thumb')
+    return {'imagen': principal, 'miniatura': miniatura}
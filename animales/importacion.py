@@ -0,0 +1,141 @@
+"""
+Importación masiva de animales desde CSV o JSONL.
+
+Las filas se leen del fichero de una en una (sin cargarlo entero), se validan
+con las mismas reglas que `AnimalSerializer` y se insertan por lotes con
+`bulk_create`, cada lote en su propia transacción. Las filas inválidas no
+detienen la importación: se informa de sus errores y se siguen procesando las
+demás. La memoria depende del tamaño del lote, no del fichero.
+
+Las imágenes no se importan; se añaden después con `POST /api/animales/{id}/imagenes/`.
+"""
+import codecs
+import csv
+import json
+from datetime import date
+from itertools import islice
+
+from django.db import transaction
+from rest_framework import serializers
+
+from adoptaapi.versiones import bump
+from .models import Animal
+from .serializers import AnimalSerializer
+
+FORMATOS = ('csv', 'jsonl')
+LOTE = 500
+
+
+class FilaInvalida:
+    """Fila que no se ha podido decodificar (p. ej. JSON mal formado)."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+class ArchivoInvalido(ValueError):
+    """El fichero entero no se puede leer (p. ej. no está en UTF-8); no se importa nada."""
+
+
+def comprobar_utf8(fichero, bloque=64 * 1024):
+    """
+    Recorre el fichero binario comprobando que es UTF-8 válido, sin cargarlo
+    entero, y lo deja de nuevo al principio. Así un CSV guardado en Latin-1
+    (Excel) se rechaza antes de insertar ninguna fila.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    linea = 1
+    try:
+        for trozo in iter(lambda: fichero.read(bloque), b''):
+            try:
+                decoder.decode(trozo)
+            except UnicodeDecodeError as e:
+                linea += trozo.count(b'\n', 0, max(e.start, 0))
+                raise
+            linea += trozo.count(b'\n')
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        raise ArchivoInvalido(
+            f'El fichero no está codificado en UTF-8 (línea {linea}). Guárdalo como "CSV UTF-8".'
+        )
+    finally:
+        fichero.seek(0)
+
+
+def detectar_formato(nombre):
+    extension = nombre.rsplit('.', 1)[-1].lower() if '.' in nombre else ''
+    return {'csv': 'csv', 'jsonl': 'jsonl', 'ndjson': 'jsonl'}.get(extension)
+
+
+def leer_filas(fichero, formato):
+    """
+    Genera las filas (dict) de un fichero binario, en orden y de una en una.
+    Lanza ArchivoInvalido, antes de la primera fila, si no está en UTF-8.
+    """
+    comprobar_utf8(fichero)
+    texto = codecs.getreader('utf-8-sig')(fichero)
+    if formato == 'csv':
+        for fila in csv.DictReader(texto):
+            # Celdas vacías = campo no informado (se aplican los valores por defecto)
+            yield {campo: valor for campo, valor in fila.items() if campo and valor != ''}
+    elif formato == 'jsonl':
+        for linea in texto:
+            if not linea.strip():
+                continue
+            try:
+                fila = json.loads(linea)
+            except ValueError as e:
+                yield FilaInvalida(f'JSON inválido: {e}')
+                continue
+            yield fila if isinstance(fila, dict) else FilaInvalida('Cada línea debe ser un objeto JSON.')
+    else:
+        raise ValueError(f'Formato no soportado: {formato}')
+
+
+def importar_por_lotes(empresa, filas, lote=LOTE):
+    """
+    Importa `filas` como animales de `empresa`. Genera, por cada lote procesado,
+    `(creados, errores)`, donde `errores` es una lista de
+    `{'fila': n, 'errores': {...}}` con `n` empezando en 1.
+    """
+    validador = AnimalSerializer()  # los campos se construyen una vez, no por fila
+    numeradas = enumerate(filas, start=1)
+    try:
+        while True:
+            bloque = list(islice(numeradas, lote))
+            if not bloque:
+                break
+            animales, errores = [], []
+            for numero, fila in bloque:
+                if isinstance(fila, FilaInvalida):
+                    errores.append({'fila': numero, 'errores': {'non_field_errors': [fila.error]}})
+                    continue
+                try:
+                    datos = validador.run_validation(fila)
+                except serializers.ValidationError as e:
+                    errores.append({'fila': numero, 'errores': e.detail})
+                    continue
+                for i in range(1, 5):
+                    datos.pop(f'imagen{i}_file', None)
+                datos.setdefault('fecha_creacion', date.today())
+                # bulk_create no dispara pre_save: la provincia se copia aquí
+                animales.append(Animal(empresa=empresa, provincia=empresa.provincia, **datos))
+
+            with transaction.atomic():
+                Animal.objects.bulk_create(animales)
+            yield len(animales), errores
+    finally:
+        bump('animales', f'peticiones:empresa:{empresa.pk}')
+
+
+def importar_animales(empresa, filas, lote=LOTE, max_errores=1000):
+    """
+    Importa todas las filas y devuelve un resumen:
+    `{'creados': n, 'total_errores': m, 'errores': [...]}` (como mucho `max_errores` detallados).
+    """
+    creados, total_errores, detalle = 0, 0, []
+    for creados_lote, errores in importar_por_lotes(empresa, filas, lote):
+        creados += creados_lote
+        total_errores += len(errores)
+        detalle.extend(errores[:max(max_errores - len(detalle), 0)])
+    return {'creados': creados, 'total_errores': total_errores, 'errores': detalle}
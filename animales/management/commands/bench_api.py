@@ -0,0 +1,296 @@
+import io
+import json
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment,
+)
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from animales.benchmarks import isolated_database, percentiles, sembrar
+from animales.models import Decision
+from animales.storage import get_image_storage
+from peticiones.models import Peticion
+from usuarios.authentication import invalidate_token
+
+ESCENARIOS = ('feed', 'decision', 'peticion', 'bandeja', 'resumen', 'aceptar', 'alta_animal')
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide latencia (p50/p95/p99), throughput y número de consultas de los flujos "
+        "principales de la API (feed, decisiones, peticiones, panel de la protectora y "
+        "alta de animales) sobre un dataset sintético reproducible en una base de datos "
+        "de test. Las subidas a Cloudinary van a un directorio temporal (LocalImageStorage) "
+        "y el correo al backend en memoria. Con --presupuesto falla si algún escenario "
+        "supera sus límites."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escenarios', default=','.join(ESCENARIOS))
+        parser.add_argument('--empresas', type=int, default=20)
+        parser.add_argument('--animales', type=int, default=5000)
+        parser.add_argument('--adoptantes', type=int, default=500)
+        parser.add_argument('--decisiones', type=int, default=200, help='Decisiones previas por adoptante.')
+        parser.add_argument('--peticiones', type=int, default=20, help='Peticiones pendientes por protectora.')
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--salida', help='Guarda los resultados en este fichero JSON.')
+        parser.add_argument('--presupuesto',
+                            help='JSON {escenario: {"p95": ms, "consultas": n}}; falla si se supera.')
+
+    def handle(self, *args, **options):
+        escenarios = options['escenarios'].split(',')
+        desconocidos = set(escenarios) - set(ESCENARIOS)
+        if desconocidos:
+            raise CommandError(f"Escenarios desconocidos: {', '.join(sorted(desconocidos))}")
+        presupuesto = None
+        if options['presupuesto']:
+            with open(options['presupuesto'], encoding='utf-8') as f:
+                presupuesto = json.load(f)
+
+        resultados = {}
+        with entorno_local(), isolated_database():
+            inicio = time.perf_counter()
+            datos = sembrar(
+                empresas=options['empresas'], animales=options['animales'],
+                adoptantes=options['adoptantes'], decisiones=options['decisiones'],
+                peticiones=options['peticiones'], semilla=options['semilla'],
+            )
+            self.stdout.write(
+                f"dataset: {len(datos.empresas)} protectoras, {options['animales']} animales, "
+                f"{len(datos.adoptantes)} adoptantes, {Decision.objects.count()} decisiones, "
+                f"{Peticion.objects.count()} peticiones ({time.perf_counter() - inicio:.1f}s)"
+            )
+            flujos = Flujos(datos)
+            for nombre in escenarios:
+                resultados[nombre] = medir(
+                    getattr(flujos, nombre), options['repeat'], options['warmup'], enfriar=flujos.enfriar
+                )
+                self._informe(nombre, resultados[nombre])
+
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as f:
+                json.dump(resultados, f, indent=2)
+        if presupuesto:
+            self._comprobar(resultados, presupuesto)
+
+    def _informe(self, nombre, r):
+        self.stdout.write(
+            f"{nombre:<12} n={r['n']:>5} {r['rps']:8.1f} req/s  p50={r['p50']:.2f}ms "
+            f"p95={r['p95']:.2f}ms p99={r['p99']:.2f}ms  consultas={r['consultas']} "
+            f"(en frío {r['consultas_frio']})  errores={r['errores']}"
+        )
+        if r['n'] < r['repeat']:
+            self.stdout.write(self.style.WARNING(
+                f"{nombre}: sin datos tras {r['n']} de {r['repeat']} repeticiones; "
+                f"amplía el dataset o reduce --repeat"
+            ))
+
+    def _comprobar(self, resultados, presupuesto):
+        fallos = []
+        for nombre, limites in presupuesto.items():
+            r = resultados.get(nombre)
+            if r is None:
+                continue
+            if r['errores']:
+                fallos.append(f"{nombre}: {r['errores']} respuestas con error")
+            # Medido sobre menos muestras de las pedidas: no es comparable con el presupuesto
+            if r['n'] < r['repeat']:
+                fallos.append(f"{nombre}: sin datos tras {r['n']} de {r['repeat']} repeticiones; "
+                              f"amplía el dataset o reduce --repeat")
+                continue
+            if r['consultas'] is None:
+                fallos.append(f"{nombre}: sin datos para contar las consultas; amplía el dataset")
+                continue
+            if 'p95' in limites and r['p95'] > limites['p95']:
+                fallos.append(f"{nombre}: p95 {r['p95']:.2f}ms > {limites['p95']}ms")
+            if 'consultas' in limites and r['consultas'] > limites['consultas']:
+                fallos.append(f"{nombre}: {r['consultas']} consultas > {limites['consultas']}")
+        if fallos:
+            raise CommandError('Presupuesto superado:\n' + '\n'.join(fallos))
+        self.stdout.write('Presupuesto cumplido.')
+
+
+@contextmanager
+def entorno_local():
+    """
+    Entorno de test sin servicios externos: correo en memoria (setup_test_environment),
+    imágenes guardadas en un directorio temporal en lugar de Cloudinary y subidas
+    síncronas para que su coste cuente en la latencia del alta.
+    """
+    setup_test_environment()
+    try:
+        with tempfile.TemporaryDirectory() as media, override_settings(
+            ANIMAL_IMAGE_STORAGE='animales.storage.LocalImageStorage',
+            ANIMAL_IMAGE_UPLOAD_DEFERRED=False,
+            MEDIA_ROOT=media,
+        ):
+            get_image_storage.cache_clear()
+            try:
+                yield
+            finally:
+                get_image_storage.cache_clear()
+    finally:
+        teardown_test_environment()
+
+
+def medir(flujo, repeat, warmup, muestras_consultas=5, enfriar=None):
+    """
+    Ejecuta `flujo(i)` (una petición; devuelve la respuesta o None si no quedan
+    datos) `warmup` + `repeat` veces. Las consultas se cuentan aparte, en unas
+    pocas llamadas más, para no sumar el coste de capturarlas a la latencia; la
+    primera de ellas tras `enfriar()` (cachés vacías), así que `consultas` (el
+    máximo) también cubre el camino sin caché.
+    """
+    i = 0
+    for _ in range(warmup):
+        flujo(i)
+        i += 1
+
+    latencias, errores = [], 0
+    inicio = time.perf_counter()
+    for _ in range(repeat):
+        t = time.perf_counter()
+        response = flujo(i)
+        if response is None:
+            break
+        latencias.append((time.perf_counter() - t) * 1000)
+        errores += response.status_code >= 400
+        i += 1
+    total = time.perf_counter() - inicio
+
+    consultas = []
+    for muestra in range(muestras_consultas):
+        if muestra == 0 and enfriar is not None:
+            enfriar()
+        with CaptureQueriesContext(connection) as capturadas:
+            response = flujo(i)
+        if response is None:
+            break
+        consultas.append(len(capturadas))
+        i += 1
+
+    return {
+        'repeat': repeat,
+        'n': len(latencias),
+        'rps': len(latencias) / total if total else 0.0,
+        **percentiles(latencias),
+        'consultas': max(consultas) if consultas else None,
+        'consultas_frio': consultas[0] if consultas else None,
+        'consultas_mediana': statistics.median(consultas) if consultas else None,
+        'errores': errores,
+    }
+
+
+class Flujos:
+    """Una petición por llamada de cada flujo, rotando entre adoptantes y protectoras."""
+
+    def __init__(self, datos):
+        self.adoptantes = datos.adoptantes
+        self.empresas = datos.empresas
+        tokens = [Token(key=Token.generate_key(), user=u) for u in self.adoptantes + self.empresas]
+        Token.objects.bulk_create(tokens)
+        self.tokens = {token.user_id: token.key for token in tokens}
+        self.client = APIClient()
+
+        decididos, pedidos = {}, {}
+        for usuario_id, animal_id in Decision.objects.values_list('usuario_id', 'animal_id'):
+            decididos.setdefault(usuario_id, set()).add(animal_id)
+        for usuario_id, animal_id in Peticion.objects.values_list('usuario_id', 'animal_id'):
+            pedidos.setdefault(usuario_id, set()).add(animal_id)
+        # Animales de su provincia aún sin decidir / sin pedir, en orden fijo
+        self.por_decidir = {
+            u.pk: iter(sorted(set(datos.animales.get(u.provincia, ())) - decididos.get(u.pk, set())))
+            for u in self.adoptantes
+        }
+        self.por_pedir = {
+            u.pk: iter(sorted(set(datos.animales.get(u.provincia, ())) - pedidos.get(u.pk, set())))
+            for u in self.adoptantes
+        }
+        # Una petición pendiente por animal: aceptarla rechaza las demás del mismo animal
+        empresas = {e.pk: e for e in self.empresas}
+        por_animal = {}
+        for peticion_id, animal_id, empresa_id in (
+            Peticion.objects.filter(estado='Pendiente', animal__estado='No adoptado')
+            .order_by('id').values_list('id', 'animal_id', 'animal__empresa_id')
+        ):
+            por_animal.setdefault(animal_id, (peticion_id, empresas[empresa_id]))
+        self.por_aceptar = iter(por_animal.values())
+        self.imagen = _jpeg()
+
+    def enfriar(self):
+        """Vacía las cachés de respuestas, versiones y tokens."""
+        cache.clear()
+        for key in self.tokens.values():
+            invalidate_token(key)
+
+    def _auth(self, usuario):
+        return {'HTTP_AUTHORIZATION': f'Token {self.tokens[usuario.pk]}'}
+
+    def _adoptante(self, i):
+        return self.adoptantes[i % len(self.adoptantes)]
+
+    def _empresa(self, i):
+        return self.empresas[i % len(self.empresas)]
+
+    def feed(self, i):
+        usuario = self._adoptante(i)
+        return self.client.get('/api/animales/?page_size=20', **self._auth(usuario))
+
+    def decision(self, i):
+        usuario = self._adoptante(i)
+        animal_id = next(self.por_decidir[usuario.pk], None)
+        if animal_id is None:
+            return None
+        return self.client.post('/api/decisiones/', {'animal': animal_id, 'tipo_decision': 'IGNORAR'},
+                                format='json', **self._auth(usuario))
+
+    def peticion(self, i):
+        usuario = self._adoptante(i)
+        animal_id = next(self.por_pedir[usuario.pk], None)
+        if animal_id is None:
+            return None
+        return self.client.post('/api/peticiones/', {'animal': animal_id}, format='json', **self._auth(usuario))
+
+    def bandeja(self, i):
+        return self.client.get('/api/peticiones/bandeja/?page_size=20', **self._auth(self._empresa(i)))
+
+    def resumen(self, i):
+        return self.client.get('/api/peticiones/resumen/', **self._auth(self._empresa(i)))
+
+    def aceptar(self, i):
+        # Cada aceptación reserva el animal y rechaza el resto de sus peticiones pendientes
+        siguiente = next(self.por_aceptar, None)
+        if siguiente is None:
+            return None
+        peticion_id, empresa = siguiente
+        return self.client.patch(f'/api/peticiones/{peticion_id}/', {'estado': 'Aceptada'},
+                                 format='json', **self._auth(empresa))
+
+    def alta_animal(self, i):
+        datos = {
+            'nombre': f'Alta {i}', 'especie': 'perro', 'genero': 'hembra', 'tamano': 'mediano',
+            'fecha_nacimiento': date(2022, 1, 1).isoformat(), 'raza': 'Mestizo',
+            'temperamento': 'Tranquilo', 'historia': 'Rescatada.', 'apto_ninos': 'bueno',
+            'compatibilidad_mascotas': 'selectivo', 'apto_piso_pequeno': 'bueno', 'esterilizado': True,
+            'imagen1_file': SimpleUploadedFile('foto.jpg', self.imagen, content_type='image/jpeg'),
+        }
+        return self.client.post('/api/animales/', datos, format='multipart', **self._auth(self._empresa(i)))
+
+
+def _jpeg(ancho=1200, alto=900):
+    buffer = io.BytesIO()
+    Image.new('RGB', (ancho, alto), (180, 120, 60)).save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
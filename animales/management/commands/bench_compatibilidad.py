@@ -0,0 +1,57 @@
+import random
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from animales.benchmarks import isolated_database, measure, crear_usuario, crear_animales
+from animales.compatibilidad import (
+    APTO_NINOS, COMPATIBILIDAD_MASCOTAS, APTO_PISO_PEQUENO, TAMANO,
+    codificar_animales, perfil_usuario, puntuar, mejores, ranking,
+)
+from animales.models import Animal
+
+PERFIL = dict(
+    tiene_ninos=True, tiene_otros_animales=True, tipo_vivienda=False, prefiere_pequenos=True,
+    acepta_enfermos=False, acepta_viejos=False, busca_tranquilo=True,
+)
+
+
+class Command(BaseCommand):
+    help = "Mide el motor de compatibilidad (codificación, puntuación y top-N) sobre N animales."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--n', type=int, default=100000, help='Número de animales candidatos.')
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--db', action='store_true',
+                            help='Mide también ranking() de extremo a extremo sobre una base de datos de test.')
+
+    def handle(self, *args, **options):
+        n, limite, repeat = options['n'], options['limit'], options['repeat']
+        rnd = random.Random(42)
+        hoy = date.today()
+        filas = [
+            (i, rnd.choice(list(APTO_NINOS)), rnd.choice(list(COMPATIBILIDAD_MASCOTAS)),
+             rnd.choice(list(APTO_PISO_PEQUENO)), rnd.choice(list(TAMANO)), rnd.random() < 0.15,
+             hoy - timedelta(days=rnd.randint(30, 6000)))
+            for i in range(n)
+        ]
+        pesos = perfil_usuario(SimpleNamespace(**PERFIL))
+        codificados = codificar_animales(filas, hoy)
+        total, _ = puntuar(codificados, pesos)
+
+        self._report('codificar', measure(lambda: codificar_animales(filas, hoy), repeat=repeat), n)
+        self._report('puntuar', measure(lambda: puntuar(codificados, pesos), repeat=repeat), n)
+        self._report(f'top-{limite}', measure(lambda: mejores(total, limite), repeat=repeat), n)
+
+        if options['db']:
+            with isolated_database():
+                empresa = crear_usuario('protectora@bench.local', 'EMPRESA', 'Madrid')
+                usuario = crear_usuario('adoptante@bench.local', 'USUARIO', 'Madrid', **PERFIL)
+                crear_animales(empresa, n)
+                feed = Animal.objects.feed_para(usuario)
+                self._report('ranking (db)', measure(lambda: ranking(feed, usuario, limite), repeat=repeat), n)
+
+    def _report(self, nombre, stats, n):
+        self.stdout.write(f"{nombre:<14} n={n}  p50={stats['p50']:.2f}ms  p95={stats['p95']:.2f}ms")
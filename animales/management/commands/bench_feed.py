@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+
+from animales.benchmarks import isolated_database, measure, crear_usuario, crear_animales, crear_decisiones
+from animales.models import Animal, Decision
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la latencia del feed de adopción a medida que crece el historial de "
+        "decisiones de un usuario. Se ejecuta sobre una base de datos de test temporal."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--decisiones', default='0,1000,10000,50000',
+                            help='Tamaños del historial de decisiones a medir, separados por comas.')
+        parser.add_argument('--disponibles', type=int, default=500,
+                            help='Animales que siguen disponibles en el feed.')
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--legacy', action='store_true',
+                            help='Mide también la consulta anterior basada en NOT IN.')
+
+    def handle(self, *args, **options):
+        pasos = sorted(int(n) for n in options['decisiones'].split(','))
+        page_size = options['page_size']
+
+        with isolated_database():
+            empresa = crear_usuario('protectora@bench.local', 'EMPRESA', 'Madrid')
+            usuario = crear_usuario('adoptante@bench.local', 'USUARIO', 'Madrid')
+            animal_ids = crear_animales(empresa, pasos[-1] + options['disponibles'])
+
+            def feed():
+                return list(Animal.objects.feed_para(usuario).order_by('fecha_creacion', 'id')[:page_size])
+
+            def feed_legacy():
+                vistos = Decision.objects.filter(usuario=usuario).values_list('animal_id', flat=True)
+                return list(
+                    Animal.objects.filter(estado='No adoptado', empresa__provincia=usuario.provincia)
+                    .exclude(id__in=vistos)
+                    .order_by('fecha_creacion', 'id')[:page_size]
+                )
+
+            decididas = 0
+            for paso in pasos:
+                crear_decisiones(usuario, animal_ids[decididas:paso])
+                decididas = paso
+
+                stats = measure(feed, repeat=options['repeat'])
+                linea = f"decisiones={paso:>7}  anti-join p50={stats['p50']:.2f}ms p95={stats['p95']:.2f}ms"
+                if options['legacy']:
+                    legacy = measure(feed_legacy, repeat=options['repeat'])
+                    linea += f"  | NOT IN p50={legacy['p50']:.2f}ms p95={legacy['p95']:.2f}ms"
+                self.stdout.write(linea)
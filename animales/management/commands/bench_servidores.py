@@ -0,0 +1,140 @@
+import asyncio
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.authtoken.models import Token
+
+from animales.benchmarks import (
+    isolated_database, crear_usuario, crear_animales, crear_adoptantes, carga_http, percentiles,
+)
+from peticiones.models import Peticion
+
+# Servidor -> (módulo que debe estar instalado, comando)
+SERVIDORES = {
+    'gunicorn': ('gunicorn', lambda workers, port: [
+        sys.executable, '-m', 'gunicorn', 'adoptaapi.wsgi:application',
+        '--workers', str(workers), '--bind', f'127.0.0.1:{port}', '--log-level', 'warning',
+    ]),
+    'uvicorn': ('uvicorn', lambda workers, port: [
+        sys.executable, '-m', 'uvicorn', 'adoptaapi.asgi:application',
+        '--workers', str(workers), '--host', '127.0.0.1', '--port', str(port),
+        '--log-level', 'warning', '--no-access-log',
+    ]),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el rendimiento de gunicorn (WSGI, workers síncronos) y uvicorn (ASGI, "
+        "vistas asíncronas de adoptaapi.asincrono) con muchos clientes concurrentes "
+        "contra el feed de animales y la bandeja de peticiones, sobre una base de datos "
+        "de test sembrada para la ocasión. Los servidores no instalados se omiten."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servidores', default='gunicorn,uvicorn')
+        parser.add_argument('--escenarios', default='publico,feed,bandeja',
+                            help='publico (anónimo, en caché), feed (USUARIO) y/o bandeja (EMPRESA).')
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--concurrencia', type=int, default=200)
+        parser.add_argument('--segundos', type=float, default=10)
+        parser.add_argument('--animales', type=int, default=2000)
+        parser.add_argument('--peticiones', type=int, default=500)
+        parser.add_argument('--page-size', type=int, default=20)
+
+    def handle(self, *args, **options):
+        servidores = options['servidores'].split(',')
+        desconocidos = set(servidores) - set(SERVIDORES)
+        if desconocidos:
+            raise CommandError(f"Servidores desconocidos: {', '.join(sorted(desconocidos))}")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            # Los servidores son otros procesos: con SQLite la base de datos tiene que ser un fichero
+            test_name = os.path.join(tmp, 'bench.sqlite3') if connection.vendor == 'sqlite' else None
+            with isolated_database(test_name=test_name):
+                escenarios = self._sembrar(options)
+                env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+                if connection.vendor == 'sqlite':
+                    env['SQLITE_PATH'] = connection.settings_dict['NAME']
+                else:
+                    env['DB_NAME'] = connection.settings_dict['NAME']
+
+                for servidor in servidores:
+                    modulo, comando = SERVIDORES[servidor]
+                    if importlib.util.find_spec(modulo) is None:
+                        self.stdout.write(f'{servidor}: no instalado, se omite (pip install {modulo})')
+                        continue
+                    self._medir(servidor, comando, env, escenarios, options)
+
+    def _sembrar(self, options):
+        page_size = options['page_size']
+        empresa = crear_usuario('protectora@bench.local', 'EMPRESA', 'Madrid')
+        usuario = crear_usuario('adoptante@bench.local', 'USUARIO', 'Madrid')
+        animal_ids = crear_animales(empresa, options['animales'])
+        adoptantes = crear_adoptantes(options['peticiones'], 'Madrid')
+        Peticion.objects.bulk_create([
+            Peticion(animal_id=animal_ids[i % len(animal_ids)], usuario=adoptante)
+            for i, adoptante in enumerate(adoptantes)
+        ])
+        token_usuario = Token.objects.create(user=usuario).key
+        token_empresa = Token.objects.create(user=empresa).key
+        todos = {
+            'publico': (f'/api/animales/?page_size={page_size}', {}),
+            'feed': (f'/api/animales/?page_size={page_size}', {'Authorization': f'Token {token_usuario}'}),
+            'bandeja': (f'/api/peticiones/bandeja/?page_size={page_size}',
+                        {'Authorization': f'Token {token_empresa}'}),
+        }
+        return {nombre: todos[nombre] for nombre in options['escenarios'].split(',')}
+
+    def _medir(self, servidor, comando, env, escenarios, options):
+        port = _puerto_libre()
+        proceso = subprocess.Popen(comando(options['workers'], port), env=env)
+        try:
+            _esperar_puerto(port, proceso)
+            for nombre, (ruta, cabeceras) in escenarios.items():
+                # Calentamiento: arranque de workers, cachés de tokens y respuestas
+                asyncio.run(carga_http('127.0.0.1', port, ruta, cabeceras, concurrencia=options['workers'], segundos=1))
+                resultado = asyncio.run(carga_http(
+                    '127.0.0.1', port, ruta, cabeceras,
+                    concurrencia=options['concurrencia'], segundos=options['segundos'],
+                ))
+                stats = percentiles(resultado['latencias'])
+                estados = ' '.join(f'{codigo}={n}' for codigo, n in sorted(resultado['estados'].items()))
+                self.stdout.write(
+                    f"{servidor:>8} {nombre:>8}: {len(resultado['latencias']) / resultado['segundos']:8.1f} req/s "
+                    f"p50={stats['p50']:.1f}ms p95={stats['p95']:.1f}ms p99={stats['p99']:.1f}ms "
+                    f"[{estados}] errores={resultado['errores']}"
+                )
+        finally:
+            proceso.terminate()
+            try:
+                proceso.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proceso.kill()
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _esperar_puerto(port, proceso, timeout=30):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise CommandError(f'El servidor terminó al arrancar (código {proceso.returncode}).')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f'El servidor no abrió el puerto {port} en {timeout} s.')
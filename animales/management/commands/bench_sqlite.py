@@ -0,0 +1,112 @@
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+
+from animales.benchmarks import isolated_database, crear_usuario, crear_animales
+from animales.models import Animal, Decision
+
+# Comportamiento por defecto de Django con SQLite: journal de rollback, timeout de 5 s
+PERFILES = {
+    'rollback': {'timeout': 5, 'init_command': 'PRAGMA journal_mode=DELETE;'},
+    'wal': settings.SQLITE_TUNED_OPTIONS,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el perfil SQLite por defecto (journal de rollback) con el perfil "
+        "ajustado (WAL, ver SQLITE_TUNED_OPTIONS) con escritores de decisiones y "
+        "lectores del feed concurrentes, sobre un fichero de base de datos temporal."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--segundos', type=float, default=5, help='Duración de cada ronda.')
+        parser.add_argument('--escritores', type=int, default=4)
+        parser.add_argument('--lectores', type=int, default=4)
+        parser.add_argument('--animales', type=int, default=20000)
+        parser.add_argument('--page-size', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('bench_sqlite solo tiene sentido con DB_ENGINE=sqlite.')
+
+        with tempfile.TemporaryDirectory() as tmp, \
+                isolated_database(test_name=os.path.join(tmp, 'bench.sqlite3')):
+            empresa = crear_usuario('protectora@bench.local', 'EMPRESA', 'Madrid')
+            lector = crear_usuario('lector@bench.local', 'USUARIO', 'Madrid')
+            escritores = [
+                crear_usuario(f'escritor{i}@bench.local', 'USUARIO', 'Madrid')
+                for i in range(options['escritores'])
+            ]
+            animal_ids = crear_animales(empresa, options['animales'])
+
+            for perfil, opciones in PERFILES.items():
+                Decision.objects.all().delete()
+                resultado = self._ronda(opciones, lector, escritores, animal_ids, options)
+                self.stdout.write(
+                    f"{perfil:>8}: escrituras={resultado['escrituras'] / options['segundos']:8.1f}/s "
+                    f"lecturas={resultado['lecturas'] / options['segundos']:8.1f}/s "
+                    f"lectura p50={resultado['p50']:.2f}ms p95={resultado['p95']:.2f}ms "
+                    f"errores={resultado['errores']}"
+                )
+
+    def _ronda(self, opciones, lector, escritores, animal_ids, options):
+        # Los hilos abren conexiones nuevas con las OPTIONS del alias
+        connections.close_all()
+        connection.settings_dict['OPTIONS'] = dict(opciones)
+
+        fin = time.monotonic() + options['segundos']
+        lock = threading.Lock()
+        resultado = {'escrituras': 0, 'lecturas': 0, 'errores': 0, 'latencias': []}
+
+        def escritor(usuario):
+            escrituras = errores = 0
+            try:
+                for animal_id in animal_ids:
+                    if time.monotonic() >= fin:
+                        break
+                    try:
+                        Decision.objects.create(usuario=usuario, animal_id=animal_id, tipo_decision='IGNORAR')
+                        escrituras += 1
+                    except OperationalError:
+                        errores += 1
+            finally:
+                connections.close_all()
+            with lock:
+                resultado['escrituras'] += escrituras
+                resultado['errores'] += errores
+
+        def lectura():
+            latencias, errores = [], 0
+            try:
+                while time.monotonic() < fin:
+                    inicio = time.perf_counter()
+                    try:
+                        list(Animal.objects.feed_para(lector).order_by('fecha_creacion', 'id')[:options['page_size']])
+                        latencias.append((time.perf_counter() - inicio) * 1000)
+                    except OperationalError:
+                        errores += 1
+            finally:
+                connections.close_all()
+            with lock:
+                resultado['lecturas'] += len(latencias)
+                resultado['latencias'] += latencias
+                resultado['errores'] += errores
+
+        hilos = [threading.Thread(target=escritor, args=(u,)) for u in escritores]
+        hilos += [threading.Thread(target=lectura) for _ in range(options['lectores'])]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        latencias = sorted(resultado.pop('latencias')) or [0.0]
+        resultado['p50'] = statistics.median(latencias)
+        resultado['p95'] = latencias[min(len(latencias) - 1, int(len(latencias) * 0.95))]
+        return resultado
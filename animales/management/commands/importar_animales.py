@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from animales.importacion import (
+    FORMATOS, LOTE, ArchivoInvalido, detectar_formato, importar_por_lotes, leer_filas,
+)
+from usuarios.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa animales desde un fichero CSV o JSONL (una fila/objeto por animal, con "
+        "los campos del modelo Animal) para una empresa. Las filas con errores se "
+        "informan y se omiten."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichero')
+        parser.add_argument('--empresa', required=True, help='Email (username) de la empresa.')
+        parser.add_argument('--formato', choices=FORMATOS,
+                            help='Por defecto se deduce de la extensión del fichero.')
+        parser.add_argument('--lote', type=int, default=LOTE, help='Filas por lote de inserción.')
+
+    def handle(self, *args, **options):
+        formato = options['formato'] or detectar_formato(options['fichero'])
+        if formato is None:
+            raise CommandError('No se puede deducir el formato; use --formato csv|jsonl.')
+        try:
+            empresa = CustomUser.objects.get(username=options['empresa'], tipo='EMPRESA')
+        except CustomUser.DoesNotExist:
+            raise CommandError(f"No existe la empresa {options['empresa']}.")
+
+        creados = fallidos = 0
+        with open(options['fichero'], 'rb') as fichero:
+            try:
+                for creados_lote, errores in importar_por_lotes(empresa, leer_filas(fichero, formato), options['lote']):
+                    creados += creados_lote
+                    fallidos += len(errores)
+                    for error in errores:
+                        self.stderr.write(f"Fila {error['fila']}: {error['errores']}")
+                    self.stdout.write(f'{creados} animales importados...')
+            except ArchivoInvalido as e:
+                raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(f'Importación terminada: {creados} creados, {fallidos} con errores.'))
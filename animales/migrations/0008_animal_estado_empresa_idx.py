@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 15:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animales', '0007_animal_fecha_creacion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='animal',
+            index=models.Index(fields=['estado', 'empresa'], name='animal_estado_empresa_idx'),
+        ),
+    ]
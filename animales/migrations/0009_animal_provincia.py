@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-18 15:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copiar_provincia_empresa(apps, schema_editor):
+    Animal = apps.get_model('animales', 'Animal')
+    CustomUser = apps.get_model('usuarios', 'CustomUser')
+    for empresa_id, provincia in CustomUser.objects.filter(animales__isnull=False).values_list('id', 'provincia').distinct():
+        Animal.objects.filter(empresa_id=empresa_id).update(provincia=provincia)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animales', '0008_animal_estado_empresa_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='animal',
+            name='provincia',
+            field=models.CharField(blank=True, choices=[('Álava', 'Álava'), ('Albacete', 'Albacete'), ('Alicante', 'Alicante'), ('Almería', 'Almería'), ('Asturias', 'Asturias'), ('Ávila', 'Ávila'), ('Badajoz', 'Badajoz'), ('Barcelona', 'Barcelona'), ('Burgos', 'Burgos'), ('Cáceres', 'Cáceres'), ('Cádiz', 'Cádiz'), ('Castellón', 'Castellón'), ('Ciudad Real', 'Ciudad Real'), ('Córdoba', 'Córdoba'), ('Cuenca', 'Cuenca'), ('Gerona', 'Gerona'), ('Granada', 'Granada'), ('Guadalajara', 'Guadalajara'), ('Guipúzcoa', 'Guipúzcoa'), ('Huelva', 'Huelva'), ('Huesca', 'Huesca'), ('Jaén', 'Jaén'), ('La Rioja', 'La Rioja'), ('Las Palmas', 'Las Palmas'), ('León', 'León'), ('Lérida', 'Lérida'), ('Lugo', 'Lugo'), ('Madrid', 'Madrid'), ('Málaga', 'Málaga'), ('Murcia', 'Murcia'), ('Navarra', 'Navarra'), ('Orense', 'Orense'), ('Palencia', 'Palencia'), ('Pontevedra', 'Pontevedra'), ('Salamanca', 'Salamanca'), ('Segovia', 'Segovia'), ('Sevilla', 'Sevilla'), ('Soria', 'Soria'), ('Tarragona', 'Tarragona'), ('Teruel', 'Teruel'), ('Toledo', 'Toledo'), ('Valencia', 'Valencia'), ('Valladolid', 'Valladolid'), ('Vizcaya', 'Vizcaya'), ('Zamora', 'Zamora'), ('Zaragoza', 'Zaragoza')], editable=False, max_length=50),
+        ),
+        migrations.RunPython(copiar_provincia_empresa, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='animal',
+            index=models.Index(fields=['provincia', 'estado', 'fecha_creacion', 'id'], name='animal_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-18 15:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animales', '0009_animal_provincia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='animal',
+            name='miniatura1',
+            field=models.URLField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='animal',
+            name='miniatura2',
+            field=models.URLField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='animal',
+            name='miniatura3',
+            field=models.URLField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='animal',
+            name='miniatura4',
+            field=models.URLField(blank=True, null=True),
+        ),
+    ]
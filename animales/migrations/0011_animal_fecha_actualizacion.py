@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 15:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animales', '0010_animal_miniaturas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='animal',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
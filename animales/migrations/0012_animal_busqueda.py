@@ -0,0 +1,91 @@
+from django.db import migrations
+
+# SQLite: tabla FTS5 con contenido externo (lee el texto de animales_animal) y
+# triggers que la mantienen al insertar, editar o borrar. Los triggers se
+# recrean también en post_migrate (ver animales.busqueda), porque SQLite borra
+# los triggers de una tabla cuando una migración la reconstruye.
+SQLITE_CREAR = [
+    """
+    CREATE VIRTUAL TABLE animales_animal_fts USING fts5(
+        nombre, raza, temperamento, historia,
+        content='animales_animal', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    "INSERT INTO animales_animal_fts(animales_animal_fts) VALUES ('rebuild')",
+]
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS animales_animal_fts_ai AFTER INSERT ON animales_animal BEGIN
+        INSERT INTO animales_animal_fts(rowid, nombre, raza, temperamento, historia)
+        VALUES (new.id, new.nombre, new.raza, new.temperamento, new.historia);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS animales_animal_fts_ad AFTER DELETE ON animales_animal BEGIN
+        INSERT INTO animales_animal_fts(animales_animal_fts, rowid, nombre, raza, temperamento, historia)
+        VALUES ('delete', old.id, old.nombre, old.raza, old.temperamento, old.historia);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS animales_animal_fts_au
+    AFTER UPDATE OF nombre, raza, temperamento, historia ON animales_animal BEGIN
+        INSERT INTO animales_animal_fts(animales_animal_fts, rowid, nombre, raza, temperamento, historia)
+        VALUES ('delete', old.id, old.nombre, old.raza, old.temperamento, old.historia);
+        INSERT INTO animales_animal_fts(rowid, nombre, raza, temperamento, historia)
+        VALUES (new.id, new.nombre, new.raza, new.temperamento, new.historia);
+    END
+    """,
+]
+SQLITE_BORRAR = [
+    'DROP TRIGGER IF EXISTS animales_animal_fts_ai',
+    'DROP TRIGGER IF EXISTS animales_animal_fts_ad',
+    'DROP TRIGGER IF EXISTS animales_animal_fts_au',
+    'DROP TABLE IF EXISTS animales_animal_fts',
+]
+
+# PostgreSQL: índice GIN sobre la expresión tsvector (PostgreSQL lo mantiene solo)
+POSTGRES_CREAR = [
+    """
+    CREATE INDEX animal_busqueda_idx ON animales_animal USING GIN (to_tsvector('spanish',
+        coalesce(nombre, '') || ' ' || coalesce(raza, '') || ' ' ||
+        coalesce(temperamento, '') || ' ' || coalesce(historia, '')))
+    """,
+]
+POSTGRES_BORRAR = ['DROP INDEX IF EXISTS animal_busqueda_idx']
+
+
+def _ejecutar(schema_editor, sentencias):
+    for sql in sentencias:
+        schema_editor.execute(sql)
+
+
+def crear_indice(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            if not cursor.fetchone()[0]:
+                return  # sin FTS5 la búsqueda usa el modo de respaldo (icontains)
+        _ejecutar(schema_editor, SQLITE_CREAR + SQLITE_TRIGGERS)
+    elif vendor == 'postgresql':
+        _ejecutar(schema_editor, POSTGRES_CREAR)
+
+
+def borrar_indice(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _ejecutar(schema_editor, SQLITE_BORRAR)
+    elif vendor == 'postgresql':
+        _ejecutar(schema_editor, POSTGRES_BORRAR)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animales', '0011_animal_fecha_actualizacion'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, borrar_indice),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animales', '0012_animal_busqueda'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='animal',
+            index=models.Index(fields=['provincia', 'estado', 'especie', 'fecha_creacion', 'id'], name='animal_feed_especie_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='animal',
+            index=models.Index(fields=['estado', 'especie', 'tamano', 'fecha_nacimiento'], name='animal_filtro_idx'),
+        ),
+    ]
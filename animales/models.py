@@ -1,8 +1,25 @@
 from django.db import models
-from usuarios.models import CustomUser
+from usuarios.models import CustomUser, PROVINCIAS_CHOICES
 from django.conf import settings
 from datetime import date
 
+
+class AnimalQuerySet(models.QuerySet):
+    def feed_para(self, user):
+        """
+        Animales no adoptados de la provincia del usuario sobre los que aún no
+        ha decidido. Usa un anti-join (NOT EXISTS) contra Decision en vez de
+        un NOT IN con todos los ids vistos, así el coste no crece con el
+        historial de decisiones del usuario. La provincia se lee de la copia
+        desnormalizada en Animal, sin join con la empresa.
+        """
+        vistos = Decision.objects.filter(usuario=user, animal=models.OuterRef('pk'))
+        return self.filter(
+            estado='No adoptado',
+            provincia=user.provincia,
+        ).exclude(models.Exists(vistos))
+
+
 class Animal(models.Model):
     ESPECIE_CHOICES = [
         ('perro', 'Perro'),
@@ -53,6 +70,8 @@ class Animal(models.Model):
 
     empresa = models.ForeignKey(CustomUser, on_delete=models.CASCADE, limit_choices_to={'tipo': 'EMPRESA'}, related_name='animales') 
     fecha_creacion = models.DateField(default=date.today)
+    # Ojo: los .update() no tocan auto_now; hay que pasar fecha_actualizacion a mano
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
     nombre = models.CharField(max_length=100)
     especie = models.CharField(max_length=10, choices=ESPECIE_CHOICES)
     genero = models.CharField(max_length=10, choices=GENERO_CHOICES)
@@ -72,7 +91,26 @@ class Animal(models.Model):
     imagen2 = models.URLField(blank=True, null=True)
     imagen3 = models.URLField(blank=True, null=True)
     imagen4 = models.URLField(blank=True, null=True)
+    miniatura1 = models.URLField(blank=True, null=True)
+    miniatura2 = models.URLField(blank=True, null=True)
+    miniatura3 = models.URLField(blank=True, null=True)
+    miniatura4 = models.URLField(blank=True, null=True)
     estado = models.CharField(max_length=30, choices=ESTADO_CHOICES, default='No adoptado')
+    # Copia de empresa.provincia, mantenida por animales.signals
+    provincia = models.CharField(max_length=50, choices=PROVINCIAS_CHOICES, blank=True, editable=False)
+
+    objects = AnimalQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['estado', 'empresa'], name='animal_estado_empresa_idx'),
+            models.Index(fields=['provincia', 'estado', 'fecha_creacion', 'id'], name='animal_feed_idx'),
+            # Filtros de AnimalFilter: feed filtrado por especie sin perder el orden del índice,
+            # y listado público por especie/tamaño/edad
+            models.Index(fields=['provincia', 'estado', 'especie', 'fecha_creacion', 'id'],
+                         name='animal_feed_especie_idx'),
+            models.Index(fields=['estado', 'especie', 'tamano', 'fecha_nacimiento'], name='animal_filtro_idx'),
+        ]
 
     def __str__(self):
         return self.nombre
@@ -89,7 +127,9 @@ class Decision(models.Model):
     fecha_decision = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        unique_together = ('usuario', 'animal')  # Un usuario solo puede decidir una vez sobre un animal
+        # Un usuario solo puede decidir una vez sobre un animal. El índice único
+        # (usuario, animal) también resuelve el NOT EXISTS del feed.
+        unique_together = ('usuario', 'animal')
 
     def __str__(self):
         return f"{self.usuario.username} - {self.animal.nombre} - {self.tipo_decision}"
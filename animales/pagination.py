@@ -0,0 +1,14 @@
+from adoptaapi.pagination import KeysetCursorPagination
+
+
+class AnimalFeedPagination(KeysetCursorPagination):
+    """
+    Cursor pagination for the animal feed, oldest animals first.
+    Activated with `?page_size=N` and continued with the returned `cursor`.
+    """
+    ordering = ('fecha_creacion', 'id')
+
+
+class AnimalBusquedaPagination(AnimalFeedPagination):
+    """Same cursor pagination for search results, but always on: a search never returns the whole catalogue."""
+    opt_in = False
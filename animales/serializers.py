@@ -1,7 +1,11 @@
 from rest_framework import serializers
 from .models import Animal, Decision
-import cloudinary.uploader
+from django.conf import settings
 from datetime import date
+from .uploads import subir_imagenes, programar_subida, preparar, campos_imagen
+import logging
+
+logger = logging.getLogger(__name__)
 
 class AnimalSerializer(serializers.ModelSerializer):
     imagen1_file = serializers.ImageField(write_only=True, required=False)
@@ -12,31 +16,40 @@ class AnimalSerializer(serializers.ModelSerializer):
     class Meta:
         model = Animal
         exclude = ['empresa']  # no se envía desde el frontend
-        read_only_fields = ('imagen1', 'imagen2', 'imagen3', 'imagen4')
+        read_only_fields = ('imagen1', 'imagen2', 'imagen3', 'imagen4',
+                            'miniatura1', 'miniatura2', 'miniatura3', 'miniatura4')
 
     def create(self, validated_data):
-        images = {}
+        archivos = {}
         for i in range(1, 5):
-            image_field_name = f'imagen{i}_file'
-            image_file = validated_data.pop(image_field_name, None)
+            image_file = validated_data.pop(f'imagen{i}_file', None)
             if image_file:
-                try:
-                    upload_result = cloudinary.uploader.upload(image_file)
-                    images[f'imagen{i}'] = upload_result['secure_url']
-                except Exception as e:
-                    # Handle upload error, maybe log it or raise a validation error
-                    print(f"Error uploading {image_field_name}: {e}") # Or raise serializers.ValidationError
-            else:
-                images[f'imagen{i}'] = None # Or keep blank=True in model and don't set
-
-        # Assign uploaded image URLs to the model fields
-        for i in range(1, 5):
-            validated_data[f'imagen{i}'] = images.get(f'imagen{i}')
+                archivos[i] = image_file
+            validated_data[f'imagen{i}'] = None
+            validated_data[f'miniatura{i}'] = None
 
         # Set default fecha_creacion if not provided
         if 'fecha_creacion' not in validated_data:
             validated_data['fecha_creacion'] = date.today()
 
+        if settings.ANIMAL_IMAGE_UPLOAD_DEFERRED:
+            # El animal se guarda ya; las URLs se rellenan al terminar las subidas.
+            # Se preprocesa aquí para retener en memoria solo las versiones reducidas.
+            animal = Animal.objects.create(**validated_data)
+            preparados = {}
+            for i, image_file in archivos.items():
+                try:
+                    preparados[i] = preparar(image_file, copiar=True)
+                except Exception as e:
+                    logger.warning('Error preparing imagen%s: %s', i, e)
+            if preparados:
+                programar_subida(animal.pk, preparados)
+            return animal
+
+        # Las cuatro subidas van en paralelo; si alguna falla el animal se crea sin ella
+        urls, _ = subir_imagenes(archivos)
+        validated_data.update(campos_imagen(urls))
+
         animal = Animal.objects.create(**validated_data)
         return animal
 
@@ -46,6 +59,14 @@ class DecisionSerializer(serializers.ModelSerializer):
         fields = ['id', 'usuario', 'animal', 'tipo_decision', 'fecha_decision']
         read_only_fields = ['usuario', 'fecha_decision']
 
+class DecisionLoteItemSerializer(serializers.Serializer):
+    animal = serializers.IntegerField(min_value=1)
+    tipo_decision = serializers.ChoiceField(choices=Decision.TIPO_DECISION_CHOICES)
+
+class DecisionLoteSerializer(serializers.Serializer):
+    """Lote de decisiones enviado de una vez (por ejemplo, swipes guardados sin conexión)."""
+    decisiones = serializers.ListField(child=serializers.JSONField(), allow_empty=False, max_length=500)
+
 class AnimalImageSerializer(serializers.Serializer):
     image = serializers.ImageField(required=True)
     position = serializers.IntegerField(min_value=1, max_value=4, required=True)
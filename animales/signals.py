@@ -0,0 +1,83 @@
+from importlib import import_module
+
+from django.db import connections
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, post_migrate
+from django.dispatch import receiver
+from django.utils import timezone
+
+from adoptaapi.versiones import bump
+from usuarios.models import CustomUser
+from .busqueda import FTS_TABLE
+from .models import Animal, Decision
+
+
+@receiver(pre_save, sender=Animal)
+def sincronizar_provincia_animal(sender, instance, **kwargs):
+    """Copia la provincia de la empresa al crear el animal o al cambiar de empresa."""
+    if instance.empresa_id is None:
+        return
+    if instance._state.adding or Animal.empresa.is_cached(instance):
+        instance.provincia = instance.empresa.provincia
+
+
+@receiver(post_save, sender=CustomUser)
+def propagar_provincia_empresa(sender, instance, created, update_fields=None, **kwargs):
+    """Cuando una empresa cambia de provincia, actualiza la copia en sus animales."""
+    if created or instance.tipo != 'EMPRESA':
+        return
+    if update_fields is not None and 'provincia' not in update_fields:
+        return
+    actualizados = Animal.objects.filter(empresa=instance).exclude(
+        provincia=instance.provincia
+    ).update(provincia=instance.provincia, fecha_actualizacion=timezone.now())
+    if actualizados:
+        bump('animales')
+
+
+@receiver(post_save, sender=Animal)
+@receiver(post_delete, sender=Animal)
+def invalidar_cache_animales(sender, instance, **kwargs):
+    """Invalida las respuestas cacheadas del listado público (ver AnimalViewSet)."""
+    bump('animales')
+
+
+def invalidar_decisiones(usuario_ids=(), empresa_ids=()):
+    """
+    Incrementa las versiones de los listados de decisiones afectados. Se llama
+    a mano tras cada escritura (no hay señales en Decision para que los borrados
+    masivos sigan siendo un único DELETE).
+    """
+    bump(*{f'decisiones:usuario:{pk}' for pk in usuario_ids},
+         *{f'decisiones:empresa:{pk}' for pk in empresa_ids})
+
+
+@receiver(pre_delete, sender=Animal)
+def invalidar_decisiones_animal(sender, instance, **kwargs):
+    """Las decisiones se borran en cascada con el animal, sin señales propias."""
+    usuarios = Decision.objects.filter(animal=instance).values_list('usuario_id', flat=True)
+    invalidar_decisiones(usuarios, [instance.empresa_id])
+
+
+@receiver(pre_delete, sender=CustomUser)
+def invalidar_decisiones_usuario(sender, instance, **kwargs):
+    """Las decisiones del usuario también se borran en cascada con él."""
+    empresas = (Decision.objects.filter(usuario=instance)
+                .values_list('animal__empresa_id', flat=True).distinct())
+    invalidar_decisiones([instance.pk], empresas)
+
+
+@receiver(post_migrate)
+def asegurar_triggers_busqueda(sender, using='default', **kwargs):
+    """
+    SQLite borra los triggers de una tabla cuando una migración la reconstruye
+    (p. ej. al alterar un campo): se vuelven a crear después de cada migrate.
+    """
+    if sender.name != 'animales':
+        return
+    conexion = connections[using]
+    if conexion.vendor != 'sqlite' or FTS_TABLE not in conexion.introspection.table_names():
+        return
+    migracion = import_module('animales.migrations.0012_animal_busqueda')
+    with conexion.cursor() as cursor:
+        for sql in migracion.SQLITE_TRIGGERS:
+            cursor.execute(sql)
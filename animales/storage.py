@@ -0,0 +1,62 @@
+"""
+Backends de almacenamiento para las imágenes de los animales.
+
+El backend activo se elige con `settings.ANIMAL_IMAGE_STORAGE` (ruta de la
+clase). En producción se usa Cloudinary; `LocalImageStorage` guarda en
+MEDIA_ROOT y sirve para desarrollo y tests sin acceso a red.
+"""
+import re
+import uuid
+from functools import lru_cache
+from urllib.parse import unquote, urlsplit
+
+import cloudinary.uploader
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils.module_loading import import_string
+
+
+class ImageStorage:
+    """
+    Interfaz mínima: `upload` recibe un fichero y devuelve su URL pública;
+    `delete` borra lo subido a partir de esa URL.
+    """
+
+    def upload(self, file, timeout=None):
+        raise NotImplementedError
+
+    def delete(self, url):
+        raise NotImplementedError
+
+
+class CloudinaryImageStorage(ImageStorage):
+    def upload(self, file, timeout=None):
+        return cloudinary.uploader.upload(file, timeout=timeout)['secure_url']
+
+    def delete(self, url):
+        cloudinary.uploader.destroy(self.public_id(url), invalidate=True)
+
+    @staticmethod
+    def public_id(url):
+        # https://res.cloudinary.com/<cloud>/image/upload/v1712345678/carpeta/nombre.jpg -> carpeta/nombre
+        partes = urlsplit(url).path.split('/upload/', 1)[1].split('/')
+        if re.fullmatch(r'v\d+', partes[0]):
+            partes = partes[1:]
+        return unquote('/'.join(partes).rsplit('.', 1)[0])
+
+
+class LocalImageStorage(ImageStorage):
+    def upload(self, file, timeout=None):
+        nombre = getattr(file, 'name', None) or 'imagen'
+        path = default_storage.save(f'animales/{uuid.uuid4().hex}_{nombre}', file)
+        return default_storage.url(path)
+
+    def delete(self, url):
+        base = default_storage.base_url
+        if url.startswith(base):
+            default_storage.delete(unquote(url[len(base):]))
+
+
+@lru_cache(maxsize=None)
+def get_image_storage():
+    return import_string(settings.ANIMAL_IMAGE_STORAGE)()
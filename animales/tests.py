@@ -1,3 +1,569 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from PIL import Image, UnidentifiedImageError
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from . import busqueda
+from .benchmarks import crear_animales, crear_decisiones, crear_usuario
+from .compatibilidad import CAMPOS, codificar_animales, mejores, perfil_usuario, puntuar
+from .filters import _hace_anios
+from .imagenes import preprocesar_imagen
+from .storage import ImageStorage, LocalImageStorage, get_image_storage
+from .uploads import subir_imagenes
+from .models import Animal, Decision
+
+
+class DecisionesETagTests(TestCase):
+    def setUp(self):
+        self.empresa = crear_usuario('protectora@example.com', 'EMPRESA', 'Madrid')
+        self.adoptante = crear_usuario('adoptante@example.com', 'USUARIO', 'Madrid')
+        animal_id, = crear_animales(self.empresa, 1)
+        Decision.objects.create(usuario=self.adoptante, animal_id=animal_id, tipo_decision='SOLICITAR')
+        self.client = APIClient()
+        self.client.force_authenticate(self.empresa)
+
+    @override_settings(VERSIONES_COMPARTIDAS=False)
+    def test_sin_versiones_compartidas_no_hay_etag(self):
+        response = self.client.get('/api/decisiones/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+    @override_settings(VERSIONES_COMPARTIDAS=True)
+    def test_borrar_usuario_cambia_el_etag_de_la_empresa(self):
+        etag = self.client.get('/api/decisiones/')['ETag']
+        self.assertEqual(self.client.get('/api/decisiones/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.adoptante.delete()
+
+        response = self.client.get('/api/decisiones/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+
+
+class ListadoPublicoETagTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        empresa = crear_usuario('protectora@example.com', 'EMPRESA', 'Madrid')
+        crear_animales(empresa, 3)
+
+    def test_etag_distinto_por_url(self):
+        primera = self.client.get('/api/animales/?page_size=1')
+        segunda = self.client.get('/api/animales/?page_size=2')
+        self.assertNotEqual(primera['ETag'], segunda['ETag'])
+        self.assertEqual(
+            self.client.get('/api/animales/?page_size=1', HTTP_IF_NONE_MATCH=primera['ETag']).status_code, 304
+        )
+
+    def test_etag_cambia_con_el_contenido_aunque_no_cambie_la_version(self):
+        # Versión desactualizada de otro worker: solo caduca la entrada (TTL)
+        with mock.patch('animales.views.get_version', return_value=1):
+            etag = self.client.get('/api/animales/')['ETag']
+            Animal.objects.filter(pk=Animal.objects.first().pk).update(nombre='Renombrado')
+            cache.clear()
+            response = self.client.get('/api/animales/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class CursorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        empresa = crear_usuario('protectora@example.com', 'EMPRESA', 'Madrid')
+        crear_animales(empresa, 5)
+
+    def _cursor(self, position):
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def test_recorre_todas_las_paginas(self):
+        vistos, url = [], '/api/animales/?page_size=2'
+        while url:
+            data = self.client.get(url).json()
+            vistos += [animal['id'] for animal in data['results']]
+            url = data['next']
+        self.assertEqual(sorted(vistos), sorted(Animal.objects.values_list('id', flat=True)))
+
+    def test_cursor_invalido_es_404(self):
+        cursores = ['no-es-base64!', self._cursor({'a': 1}), self._cursor([1]), self._cursor(['x', 1]),
+                    self._cursor([None, None]), self._cursor([{'a': 1}, 1]), self._cursor(['2024-01-01', 'x']),
+                    self._cursor([True, 1])]
+        for cursor in cursores:
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/animales/', {'page_size': 2, 'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+
+
+class ImportacionTests(TestCase):
+    CABECERA = ('nombre,especie,genero,fecha_nacimiento,tamano,raza,temperamento,historia,'
+                'apto_ninos,compatibilidad_mascotas,apto_piso_pequeno,esterilizado\n')
+
+    def setUp(self):
+        self.empresa = crear_usuario('protectora@example.com', 'EMPRESA', 'Madrid')
+        self.client = APIClient()
+        self.client.force_authenticate(self.empresa)
+
+    def _importar(self, contenido):
+        archivo = SimpleUploadedFile('animales.csv', contenido, content_type='text/csv')
+        return self.client.post('/api/animales/importar/', {'archivo': archivo}, format='multipart')
+
+    def test_importa_csv_utf8(self):
+        fila = 'Peña,perro,hembra,2020-01-01,mediano,Mestizo,Tranquila,Rescatada,bueno,selectivo,bueno,true\n'
+        response = self._importar(('\ufeff' + self.CABECERA + fila).encode('utf-8'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['creados'], 1)
+        self.assertEqual(Animal.objects.get().nombre, 'Peña')
+
+    def test_csv_latin1_es_400_sin_importar_nada(self):
+        filas = ''.join(
+            f'Animal {i},perro,hembra,2020-01-01,mediano,Mestizo,Tranquila,Rescatada,bueno,selectivo,bueno,true\n'
+            for i in range(3)
+        ) + 'Peña,perro,hembra,2020-01-01,mediano,Mestizo,Tranquila,Rescatada,bueno,selectivo,bueno,true\n'
+        response = self._importar((self.CABECERA + filas).encode('latin-1'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('línea 5', response.json()['error'])
+        self.assertFalse(Animal.objects.exists())
+
+
+class DecisionLoteTests(TestCase):
+    def setUp(self):
+        empresa = crear_usuario('protectora@example.com', 'EMPRESA', 'Madrid')
+        self.adoptante = crear_usuario('adoptante@example.com', 'USUARIO', 'Madrid')
+        self.animales = crear_animales(empresa, 3)
+        Decision.objects.create(usuario=self.adoptante, animal_id=self.animales[0], tipo_decision='IGNORAR')
+        self.client = APIClient()
+        self.client.force_authenticate(self.adoptante)
+
+    def _lote(self):
+        decisiones = [{'animal': animal_id, 'tipo_decision': 'SOLICITAR'} for animal_id in self.animales]
+        return self.client.post('/api/decisiones/lote/', {'decisiones': decisiones + decisiones[1:2]},
+                                format='json')
+
+    def test_estados(self):
+        response = self._lote()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['creadas'], 2)
+        self.assertEqual([r['estado'] for r in response.json()['resultados']],
+                         ['duplicada', 'creada', 'creada', 'duplicada'])
+
+    def test_decision_creada_a_la_vez_por_otra_peticion(self):
+        bulk_create = Decision.objects.bulk_create
+
+        def con_carrera(objs, **kwargs):
+            # Otra petición inserta la misma decisión tras la comprobación previa
+            Decision.objects.create(usuario=self.adoptante, animal_id=self.animales[2], tipo_decision='IGNORAR')
+            return bulk_create(objs, **kwargs)
+
+        with mock.patch.object(Decision.objects, 'bulk_create', con_carrera):
+            response = self._lote()
+        self.assertEqual(response.json()['creadas'], 1)
+        self.assertEqual([r['estado'] for r in response.json()['resultados']],
+                         ['duplicada', 'creada', 'duplicada', 'duplicada'])
+        self.assertEqual(Decision.objects.get(animal_id=self.animales[2]).tipo_decision, 'IGNORAR')
+
+
+class ProvinciaDesnormalizadaTests(TestCase):
+    """Animal.provincia es una copia de la provincia de la empresa (ver animales.signals)."""
+
+    def setUp(self):
+        self.empresa = crear_usuario('protectora@example.com', 'EMPRESA', 'Madrid')
+        self.otra = crear_usuario('otra@example.com', 'EMPRESA', 'Madrid')
+        self.animales = crear_animales(self.empresa, 2)
+        self.ajeno, = crear_animales(self.otra, 1)
+        self.adoptante = crear_usuario('adoptante@example.com', 'USUARIO', 'Sevilla')
+        self.client = APIClient()
+
+    def _provincias(self):
+        return dict(Animal.objects.values_list('id', 'provincia'))
+
+    def _feed(self):
+        self.client.force_authenticate(self.adoptante)
+        return sorted(animal['id'] for animal in self.client.get('/api/animales/').json())
+
+    def test_cambiar_la_provincia_de_la_empresa_mueve_sus_animales(self):
+        self.assertEqual(self._feed(), [])
+        self.client.force_authenticate(self.empresa)
+        response = self.client.patch('/api/auth/profile/update/', {'provincia': 'Sevilla'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._provincias(), {self.animales[0]: 'Sevilla', self.animales[1]: 'Sevilla',
+                                              self.ajeno: 'Madrid'})
+        self.assertEqual(self._feed(), sorted(self.animales))
+
+        self.empresa.provincia = 'Madrid'
+        self.empresa.save()
+        self.assertEqual(set(self._provincias().values()), {'Madrid'})
+        self.assertEqual(self._feed(), [])
+
+    def test_guardar_otros_campos_no_toca_los_animales(self):
+        Animal.objects.filter(pk=self.animales[0]).update(provincia='Sevilla')
+        self.empresa.telefono = '600000000'
+        self.empresa.save(update_fields=['telefono'])
+        self.assertEqual(self._provincias()[self.animales[0]], 'Sevilla')
+
+    def test_crear_o_cambiar_de_empresa_copia_la_provincia(self):
+        self.otra.provincia = 'Sevilla'
+        self.otra.save()
+        animal = Animal.objects.get(pk=self.animales[0])
+        animal.empresa = self.otra
+        animal.save()
+        self.assertEqual(self._provincias()[animal.pk], 'Sevilla')
+        self.client.force_authenticate(self.otra)
+        response = self.client.post('/api/animales/', {
+            'nombre': 'Nuevo', 'especie': 'gato', 'genero': 'macho', 'fecha_nacimiento': '2022-01-01',
+            'tamano': 'pequeño', 'raza': 'Común', 'temperamento': 'Tranquilo', 'historia': 'Rescatado',
+            'apto_ninos': 'bueno', 'compatibilidad_mascotas': 'selectivo', 'apto_piso_pequeno': 'ideal',
+            'esterilizado': True,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(self._provincias()[response.json()['id']], 'Sevilla')
+
+
+class FeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        madrid = crear_usuario('madrid@example.com', 'EMPRESA', 'Madrid')
+        sevilla = crear_usuario('sevilla@example.com', 'EMPRESA', 'Sevilla')
+        self.disponibles = crear_animales(madrid, 6)
+        self.en_proceso = crear_animales(madrid, 1, estado='En proceso')
+        self.adoptados = crear_animales(madrid, 1, estado='Adoptado')
+        self.otra_provincia = crear_animales(sevilla, 2)
+        self.usuario = crear_usuario('adoptante@example.com', 'USUARIO', 'Madrid')
+        otro = crear_usuario('otro@example.com', 'USUARIO', 'Madrid')
+        self.decididos = self.disponibles[:2] + self.en_proceso
+        crear_decisiones(self.usuario, self.decididos)
+        crear_decisiones(otro, self.disponibles[2:4])
+
+    def _feed_anterior(self, user):
+        # Consulta previa al anti-join: NOT IN con los ids vistos y join con la empresa
+        vistos = Decision.objects.filter(usuario=user).values_list('animal_id', flat=True)
+        return Animal.objects.filter(estado='No adoptado', empresa__provincia=user.provincia).exclude(id__in=vistos)
+
+    def test_excluye_decididos_otras_provincias_y_no_disponibles(self):
+        feed = set(Animal.objects.feed_para(self.usuario).values_list('id', flat=True))
+        # Las decisiones de otro usuario no cuentan
+        self.assertEqual(feed, set(self.disponibles[2:]))
+        self.assertEqual(feed, set(self._feed_anterior(self.usuario).values_list('id', flat=True)))
+
+    def test_igual_que_la_consulta_anterior(self):
+        for usuario in (self.usuario, crear_usuario('nuevo@example.com', 'USUARIO', 'Sevilla'),
+                        crear_usuario('sin@example.com', 'USUARIO', '')):
+            with self.subTest(usuario=usuario.username):
+                self.assertQuerySetEqual(
+                    Animal.objects.feed_para(usuario).order_by('id'),
+                    self._feed_anterior(usuario).order_by('id'),
+                )
+
+    def test_endpoint_usa_el_feed(self):
+        client = APIClient()
+        client.force_authenticate(self.usuario)
+        ids = [animal['id'] for animal in client.get('/api/animales/').json()]
+        self.assertEqual(sorted(ids), self.disponibles[2:])
+
+
+class CompatibilidadTests(TestCase):
+    def setUp(self):
+        empresa = crear_usuario('protectora@example.com', 'EMPRESA', 'Madrid')
+        # Solo cuenta el factor 'ninos': la puntuación es la de apto_ninos
+        self.usuario = crear_usuario('adoptante@example.com', 'USUARIO', 'Madrid', tiene_ninos=True,
+                                     tipo_vivienda=True, acepta_enfermos=True, acepta_viejos=True)
+        self.ids = {
+            aptitud: crear_animales(empresa, 1, apto_ninos=aptitud)[0]
+            for aptitud in ('precaucion', 'excelente', 'noRecomendado', 'bueno')
+        }
+        self.client = APIClient()
+
+    def test_puntuacion_de_un_animal(self):
+        hoy = date(2024, 6, 1)
+        filas = [(1, 'bueno', 'selectivo', 'bueno', 'grande', False, hoy - timedelta(days=2 * 365))]
+        self.assertEqual(len(filas[0]), len(CAMPOS))
+        adoptante = crear_usuario('defecto@example.com', 'USUARIO', 'Madrid')
+        total, factores = puntuar(codificar_animales(filas, hoy), perfil_usuario(adoptante))
+        # Perfil por defecto: espacio (0.75), salud (1) y edad (1), con el mismo peso
+        self.assertAlmostEqual(float(total[0]), (0.75 + 1 + 1) / 3, places=5)
+        self.assertEqual(factores.shape, (1, 7))
+
+    def test_mejores_respeta_el_orden_del_feed_en_empates(self):
+        total = np.array([0.5, 0.9, 0.5, 0.9, 0.1], dtype=np.float32)
+        self.assertEqual(mejores(total, 3).tolist(), [1, 3, 0])
+        self.assertEqual(mejores(total, 10).tolist(), [1, 3, 0, 2, 4])
+
+    def test_recomendados_ordenados_por_puntuacion(self):
+        self.client.force_authenticate(self.usuario)
+        response = self.client.get('/api/animales/recomendados/', {'limit': 3})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([animal['id'] for animal in data],
+                         [self.ids['excelente'], self.ids['bueno'], self.ids['precaucion']])
+        self.assertEqual([animal['compatibilidad'] for animal in data], [
+            {'puntuacion': 1.0, 'factores': {'ninos': 1.0}},
+            {'puntuacion': 0.75, 'factores': {'ninos': 0.75}},
+            {'puntuacion': 0.25, 'factores': {'ninos': 0.25}},
+        ])
+
+    def test_permisos(self):
+        self.assertEqual(self.client.get('/api/animales/recomendados/').status_code, 401)
+        self.client.force_authenticate(crear_usuario('otra@example.com', 'EMPRESA', 'Madrid'))
+        self.assertEqual(self.client.get('/api/animales/recomendados/').status_code, 403)
+        self.client.force_authenticate(self.usuario)
+        self.assertEqual(self.client.get('/api/animales/recomendados/').status_code, 200)
+
+
+class BusquedaTests(TestCase):
+    """GET /api/animales/buscar/: el índice de texto sigue a los cambios de la tabla (triggers de 0012)."""
+
+    def setUp(self):
+        self.empresa = crear_usuario('protectora@example.com', 'EMPRESA', 'Madrid')
+        crear_animales(self.empresa, 3)
+
+    def _buscar(self, **params):
+        response = self.client.get('/api/animales/buscar/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def _ids(self, q):
+        return [animal['id'] for animal in self._buscar(q=q)['results']]
+
+    def test_usa_el_indice_fts_si_sqlite_lo_tiene(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Solo SQLite usa la tabla FTS5')
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            if not cursor.fetchone()[0]:
+                self.skipTest('SQLite sin FTS5: búsqueda con icontains')
+        self.assertTrue(busqueda._fts_disponible())
+
+    def test_sigue_altas_cambios_y_bajas(self):
+        animal = Animal.objects.create(
+            empresa=self.empresa, nombre='Peña', especie='perro', genero='hembra',
+            fecha_nacimiento=date(2020, 1, 1), tamano='mediano', raza='Podenco', temperamento='Juguetona',
+            historia='Encontrada en Zarzalejo', apto_ninos='bueno', compatibilidad_mascotas='selectivo',
+            apto_piso_pequeno='bueno', esterilizado=True,
+        )
+        # Prefijo y sin acentos, en cualquiera de los campos de texto
+        self.assertEqual(self._ids('pena'), [animal.pk])
+        self.assertEqual(self._ids('zarza podenc'), [animal.pk])
+        self.assertEqual(self._ids('zarza gato'), [])
+
+        animal.nombre = 'Lola'
+        animal.save()
+        self.assertEqual(self._ids('pena'), [])
+        self.assertEqual(self._ids('lola'), [animal.pk])
+
+        # Un UPDATE masivo (sin señales) también actualiza el índice
+        Animal.objects.filter(pk=animal.pk).update(historia='Rescatada en Valdemorillo')
+        self.assertEqual(self._ids('zarzalejo'), [])
+        self.assertEqual(self._ids('valdemorillo'), [animal.pk])
+
+        animal.delete()
+        self.assertEqual(self._ids('lola'), [])
+        self.assertEqual(len(self._ids('animal')), 3)
+
+    def test_facetas(self):
+        data = self._buscar(q='animal', especie='perro')
+        self.assertEqual(len(data['results']), 1)
+        # La faceta del propio campo no aplica su filtro
+        self.assertEqual({f['valor']: f['total'] for f in data['facetas']['especie']}, {'gato': 2, 'perro': 1})
+        self.assertEqual(sum(f['total'] for f in data['facetas']['tamano']), 1)
+
+    def test_faceta_invalida_es_400(self):
+        for params in ({'especie': 'dragon'}, {'tamano': 'pequeño,enorme'}):
+            with self.subTest(params=params):
+                response = self.client.get('/api/animales/buscar/', params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(list(response.json()), list(params))
+
+
+class FechaFija(date):
+    @classmethod
+    def today(cls):
+        return date(2024, 3, 15)
+
+
+@mock.patch('animales.filters.date', FechaFija)
+class FiltroEdadTests(TestCase):
+    """edad_min / edad_max en años cumplidos, con hoy = 2024-03-15."""
+
+    NACIMIENTOS = {
+        'hoy': date(2024, 3, 15),
+        'cumple_2_hoy': date(2022, 3, 15),
+        'cumple_2_manana': date(2022, 3, 16),
+        'cumple_3_hoy': date(2021, 3, 15),
+        'cumple_3_manana': date(2021, 3, 16),
+    }
+
+    def setUp(self):
+        self.empresa = crear_usuario('protectora@example.com', 'EMPRESA', 'Madrid')
+        self.ids = {
+            nombre: crear_animales(self.empresa, 1, fecha_nacimiento=nacimiento)[0]
+            for nombre, nacimiento in self.NACIMIENTOS.items()
+        }
+        self.client = APIClient()
+        self.client.force_authenticate(self.empresa)
+
+    def _filtrar(self, **params):
+        response = self.client.get('/api/animales/', params)
+        self.assertEqual(response.status_code, 200)
+        nombres = {pk: nombre for nombre, pk in self.ids.items()}
+        return {nombres[animal['id']] for animal in response.json()}
+
+    def test_limites(self):
+        casos = [
+            ({'edad_max': 0}, {'hoy'}),
+            ({'edad_min': 1}, {'cumple_2_hoy', 'cumple_2_manana', 'cumple_3_hoy', 'cumple_3_manana'}),
+            ({'edad_min': 2}, {'cumple_2_hoy', 'cumple_3_hoy', 'cumple_3_manana'}),
+            ({'edad_max': 1}, {'hoy', 'cumple_2_manana'}),
+            ({'edad_max': 2}, {'hoy', 'cumple_2_hoy', 'cumple_2_manana', 'cumple_3_manana'}),
+            ({'edad_min': 2, 'edad_max': 2}, {'cumple_2_hoy', 'cumple_3_manana'}),
+            ({'edad_min': 3}, {'cumple_3_hoy'}),
+            ({'edad_min': 3, 'edad_max': 2}, set()),
+        ]
+        for params, esperados in casos:
+            with self.subTest(**params):
+                self.assertEqual(self._filtrar(**params), esperados)
+
+    def test_valores_invalidos_son_400(self):
+        for params in ({'edad_min': -1}, {'edad_max': 'abc'}):
+            with self.subTest(**params):
+                self.assertEqual(self.client.get('/api/animales/', params).status_code, 400)
+
+    def test_29_de_febrero(self):
+        self.assertEqual(_hace_anios(1, date(2024, 2, 29)), date(2023, 2, 28))
+        self.assertEqual(_hace_anios(4, date(2024, 2, 29)), date(2020, 2, 29))
+        self.assertEqual(_hace_anios(2, date(2024, 3, 15)), date(2022, 3, 15))
+
+
+class StorageDePrueba(ImageStorage):
+    """
+    Almacenamiento en memoria. `esperas[nombre]` retrasa la subida de ese
+    fichero (segundos, o un Event que hay que activar); 'falla' lanza un error.
+    """
+
+    def __init__(self):
+        self.subidas, self.borradas = [], []
+        self.esperas = {}
+        self.borrado = threading.Event()
+
+    def upload(self, file, timeout=None):
+        espera = self.esperas.get(file.name)
+        if isinstance(espera, threading.Event):
+            espera.wait(5)
+        elif espera:
+            time.sleep(espera)
+        if file.name == 'falla':
+            raise ConnectionError('Almacenamiento caído')
+        url = f'https://imagenes.example.com/{file.name}'
+        self.subidas.append(url)
+        return url
+
+    def delete(self, url):
+        self.borradas.append(url)
+        self.borrado.set()
+
+
+@override_settings(ANIMAL_IMAGE_STORAGE='animales.tests.StorageDePrueba', ANIMAL_IMAGE_PREPROCESS=False)
+class SubirImagenesTests(TestCase):
+    def setUp(self):
+        get_image_storage.cache_clear()
+        self.addCleanup(get_image_storage.cache_clear)
+        self.storage = get_image_storage()
+
+    def _fichero(self, nombre):
+        return ContentFile(b'imagen', name=nombre)
+
+    def test_el_timeout_empieza_con_cada_subida(self):
+        # Con un solo hilo la segunda espera a la primera: 0.6 s en total, 0.3 s cada una
+        self.storage.esperas = {'uno.jpg': 0.3, 'dos.jpg': 0.3}
+        with mock.patch('animales.uploads._executor', ThreadPoolExecutor(max_workers=1)):
+            urls, errores = subir_imagenes({1: self._fichero('uno.jpg'), 2: self._fichero('dos.jpg')}, timeout=0.5)
+        self.assertEqual(errores, {})
+        self.assertEqual(urls[2], {'imagen': 'https://imagenes.example.com/dos.jpg'})
+
+    def test_subida_abandonada_se_borra_al_terminar(self):
+        bloqueo = threading.Event()
+        self.storage.esperas = {'lenta.jpg': bloqueo}
+        with self.assertLogs('animales.uploads', 'WARNING'):
+            urls, errores = subir_imagenes({1: self._fichero('rapida.jpg'), 2: self._fichero('lenta.jpg')},
+                                           timeout=0.2)
+        self.assertEqual(errores, {2: 'Tiempo de subida agotado'})
+        self.assertEqual(list(urls), [1])
+
+        bloqueo.set()  # la subida sigue en su hilo y termina después de la respuesta
+        self.assertTrue(self.storage.borrado.wait(5))
+        self.assertEqual(self.storage.borradas, ['https://imagenes.example.com/lenta.jpg'])
+
+    def test_fallo_a_medias_borra_las_variantes_subidas(self):
+        variantes = {'imagen': self._fichero('grande.jpg'), 'miniatura': self._fichero('falla')}
+        with self.assertLogs('animales.uploads', 'WARNING'):
+            urls, errores = subir_imagenes({1: self._fichero('otra.jpg'), 2: variantes})
+        self.assertEqual(errores, {2: 'Almacenamiento caído'})
+        self.assertEqual(urls, {1: {'imagen': 'https://imagenes.example.com/otra.jpg'}})
+        self.assertEqual(self.storage.borradas, ['https://imagenes.example.com/grande.jpg'])
+
+    def test_borrar_en_el_almacenamiento_local(self):
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            storage = LocalImageStorage()
+            url = storage.upload(self._fichero('perro uno.jpg'))
+            ruta = os.path.join(media, 'animales', os.path.basename(url).replace('%20', ' '))
+            self.assertTrue(os.path.exists(ruta))
+            storage.delete(url)
+            self.assertFalse(os.path.exists(ruta))
+
+
+@override_settings(ANIMAL_IMAGE_MAX_DIMENSION=200, ANIMAL_THUMBNAIL_SIZE=50, ANIMAL_IMAGE_FORMAT='WEBP')
+class PreprocesarImagenTests(TestCase):
+    def _foto(self, tamano, formato='JPEG', modo='RGB', orientacion=None, nombre='foto.jpg'):
+        imagen = Image.new(modo, tamano, (200, 120, 40, 128) if modo == 'RGBA' else (200, 120, 40))
+        opciones = {}
+        if orientacion:
+            exif = Image.Exif()
+            exif[0x0112] = orientacion
+            opciones['exif'] = exif.tobytes()
+        buffer = io.BytesIO()
+        imagen.save(buffer, format=formato, **opciones)
+        return SimpleUploadedFile(nombre, buffer.getvalue())
+
+    def _abrir(self, fichero):
+        return Image.open(io.BytesIO(fichero.read()))
+
+    def test_reduce_genera_miniatura_y_recomprime(self):
+        variantes = preprocesar_imagen(self._foto((800, 400)))
+        imagen, miniatura = self._abrir(variantes['imagen']), self._abrir(variantes['miniatura'])
+        self.assertEqual((imagen.format, imagen.size), ('WEBP', (200, 100)))
+        self.assertEqual((miniatura.format, miniatura.size), ('WEBP', (50, 25)))
+        self.assertEqual((variantes['imagen'].name, variantes['miniatura'].name), ('foto.webp', 'foto_thumb.webp'))
+
+    def test_aplica_la_orientacion_exif_y_la_descarta(self):
+        # Orientación 6: la foto se guardó tumbada y se muestra girada 90°
+        variantes = preprocesar_imagen(self._foto((800, 400), orientacion=6))
+        imagen = self._abrir(variantes['imagen'])
+        self.assertEqual(imagen.size, (100, 200))
+        self.assertEqual(dict(imagen.getexif()), {})
+
+    @override_settings(ANIMAL_IMAGE_FORMAT='JPEG')
+    def test_jpeg_sin_transparencia(self):
+        variantes = preprocesar_imagen(self._foto((300, 300), formato='PNG', modo='RGBA', nombre='logo.png'))
+        imagen = self._abrir(variantes['imagen'])
+        self.assertEqual((imagen.format, imagen.mode, imagen.size), ('JPEG', 'RGB', (200, 200)))
+        self.assertEqual(variantes['imagen'].name, 'logo.jpg')
+
+    def test_no_amplia_fotos_pequenas(self):
+        variantes = preprocesar_imagen(self._foto((120, 80)))
+        self.assertEqual(self._abrir(variantes['imagen']).size, (120, 80))
+        self.assertEqual(self._abrir(variantes['miniatura']).size, (50, 33))
+
+    def test_fichero_que_no_es_imagen(self):
+        with self.assertRaises(UnidentifiedImageError):
+            preprocesar_imagen(SimpleUploadedFile('foto.jpg', b'no es una imagen'))
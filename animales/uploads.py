@@ -0,0 +1,189 @@
+"""
+Subida concurrente de las imágenes de un animal.
+
+Las (hasta cuatro) imágenes se preprocesan y suben en paralelo en un pool de
+hilos, cada una con su propio timeout, en lugar de encadenar las subidas en el
+hilo de la petición. En modo diferido (`ANIMAL_IMAGE_UPLOAD_DEFERRED`) el
+animal se guarda sin esperar y las URLs se rellenan cuando terminan las subidas.
+
+El timeout de cada imagen cuenta desde que su subida empieza, no mientras
+espera en la cola del pool. Una subida en curso no se puede interrumpir: si
+vence su timeout se abandona, y lo que llegue a escribir en el almacenamiento
+se borra al terminar. Lo mismo ocurre con las variantes ya subidas de una
+imagen cuya subida falla a medias.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.utils import timezone
+
+from adoptaapi.versiones import bump
+
+from .imagenes import preprocesar_imagen
+from .storage import get_image_storage
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'ANIMAL_IMAGE_UPLOAD_WORKERS', 8),
+    thread_name_prefix='animal-uploads',
+)
+# Las tareas diferidas esperan a sus subidas; van en otro pool para no bloquear el primero.
+_diferidas = ThreadPoolExecutor(max_workers=2, thread_name_prefix='animal-uploads-deferred')
+
+
+def en_memoria(archivo):
+    """Copia un fichero subido a memoria para que sobreviva al final de la petición."""
+    archivo.seek(0)
+    return ContentFile(archivo.read(), name=archivo.name)
+
+
+def preparar(archivo, copiar=False):
+    """
+    Devuelve las variantes a subir de una foto: `{'imagen': ..., 'miniatura': ...}`
+    si el preprocesado está activo, o solo `{'imagen': archivo}` si no.
+    Con `copiar=True` el original se copia a memoria (para el modo diferido).
+    """
+    if settings.ANIMAL_IMAGE_PREPROCESS:
+        return preprocesar_imagen(archivo)
+    return {'imagen': en_memoria(archivo) if copiar else archivo}
+
+
+# Cada cuánto se vuelve a mirar si han empezado las subidas que aún esperan en la cola
+_SONDEO_COLA = 0.1
+
+
+class _Subida:
+    """Estado de la subida de una imagen, compartido entre la petición y el hilo que sube."""
+
+    def __init__(self):
+        self.inicio = None
+        self.terminada = False
+        self.abandonada = False
+        self._lock = threading.Lock()
+
+    def empezar(self):
+        with self._lock:
+            self.inicio = time.monotonic()
+
+    def restante(self, timeout):
+        """Segundos hasta el timeout, o None si la subida aún no ha empezado."""
+        with self._lock:
+            return None if self.inicio is None else self.inicio + timeout - time.monotonic()
+
+    def terminar(self):
+        """Marca la subida como entregada; False si la petición ya la había abandonado."""
+        with self._lock:
+            self.terminada = not self.abandonada
+            return self.terminada
+
+    def abandonar(self):
+        """Marca la subida como abandonada; False si ya había terminado a tiempo."""
+        with self._lock:
+            self.abandonada = not self.terminada
+            return self.abandonada
+
+
+def _borrar(storage, urls):
+    for url in urls:
+        try:
+            storage.delete(url)
+        except Exception:
+            logger.exception('Could not delete orphaned image upload %s', url)
+
+
+def _subir(storage, archivo, timeout, subida):
+    subida.empezar()
+    urls = {}
+    try:
+        variantes = archivo if isinstance(archivo, dict) else preparar(archivo)
+        for campo, fichero in variantes.items():
+            urls[campo] = storage.upload(fichero, timeout=timeout)
+    except Exception:
+        # Sin todas sus variantes la imagen no se guarda: se borran las que sí se subieron
+        _borrar(storage, urls.values())
+        raise
+    if not subida.terminar():
+        _borrar(storage, urls.values())
+    return urls
+
+
+def subir_imagenes(archivos, timeout=None):
+    """
+    Preprocesa y sube en paralelo `archivos` ({posición: fichero o variantes
+    ya preparadas}) y devuelve `(urls, errores)`, ambos indexados por posición;
+    cada entrada de `urls` es `{'imagen': url, 'miniatura': url}`. Una imagen
+    que falla o supera el timeout (contado desde que empieza a subirse) no
+    impide que se guarden las demás.
+    """
+    timeout = timeout or settings.ANIMAL_IMAGE_UPLOAD_TIMEOUT
+    storage = get_image_storage()
+    subidas = {posicion: _Subida() for posicion in archivos}
+    pendientes = {
+        _executor.submit(_subir, storage, archivo, timeout, subidas[posicion]): posicion
+        for posicion, archivo in archivos.items()
+    }
+
+    urls, errores = {}, {}
+    while pendientes:
+        esperas = []
+        for futuro, posicion in list(pendientes.items()):
+            if futuro.done():
+                continue
+            restante = subidas[posicion].restante(timeout)
+            if restante is None:
+                esperas.append(_SONDEO_COLA)  # aún en la cola: su timeout no corre
+            elif restante > 0:
+                esperas.append(restante)
+            elif subidas[posicion].abandonar():
+                del pendientes[futuro]
+                errores[posicion] = 'Tiempo de subida agotado'
+        if not pendientes:
+            break
+        hechos, _ = wait(pendientes, timeout=min(esperas, default=None), return_when=FIRST_COMPLETED)
+        for futuro in hechos:
+            posicion = pendientes.pop(futuro)
+            try:
+                urls[posicion] = futuro.result()
+            except Exception as e:
+                errores[posicion] = str(e)
+    for posicion, error in errores.items():
+        logger.warning('Error uploading imagen%s: %s', posicion, error)
+    return urls, errores
+
+
+def campos_imagen(urls):
+    """Convierte el resultado de `subir_imagenes` en valores para los campos del modelo."""
+    campos = {}
+    for posicion, subidas in urls.items():
+        campos[f'imagen{posicion}'] = subidas['imagen']
+        campos[f'miniatura{posicion}'] = subidas.get('miniatura')
+    return campos
+
+
+def programar_subida(animal_id, archivos):
+    """
+    Sube las imágenes en segundo plano una vez confirmada la transacción y
+    guarda las URLs en el animal. `archivos` deben ser variantes ya preparadas
+    con `preparar(..., copiar=True)`.
+    """
+    def tarea():
+        try:
+            urls, _ = subir_imagenes(archivos)
+            if urls:
+                from .models import Animal
+                Animal.objects.filter(pk=animal_id).update(
+                    fecha_actualizacion=timezone.now(), **campos_imagen(urls)
+                )
+                bump('animales')  # update() no dispara post_save
+        except Exception:
+            logger.exception('Deferred image upload failed for animal %s', animal_id)
+        finally:
+            connections.close_all()
+
+    transaction.on_commit(lambda: _diferidas.submit(tarea))
@@ -1,10 +1,36 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
 from django.shortcuts import render
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
 from rest_framework import viewsets, permissions, status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from .models import Animal, Decision
-from .serializers import AnimalSerializer, DecisionSerializer, AnimalImageSerializer
+from .serializers import (
+    AnimalSerializer, DecisionSerializer, AnimalImageSerializer,
+    DecisionLoteSerializer, DecisionLoteItemSerializer,
+)
+from .pagination import AnimalFeedPagination, AnimalBusquedaPagination
+from .filters import AnimalFilter
+from . import busqueda
+from .compatibilidad import ranking
 from rest_framework.decorators import action
-import cloudinary.uploader
+from rest_framework.parsers import MultiPartParser
+from django_filters.rest_framework import DjangoFilterBackend
+from django.db import transaction
+from .uploads import subir_imagenes, campos_imagen
+from .importacion import FORMATOS, ArchivoInvalido, detectar_formato, importar_animales, leer_filas
+from .signals import invalidar_decisiones
+from adoptaapi.asincrono import AsyncReadMixin
+from adoptaapi.versiones import aget_version, fecha_version, get_version
+from adoptaapi.condicional import ConditionalGetMixin
+from adoptaapi.routers import ReadReplicaMixin
+from adoptaapi.exportacion import FORMATOS as FORMATOS_EXPORTACION, exportar
 
 # Create your views here.
 
@@ -28,9 +54,12 @@ class IsOwner(permissions.BasePermission):
         # Write permissions are only allowed to the company that owns the animal.
         return obj.empresa == request.user
 
-class AnimalViewSet(viewsets.ModelViewSet):
+class AnimalViewSet(AsyncReadMixin, ReadReplicaMixin, viewsets.ModelViewSet):
     queryset = Animal.objects.all()
     serializer_class = AnimalSerializer
+    pagination_class = AnimalFeedPagination  # opt-in: ?page_size=N / ?cursor=...
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = AnimalFilter  # ?especie=perro,gato&tamano=...&edad_max=3
     
     def get_permissions(self):
         """
@@ -41,8 +70,10 @@ class AnimalViewSet(viewsets.ModelViewSet):
         """
         if self.action in ['update', 'partial_update', 'destroy']:
             self.permission_classes = [IsOwner]
-        elif self.action == 'create':
+        elif self.action in ['create', 'importar']:
             self.permission_classes = [IsEmpresaUser]
+        elif self.action == 'recomendados':
+            self.permission_classes = [permissions.IsAuthenticated]
         else: # list, retrieve
             self.permission_classes = [permissions.AllowAny]
         return super().get_permissions()
@@ -62,16 +93,170 @@ class AnimalViewSet(viewsets.ModelViewSet):
             elif user.tipo == 'USUARIO':
                 # Usuarios normales solo ven animales no adoptados que no han visto
                 # y que están en su misma provincia
-                animales_vistos = Decision.objects.filter(usuario=user).values_list('animal_id', flat=True)
-                return Animal.objects.filter(
-                    estado='No adoptado',
-                    empresa__provincia=user.provincia  # Filtrar por provincia
-                ).exclude(
-                    id__in=animales_vistos
-                )
+                return Animal.objects.feed_para(user)
         # Para usuarios no autenticados, mostrar todos los animales no adoptados
         return Animal.objects.filter(estado='No adoptado')
 
+    def get_version_scopes(self):
+        """Ámbitos de los que depende la respuesta (ver ReadReplicaMixin)."""
+        user = self.request.user
+        if user.is_authenticated and user.tipo == 'USUARIO':
+            return ('animales', f'decisiones:usuario:{user.pk}')  # el feed excluye lo ya decidido
+        return ('animales',)
+
+    def list(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+        return self._respuesta_publica(request, lambda: super(AnimalViewSet, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().retrieve(request, *args, **kwargs)
+        return self._respuesta_publica(request, lambda: super(AnimalViewSet, self).retrieve(request, *args, **kwargs))
+
+    # Versiones asíncronas (servidor ASGI, ver adoptaapi.asincrono)
+    async def alist(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return await super().alist(request, *args, **kwargs)
+        return await self._arespuesta_publica(request, lambda: super(AnimalViewSet, self).alist(request, *args, **kwargs))
+
+    async def aretrieve(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return await super().aretrieve(request, *args, **kwargs)
+        return await self._arespuesta_publica(request, lambda: super(AnimalViewSet, self).aretrieve(request, *args, **kwargs))
+
+    def _respuesta_publica(self, request, generar):
+        """
+        list/retrieve para visitantes anónimos: todos reciben el mismo contenido,
+        así que se sirve desde caché. La clave incluye la versión de 'animales'
+        (se incrementa en cada cambio de un Animal, ver animales.signals) y la URL.
+        Con ETag y Last-Modified el cliente puede revalidar y recibir un 304; el
+        ETag es un hash del contenido y la URL, así que no depende de que la
+        versión sea la misma en todos los workers.
+        """
+        version = get_version('animales')
+        clave = self._clave_publica(request, version)
+        entrada = cache.get(clave)
+        if entrada is None:
+            response = generar()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entrada = self._entrada_publica(request, version, response)
+            cache.set(clave, entrada, settings.ANIMAL_RESPONSE_CACHE_TTL)
+        return self._servir_publica(request, entrada)
+
+    async def _arespuesta_publica(self, request, generar):
+        """_respuesta_publica() con `generar` asíncrono y la caché asíncrona."""
+        version = await aget_version('animales')
+        clave = self._clave_publica(request, version)
+        entrada = await cache.aget(clave)
+        if entrada is None:
+            response = await generar()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entrada = self._entrada_publica(request, version, response)
+            await cache.aset(clave, entrada, settings.ANIMAL_RESPONSE_CACHE_TTL)
+        return self._servir_publica(request, entrada)
+
+    def _clave_publica(self, request, version):
+        url = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        return f'animales:respuesta:{version}:{url}'
+
+    def _entrada_publica(self, request, version, response):
+        if self.action == 'retrieve':
+            ultima = int(parse_datetime(response.data['fecha_actualizacion']).timestamp())
+        elif settings.VERSIONES_COMPARTIDAS:
+            ultima = fecha_version(version)
+        else:
+            # La versión es la de este proceso: otro worker puede haber cambiado algo después
+            ultima = int(time.time())
+        contenido = JSONRenderer().render(response.data)
+        base = request.get_full_path().encode() + b'|' + contenido
+        return {'data': response.data, 'last_modified': ultima, 'hash': hashlib.md5(base).hexdigest()}
+
+    def _servir_publica(self, request, entrada):
+        etag = f'W/"{entrada["hash"]}-{request.accepted_renderer.format}"'
+        response = get_conditional_response(
+            request, etag=etag, last_modified=entrada['last_modified']
+        ) or Response(entrada['data'])
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(entrada['last_modified'])
+        patch_vary_headers(response, ('Authorization', 'Cookie'))
+        return response
+
+    @action(detail=False, methods=['get'])
+    def recomendados(self, request):
+        """
+        Feed del usuario ordenado por compatibilidad con su perfil de adoptante.
+        Query param opcional `limit` (por defecto 20, máximo 100).
+        Cada animal incluye `compatibilidad` con la puntuación total (0-1) y
+        el desglose por factor.
+        """
+        if request.user.tipo != 'USUARIO':
+            return Response(
+                {'error': 'Esta acción solo está disponible para usuarios normales.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        try:
+            limite = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            limite = 20
+
+        puntuados = ranking(Animal.objects.feed_para(request.user), request.user, limite)
+        animales = Animal.objects.in_bulk([animal_id for animal_id, _, _ in puntuados])
+        data = []
+        for animal_id, puntuacion, desglose in puntuados:
+            item = self.get_serializer(animales[animal_id]).data
+            item['compatibilidad'] = {'puntuacion': puntuacion, 'factores': desglose}
+            data.append(item)
+        return Response(data)
+
+    @action(detail=False, methods=['get'])
+    def buscar(self, request):
+        """
+        Búsqueda de texto y por facetas sobre los animales visibles para el usuario
+        (mismas reglas que el listado).
+        Query params:
+        - q: texto a buscar en nombre, raza, temperamento e historia
+        - especie, tamano, genero, apto_ninos, compatibilidad_mascotas: valores separados por comas
+        - page_size / cursor: paginación por cursor (siempre activa en la búsqueda)
+        Devuelve la página de resultados y 'facetas' con el recuento de cada valor.
+        """
+        filtros, errores = busqueda.leer_filtros(request.query_params)
+        if errores:
+            return Response(errores, status=status.HTTP_400_BAD_REQUEST)
+
+        coincidentes = busqueda.buscar_texto(self.get_queryset(), request.query_params.get('q', ''))
+        paginator = AnimalBusquedaPagination()
+        page = paginator.paginate_queryset(busqueda.aplicar_filtros(coincidentes, filtros), request, view=self)
+        response = paginator.get_paginated_response(self.get_serializer(page, many=True).data)
+        response.data['facetas'] = busqueda.facetas(coincidentes, filtros)
+        return response
+
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser])
+    def importar(self, request):
+        """
+        Importación masiva de animales de la empresa desde un fichero.
+        Multipart: 'archivo' (CSV con cabecera o JSONL) y 'formato' opcional
+        ('csv' o 'jsonl', por defecto según la extensión). Las filas inválidas
+        se omiten y se devuelven en 'errores' con su número de fila.
+        """
+        archivo = request.FILES.get('archivo')
+        if archivo is None:
+            return Response({'error': "Falta el fichero 'archivo'."}, status=status.HTTP_400_BAD_REQUEST)
+        formato = request.data.get('formato') or detectar_formato(archivo.name)
+        if formato not in FORMATOS:
+            return Response(
+                {'error': f"Formato no soportado. Valores permitidos: {', '.join(FORMATOS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            resumen = importar_animales(request.user, leer_filas(archivo, formato))
+        except ArchivoInvalido as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(resumen, status=status.HTTP_200_OK)
+
     @action(detail=True, methods=['post'], url_path='imagenes')
     def images(self, request, pk=None):
         """
@@ -82,26 +267,25 @@ class AnimalViewSet(viewsets.ModelViewSet):
         serializer = AnimalImageSerializer(data=request.data, context={'animal': animal})
         
         if serializer.is_valid():
-            try:
-                # Upload image to Cloudinary
-                upload_result = cloudinary.uploader.upload(serializer.validated_data['image'])
-                secure_url = upload_result['secure_url']
-                
-                # Update the corresponding image field
-                position = serializer.validated_data['position']
-                setattr(animal, f'imagen{position}', secure_url)
-                animal.save()
-                
+            position = serializer.validated_data['position']
+            # Preprocess and upload to the configured storage (Cloudinary by default)
+            urls, errores = subir_imagenes({position: serializer.validated_data['image']})
+            if errores:
                 return Response({
-                    'message': f'Image {position} updated successfully',
-                    'image_url': secure_url
-                }, status=status.HTTP_200_OK)
-                
-            except Exception as e:
-                return Response({
-                    'error': f'Error uploading image: {str(e)}'
+                    'error': f'Error uploading image: {errores[position]}'
                 }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-                
+
+            # Update the corresponding image fields
+            for campo, valor in campos_imagen(urls).items():
+                setattr(animal, campo, valor)
+            animal.save()
+
+            return Response({
+                'message': f'Image {position} updated successfully',
+                'image_url': urls[position]['imagen'],
+                'thumbnail_url': urls[position].get('miniatura')
+            }, status=status.HTTP_200_OK)
+
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=True, methods=['delete'], url_path='imagenes/(?P<position>[1-4])')
@@ -113,18 +297,25 @@ class AnimalViewSet(viewsets.ModelViewSet):
         animal = self.get_object()
         position = int(position)
         
-        # Clear the image URL
+        # Clear the image and thumbnail URLs
         setattr(animal, f'imagen{position}', None)
+        setattr(animal, f'miniatura{position}', None)
         animal.save()
         
         return Response({
             'message': f'Image {position} deleted successfully'
         }, status=status.HTTP_200_OK)
 
-class DecisionViewSet(viewsets.ModelViewSet):
+class DecisionViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = DecisionSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_version_scopes(self):
+        user = self.request.user
+        if user.tipo == 'EMPRESA':
+            return (f'decisiones:empresa:{user.pk}',)
+        return (f'decisiones:usuario:{user.pk}',)
+
     def get_queryset(self):
         user = self.request.user
         if user.tipo == 'EMPRESA':
@@ -135,7 +326,104 @@ class DecisionViewSet(viewsets.ModelViewSet):
             return Decision.objects.filter(usuario=user)
 
     def perform_create(self, serializer):
-        serializer.save(usuario=self.request.user)
+        decision = serializer.save(usuario=self.request.user)
+        invalidar_decisiones([decision.usuario_id], [decision.animal.empresa_id])
+
+    def perform_update(self, serializer):
+        anterior = serializer.instance.animal.empresa_id
+        decision = serializer.save()
+        invalidar_decisiones([decision.usuario_id], {anterior, decision.animal.empresa_id})
+
+    def perform_destroy(self, instance):
+        invalidar_decisiones([instance.usuario_id], [instance.animal.empresa_id])
+        instance.delete()
+
+    @action(detail=False, methods=['post'])
+    def lote(self, request):
+        """
+        Crea varias decisiones en una sola petición.
+        Body: {"decisiones": [{"animal": 1, "tipo_decision": "IGNORAR"}, ...]}
+        Devuelve un resultado por elemento, en el mismo orden:
+        'creada', 'duplicada' (ya existía, la creó a la vez otra petición o se
+        repite en el lote) o 'error'.
+        """
+        lote = DecisionLoteSerializer(data=request.data)
+        lote.is_valid(raise_exception=True)
+
+        resultados = []
+        validas = {}
+        for item in lote.validated_data['decisiones']:
+            item_serializer = DecisionLoteItemSerializer(data=item)
+            if not item_serializer.is_valid():
+                resultados.append({'estado': 'error', 'errores': item_serializer.errors})
+                continue
+            datos = item_serializer.validated_data
+            resultados.append({'animal': datos['animal'], 'tipo_decision': datos['tipo_decision']})
+            validas.setdefault(datos['animal'], len(resultados) - 1)
+
+        ids = list(validas)
+        empresas = dict(Animal.objects.filter(id__in=ids).values_list('id', 'empresa_id'))
+        existentes = set(empresas)
+        decididas = set(
+            Decision.objects.filter(usuario=request.user, animal_id__in=existentes)
+            .values_list('animal_id', flat=True)
+        )
+
+        nuevas = []
+        for posicion, resultado in enumerate(resultados):
+            if 'estado' in resultado:
+                continue
+            animal_id = resultado['animal']
+            if animal_id not in existentes:
+                resultado.update(estado='error', errores={'animal': ['El animal no existe.']})
+            elif animal_id in decididas or validas[animal_id] != posicion:
+                resultado['estado'] = 'duplicada'
+            else:
+                resultado['estado'] = 'creada'
+                nuevas.append(Decision(
+                    usuario=request.user, animal_id=animal_id, tipo_decision=resultado['tipo_decision']
+                ))
+
+        with transaction.atomic():
+            Decision.objects.bulk_create(nuevas, ignore_conflicts=True)
+            # ignore_conflicts no dice qué filas se saltó: si otra petición creó la
+            # decisión entre la comprobación y el insert, la fila guardada es la suya
+            guardadas = dict(
+                Decision.objects.filter(usuario=request.user, animal_id__in=[d.animal_id for d in nuevas])
+                .values_list('animal_id', 'fecha_decision')
+            )
+        creadas = []
+        for decision in nuevas:
+            if guardadas.get(decision.animal_id) == decision.fecha_decision:
+                creadas.append(decision)
+            else:
+                resultados[validas[decision.animal_id]]['estado'] = 'duplicada'
+        if creadas:
+            invalidar_decisiones([request.user.pk], {empresas[d.animal_id] for d in creadas})
+
+        return Response({'creadas': len(creadas), 'resultados': resultados}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        """
+        Descarga en streaming de todas las decisiones sobre los animales de la empresa.
+        Query param `formato`: 'csv' (por defecto) o 'jsonl'.
+        Solo disponible para empresas.
+        """
+        if request.user.tipo != 'EMPRESA':
+            return Response(
+                {'error': 'Esta acción solo está disponible para empresas.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        formato = request.query_params.get('formato', 'csv')
+        if formato not in FORMATOS_EXPORTACION:
+            return Response(
+                {'error': f"Formato inválido. Valores permitidos: {', '.join(FORMATOS_EXPORTACION)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        queryset = self.get_queryset().order_by('fecha_decision', 'id')
+        columnas = ('id', 'animal_id', 'animal__nombre', 'usuario_id', 'tipo_decision', 'fecha_decision')
+        return exportar(queryset, columnas, formato, 'decisiones', request=request)
 
     @action(detail=False, methods=['delete'])
     def reset_ignorados(self, request):
@@ -149,9 +437,12 @@ class DecisionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        Decision.objects.filter(
+        ignorados = Decision.objects.filter(
             usuario=request.user,
             tipo_decision='IGNORAR'
-        ).delete()
+        )
+        empresas = set(ignorados.values_list('animal__empresa_id', flat=True).distinct())
+        ignorados.delete()
+        invalidar_decisiones([request.user.pk], empresas)
         
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -1,3 +1,32 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.db import DatabaseError
+from rest_framework.test import APIClient, APITestCase
+
+from correos.models import CorreoSaliente
+from .models import ContactForm, GeneralInquiry
+
+
+class ContactoTests(APITestCase):
+    """El formulario y su correo se guardan juntos o no se guarda ninguno."""
+
+    CASOS = [
+        ('/api/empresa/', ContactForm, {'nombre_empresa': 'Protectora', 'email': 'hola@example.com',
+                                        'telefono': '600000000', 'mensaje': 'Queremos colaborar'}),
+        ('/api/consulta/', GeneralInquiry, {'email': 'hola@example.com', 'mensaje': 'Una pregunta'}),
+    ]
+
+    def test_guarda_el_formulario_y_encola_el_correo(self):
+        for url, modelo, datos in self.CASOS:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.post(url, datos, format='json').status_code, 201)
+                self.assertEqual(modelo.objects.count(), 1)
+        self.assertEqual(CorreoSaliente.objects.filter(estado='Pendiente').count(), 2)
+
+    def test_si_falla_el_encolado_no_se_guarda_el_formulario(self):
+        client = APIClient(raise_request_exception=False)
+        with mock.patch('contacto.views.encolar_correo', side_effect=DatabaseError('sin espacio')):
+            for url, modelo, datos in self.CASOS:
+                with self.subTest(url=url):
+                    self.assertEqual(client.post(url, datos, format='json').status_code, 500)
+                    self.assertFalse(modelo.objects.exists())
@@ -1,9 +1,10 @@
+from django.db import transaction
 from django.shortcuts import render
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
-from django.core.mail import send_mail
+from correos.cola import encolar_correo
 from django.conf import settings
 from .serializers import ContactFormSerializer, GeneralInquirySerializer
 from .models import ContactForm, GeneralInquiry
@@ -13,6 +14,7 @@ from .models import ContactForm, GeneralInquiry
 class ContactFormView(APIView):
     permission_classes = [AllowAny]  # Allow unauthenticated access
     
+    @transaction.atomic  # the row and its queued email are saved together
     def post(self, request):
         serializer = ContactFormSerializer(data=request.data)
         if serializer.is_valid():
@@ -35,26 +37,20 @@ class ContactFormView(APIView):
             Fecha de envío: {contact.fecha_envio}
             """
             
-            # Send email
-            try:
-                send_mail(
-                    subject,
-                    message,
-                    settings.EMAIL_HOST_USER,  # From email
-                    [settings.EMAIL_HOST_USER],  # To email (same as from)
-                    fail_silently=False,
-                )
-                return Response(serializer.data, status=status.HTTP_201_CREATED)
-            except Exception as e:
-                return Response(
-                    {'error': 'Error al enviar el email'},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
+            # Queue email (sent by the enviar_correos worker)
+            encolar_correo(
+                subject,
+                message,
+                [settings.EMAIL_HOST_USER],  # To email (same as from)
+                remitente=settings.EMAIL_HOST_USER,
+            )
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class GeneralInquiryView(APIView):
     permission_classes = [AllowAny]  # Allow unauthenticated access
     
+    @transaction.atomic  # the row and its queued email are saved together
     def post(self, request):
         serializer = GeneralInquirySerializer(data=request.data)
         if serializer.is_valid():
@@ -74,19 +70,12 @@ class GeneralInquiryView(APIView):
             Fecha de envío: {inquiry.fecha_envio}
             """
             
-            # Send email
-            try:
-                send_mail(
-                    subject,
-                    message,
-                    settings.EMAIL_HOST_USER,  # From email
-                    [settings.EMAIL_HOST_USER],  # To email (same as from)
-                    fail_silently=False,
-                )
-                return Response(serializer.data, status=status.HTTP_201_CREATED)
-            except Exception as e:
-                return Response(
-                    {'error': 'Error al enviar el email'},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
+            # Queue email (sent by the enviar_correos worker)
+            encolar_correo(
+                subject,
+                message,
+                [settings.EMAIL_HOST_USER],  # To email (same as from)
+                remitente=settings.EMAIL_HOST_USER,
+            )
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import CorreoSaliente
+
+@admin.register(CorreoSaliente)
+class CorreoSalienteAdmin(admin.ModelAdmin):
+    list_display = ('asunto', 'estado', 'intentos', 'fecha_creacion', 'fecha_envio', 'proximo_intento')
+    list_filter = ('estado',)
+    search_fields = ('asunto', 'destinatarios')
+    readonly_fields = ('fecha_creacion', 'fecha_envio')
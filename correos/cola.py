@@ -0,0 +1,112 @@
+"""
+Cola de correo saliente.
+
+`encolar_correo` guarda el mensaje en la base de datos y `enviar_pendientes`
+lo envía por lotes reutilizando una única conexión SMTP, con reintentos y
+backoff exponencial. El correo solo se encola en la misma transacción que la
+escritura de negocio si quien llama la abre (`transaction.atomic`, como las
+vistas de contacto); ATOMIC_REQUESTS no está activo.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CorreoSaliente
+
+logger = logging.getLogger(__name__)
+
+
+def encolar_correo(asunto, cuerpo, destinatarios, remitente=None, cuerpo_html=''):
+    return CorreoSaliente.objects.create(
+        asunto=asunto,
+        cuerpo=cuerpo,
+        cuerpo_html=cuerpo_html or '',
+        remitente=remitente or settings.DEFAULT_FROM_EMAIL,
+        destinatarios=list(destinatarios),
+    )
+
+
+def _mensaje(correo, connection):
+    mensaje = EmailMultiAlternatives(
+        correo.asunto, correo.cuerpo, correo.remitente, correo.destinatarios, connection=connection
+    )
+    if correo.cuerpo_html:
+        mensaje.attach_alternative(correo.cuerpo_html, 'text/html')
+    return mensaje
+
+
+def _espera(intentos):
+    base = settings.CORREOS_BACKOFF_SEGUNDOS
+    return timedelta(seconds=min(base * 2 ** (intentos - 1), settings.CORREOS_BACKOFF_MAX_SEGUNDOS))
+
+
+def _reclamar(lote):
+    """
+    Reserva hasta `lote` correos pendientes en una transacción corta: su
+    próximo intento se aplaza CORREOS_RECLAMO_SEGUNDOS para que otro worker no
+    los coja mientras se envían. Si el worker muere a mitad, se reintentan al
+    vencer la reserva.
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        correos = list(
+            CorreoSaliente.objects.select_for_update(skip_locked=True)
+            .filter(estado='Pendiente', proximo_intento__lte=ahora)
+            .order_by('proximo_intento')[:lote]
+        )
+        if correos:
+            CorreoSaliente.objects.filter(pk__in=[c.pk for c in correos]).update(
+                proximo_intento=ahora + timedelta(seconds=settings.CORREOS_RECLAMO_SEGUNDOS)
+            )
+    return correos
+
+
+def enviar_pendientes(lote=50):
+    """
+    Envía hasta `lote` correos pendientes cuyo próximo intento ya ha llegado.
+    Devuelve `(enviados, fallidos)`. Un correo que falla se reprograma con
+    backoff exponencial y pasa a 'Fallido' al agotar CORREOS_MAX_INTENTOS.
+
+    El envío SMTP ocurre fuera de cualquier transacción: un servidor de correo
+    lento no retiene el bloqueo de escritura de la base de datos (con SQLite,
+    BEGIN IMMEDIATE bloquearía al resto de escrituras). Cada resultado se
+    guarda con su propio UPDATE.
+    """
+    correos = _reclamar(lote)
+    if not correos:
+        return 0, 0
+
+    enviados = fallidos = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        logger.warning('Could not open email connection: %s', e)
+        connection = None
+
+    try:
+        for correo in correos:
+            intentos = correo.intentos + 1
+            try:
+                if connection is None:
+                    raise ConnectionError('Sin conexión con el servidor de correo')
+                connection.send_messages([_mensaje(correo, connection)])
+            except Exception as e:
+                cambios = {'intentos': intentos, 'ultimo_error': f'{type(e).__name__}: {e}'}
+                if intentos >= settings.CORREOS_MAX_INTENTOS:
+                    cambios['estado'] = 'Fallido'
+                else:
+                    cambios['proximo_intento'] = timezone.now() + _espera(intentos)
+                fallidos += 1
+            else:
+                cambios = {'intentos': intentos, 'estado': 'Enviado', 'fecha_envio': timezone.now()}
+                enviados += 1
+            CorreoSaliente.objects.filter(pk=correo.pk).update(**cambios)
+    finally:
+        if connection is not None:
+            connection.close()
+    return enviados, fallidos
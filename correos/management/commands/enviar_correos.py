@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from correos.cola import enviar_pendientes
+
+
+class Command(BaseCommand):
+    help = "Envía los correos pendientes de la cola. Con --loop se queda funcionando como worker."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=50, help='Correos por lote (una conexión SMTP por lote).')
+        parser.add_argument('--loop', action='store_true', help='Sigue comprobando la cola indefinidamente.')
+        parser.add_argument('--intervalo', type=float, default=10, help='Segundos de espera cuando la cola está vacía.')
+
+    def handle(self, *args, **options):
+        while True:
+            enviados, fallidos = enviar_pendientes(lote=options['lote'])
+            if enviados or fallidos:
+                self.stdout.write(f'Enviados: {enviados}, con error: {fallidos}')
+            if not options['loop']:
+                break
+            # Si el lote vino lleno puede haber más pendientes: seguir sin esperar
+            if enviados + fallidos < options['lote']:
+                time.sleep(options['intervalo'])
@@ -0,0 +1,73 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .cola import _reclamar, encolar_correo, enviar_pendientes
+from .models import CorreoSaliente
+
+
+class BackendCaido(EmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionError('SMTP no responde')
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class EnviarPendientesTests(TestCase):
+    def test_envia_los_pendientes(self):
+        encolar_correo('Hola', 'Cuerpo', ['a@example.com'], cuerpo_html='<p>Cuerpo</p>')
+        encolar_correo('Adiós', 'Cuerpo', ['b@example.com'])
+
+        self.assertEqual(enviar_pendientes(), (2, 0))
+
+        self.assertEqual(sorted(m.subject for m in mail.outbox), ['Adiós', 'Hola'])
+        self.assertEqual(CorreoSaliente.objects.filter(estado='Enviado', intentos=1).count(), 2)
+        self.assertEqual(enviar_pendientes(), (0, 0))
+
+    def test_respeta_proximo_intento(self):
+        correo = encolar_correo('Luego', 'Cuerpo', ['a@example.com'])
+        CorreoSaliente.objects.filter(pk=correo.pk).update(
+            proximo_intento=timezone.now() + timedelta(minutes=5)
+        )
+
+        self.assertEqual(enviar_pendientes(), (0, 0))
+        self.assertEqual(mail.outbox, [])
+
+    @override_settings(EMAIL_BACKEND='correos.tests.BackendCaido', CORREOS_MAX_INTENTOS=2)
+    def test_reintenta_con_backoff_y_marca_fallido(self):
+        correo = encolar_correo('Hola', 'Cuerpo', ['a@example.com'])
+
+        self.assertEqual(enviar_pendientes(), (0, 1))
+        correo.refresh_from_db()
+        self.assertEqual((correo.estado, correo.intentos), ('Pendiente', 1))
+        self.assertIn('SMTP no responde', correo.ultimo_error)
+        self.assertGreater(correo.proximo_intento, timezone.now())
+
+        CorreoSaliente.objects.filter(pk=correo.pk).update(proximo_intento=timezone.now())
+        self.assertEqual(enviar_pendientes(), (0, 1))
+        correo.refresh_from_db()
+        self.assertEqual((correo.estado, correo.intentos), ('Fallido', 2))
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class EnvioFueraDeTransaccionTests(TransactionTestCase):
+    def test_no_hay_transaccion_abierta_durante_el_envio(self):
+        encolar_correo('Hola', 'Cuerpo', ['a@example.com'])
+        encolar_correo('Adiós', 'Cuerpo', ['b@example.com'])
+        durante_envio = []
+        send_messages = EmailBackend.send_messages
+
+        def espiar(backend, messages):
+            # Otro worker no vuelve a reclamar el lote mientras se envía
+            durante_envio.append((connection.in_atomic_block, len(_reclamar(10))))
+            return send_messages(backend, messages)
+
+        with mock.patch.object(EmailBackend, 'send_messages', espiar):
+            self.assertEqual(enviar_pendientes(), (2, 0))
+
+        self.assertEqual(durante_envio, [(False, 0), (False, 0)])
+        self.assertEqual(len(mail.outbox), 2)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PeticionesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'peticiones'
+
+    def ready(self):
+        from . import signals  # noqa: F401
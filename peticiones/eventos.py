@@ -0,0 +1,155 @@
+"""
+Canal de eventos de peticiones para el panel de las empresas.
+
+Cada cambio de una `Peticion` se publica, una vez confirmada la transacción, en
+el canal de la empresa dueña del animal (`peticiones:empresa:<id>`). La vista
+`eventos_peticiones` (Server-Sent Events, solo bajo ASGI) se suscribe a ese
+canal y reenvía los eventos sin consultar la base de datos, así que los paneles
+abiertos no cuestan nada mientras no hay cambios.
+
+El broker se elige con PETICIONES_EVENTOS_BROKER:
+
+- `InProcessBroker` (por defecto): reparte los eventos entre las conexiones del
+  mismo proceso. Solo sirve con un único proceso ASGI que además atienda las
+  escrituras.
+- `RedisBroker`: publica en Redis pub/sub (REDIS_URL), de modo que los eventos
+  llegan a todos los workers (WSGI o ASGI) que tengan suscriptores.
+"""
+import asyncio
+import json
+import logging
+import threading
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Máximo de eventos pendientes por conexión; si un cliente no los consume, recibe
+# un evento `resync` y debe recargar el listado.
+COLA_MAXIMA = 100
+RESYNC = {'tipo': 'resync'}
+
+
+def canal_empresa(empresa_id):
+    return f'peticiones:empresa:{empresa_id}'
+
+
+class InProcessBroker:
+    """Reparto de eventos entre colas asyncio del propio proceso."""
+
+    def __init__(self):
+        self._suscriptores = {}
+        self._lock = threading.Lock()
+
+    def publish(self, canal, evento):
+        # Se llama desde hilos síncronos (señales): cada cola se alimenta en su bucle
+        with self._lock:
+            colas = list(self._suscriptores.get(canal, ()))
+        for loop, cola in colas:
+            try:
+                loop.call_soon_threadsafe(_encolar, cola, evento)
+            except RuntimeError:
+                # Bucle cerrado: la conexión se está cerrando y se dará de baja sola
+                pass
+
+    @asynccontextmanager
+    async def subscribe(self, canal):
+        entrada = (asyncio.get_running_loop(), asyncio.Queue(COLA_MAXIMA))
+        with self._lock:
+            self._suscriptores.setdefault(canal, set()).add(entrada)
+        try:
+            yield entrada[1].get
+        finally:
+            with self._lock:
+                suscriptores = self._suscriptores.get(canal)
+                suscriptores.discard(entrada)
+                if not suscriptores:
+                    del self._suscriptores[canal]
+
+
+class RedisBroker:
+    """Pub/sub de Redis; requiere el paquete `redis` y REDIS_URL."""
+
+    def __init__(self, url=None):
+        self.url = url or settings.REDIS_URL
+        self._cliente = None
+
+    def publish(self, canal, evento):
+        if self._cliente is None:
+            import redis
+            self._cliente = redis.Redis.from_url(self.url)
+        self._cliente.publish(canal, json.dumps(evento))
+
+    @asynccontextmanager
+    async def subscribe(self, canal):
+        import redis.asyncio
+
+        cliente = redis.asyncio.Redis.from_url(self.url)
+        pubsub = cliente.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(canal)
+
+        async def siguiente():
+            while True:
+                mensaje = await pubsub.get_message(timeout=None)
+                if mensaje is not None:
+                    return json.loads(mensaje['data'])
+
+        try:
+            yield siguiente
+        finally:
+            await pubsub.unsubscribe(canal)
+            await pubsub.aclose()
+            await cliente.aclose()
+
+
+def _encolar(cola, evento):
+    if cola.full():
+        # Cliente demasiado lento: se descartan sus eventos y se le pide recargar
+        while not cola.empty():
+            cola.get_nowait()
+        evento = RESYNC
+    cola.put_nowait(evento)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.PETICIONES_EVENTOS_BROKER)()
+    return _broker
+
+
+def datos_peticion(peticion):
+    return {
+        'id': peticion.pk,
+        'animal': peticion.animal_id,
+        'usuario': peticion.usuario_id,
+        'estado': peticion.estado,
+        'leida': peticion.leida,
+        'fecha_peticion': peticion.fecha_peticion.isoformat() if peticion.fecha_peticion else None,
+    }
+
+
+def publicar(empresa_id, tipo, **datos):
+    """
+    Publica un evento en el canal de la empresa al confirmarse la transacción
+    en curso (de inmediato si no hay ninguna). Los fallos del broker no afectan
+    a la escritura: el panel se recupera recargando.
+    """
+    evento = dict(datos, tipo=tipo)
+
+    def enviar():
+        try:
+            get_broker().publish(canal_empresa(empresa_id), evento)
+        except Exception:
+            logger.exception('Could not publish peticion event for empresa %s', empresa_id)
+
+    transaction.on_commit(enviar)
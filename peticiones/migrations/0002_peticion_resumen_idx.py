@@ -0,0 +1,20 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animales', '0013_animal_filtro_indices'),
+        ('peticiones', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='peticion',
+            index=models.Index(fields=['animal', 'estado', 'leida'], name='peticion_resumen_idx'),
+        ),
+    ]
@@ -17,6 +17,10 @@ class Peticion(models.Model):
 
     class Meta:
         unique_together = ('animal', 'usuario')
+        indexes = [
+            # Covers the per-animal summary (GROUP BY animal with counts by estado/leida)
+            models.Index(fields=['animal', 'estado', 'leida'], name='peticion_resumen_idx'),
+        ]
 
     def __str__(self):
         return f"Petición de {self.usuario.username} para {self.animal.nombre}"
@@ -0,0 +1,14 @@
+from adoptaapi.pagination import KeysetCursorPagination
+
+
+class PeticionCursorPagination(KeysetCursorPagination):
+    """
+    Cursor pagination for the peticion lists. The ordering is chosen per request
+    by the view (order_by / order_direction), so it is read from `view.get_ordering()`.
+    """
+    ordering = ('-fecha_peticion', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        if view is not None and hasattr(view, 'get_ordering'):
+            return tuple(view.get_ordering())
+        return tuple(self.ordering)
@@ -1,10 +1,30 @@
 from rest_framework import serializers
 from .models import Peticion
-from usuarios.serializers import UserDetailSerializer
+from usuarios.models import CustomUser
+
+class PeticionUsuarioSerializer(serializers.ModelSerializer):
+    """
+    Compact projection of the adopter shown in each petition: contact data and
+    adopter profile only (no account fields like is_staff or date_joined).
+    """
+    class Meta:
+        model = CustomUser
+        fields = ('id', 'username', 'email', 'nombre', 'telefono', 'provincia', 'biografia',
+                  'tiene_ninos', 'tiene_otros_animales', 'tipo_vivienda', 'prefiere_pequenos',
+                  'disponible_para_paseos', 'acepta_enfermos', 'acepta_viejos',
+                  'busca_tranquilo', 'tiene_trabajo', 'animal_estara_solo')
+        read_only_fields = fields
 
 class PeticionListSerializer(serializers.ModelSerializer):
     """Serializer for listing and retrieving petitions, showing nested user details."""
-    usuario = UserDetailSerializer(read_only=True)
+    usuario = PeticionUsuarioSerializer(read_only=True)
+
+    @classmethod
+    def only_fields(cls):
+        """Columns needed to serialize a petition, for `QuerySet.only()`."""
+        return ['id', 'animal_id', 'estado', 'leida', 'fecha_peticion'] + [
+            f'usuario__{field}' for field in PeticionUsuarioSerializer.Meta.fields
+        ]
 
     class Meta:
         model = Peticion
@@ -29,4 +49,44 @@ class PeticionUpdateSerializer(serializers.ModelSerializer):
     """Serializer for a company to update a petition. Only 'estado' and 'leida' can be changed."""
     class Meta:
         model = Peticion
-        fields = ['estado', 'leida'] # Only expose these two fields for update 
\ No newline at end of file
+        fields = ['estado', 'leida'] # Only expose these two fields for update
+
+class PeticionFiltroSerializer(serializers.Serializer):
+    """Selection of the company's petitions by filter (every field optional, AND-ed)."""
+    estado = serializers.ListField(
+        child=serializers.ChoiceField(choices=Peticion.ESTADO_CHOICES), allow_empty=False, required=False
+    )
+    animal = serializers.IntegerField(min_value=1, required=False)
+    leida = serializers.BooleanField(required=False)
+
+class PeticionLoteSerializer(serializers.Serializer):
+    """
+    Bulk change of the company's petitions: the petitions are selected by `ids`
+    or by `filtro` (exactly one of them) and receive `leida` and/or `estado`.
+    Accepting is not allowed in bulk: only one petition per animal can be
+    accepted and it reserves the animal (see actualizar_peticion).
+    """
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=1000, required=False
+    )
+    filtro = PeticionFiltroSerializer(required=False)
+    leida = serializers.BooleanField(required=False)
+    estado = serializers.ChoiceField(choices=Peticion.ESTADO_CHOICES, required=False)
+
+    def validate_estado(self, value):
+        if value == 'Aceptada':
+            raise serializers.ValidationError(
+                "Las peticiones se aceptan de una en una (PATCH /api/peticiones/{id}/)."
+            )
+        return value
+
+    def validate(self, attrs):
+        if ('ids' in attrs) == ('filtro' in attrs):
+            raise serializers.ValidationError("Indique 'ids' o 'filtro' (solo uno de ellos).")
+        if 'leida' not in attrs and 'estado' not in attrs:
+            raise serializers.ValidationError("Indique 'leida' y/o 'estado'.")
+        return attrs
+
+class PeticionResumenSerializer(serializers.Serializer):
+    """Query parameters of the empresa's summary (see PeticionViewSet.resumen)."""
+    animal = serializers.IntegerField(min_value=1, required=False)
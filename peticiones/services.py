@@ -0,0 +1,143 @@
+"""
+Transiciones de estado de las peticiones.
+
+Cada transición es una transacción con `UPDATE ... WHERE` condicionales en
+lugar de leer, modificar en Python y guardar: si otra petición concurrente ha
+cambiado el animal o la petición entretanto, el UPDATE no afecta a ninguna
+fila y se lanza `ConflictoEstado` (la vista responde 409). Solo se bloquean las
+filas implicadas, nunca la tabla.
+
+Orden de bloqueo: siempre el animal antes que sus peticiones, tanto al crear
+como al aceptar, para que dos transacciones no se esperen mutuamente.
+"""
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from adoptaapi.versiones import bump
+from animales.models import Animal
+from .eventos import datos_peticion, publicar
+from .models import Peticion
+
+
+class ConflictoEstado(Exception):
+    """La transición ya no es válida por un cambio concurrente."""
+
+
+def _invalidar(empresa_id, usuario_ids, animal=False):
+    # Los UPDATE no disparan post_save: se invalidan a mano las cachés afectadas,
+    # una vez confirmada la transacción para no cachear datos anteriores a ella.
+    ambitos = [f'peticiones:empresa:{empresa_id}'] + [f'peticiones:usuario:{pk}' for pk in usuario_ids]
+    if animal:
+        ambitos.append('animales')
+    transaction.on_commit(lambda: bump(*ambitos))
+
+
+def crear_peticion(serializer, usuario):
+    """
+    Guarda una petición nueva bloqueando antes el animal, de modo que no puede
+    aceptarse otra petición del mismo animal entre la comprobación y el INSERT.
+    """
+    with transaction.atomic():
+        animal = Animal.objects.select_for_update().get(pk=serializer.validated_data['animal'].pk)
+        if animal.estado != 'No adoptado':
+            raise serializers.ValidationError({'animal': ['Este animal no está disponible para adopción.']})
+        return serializer.save(usuario=usuario, animal=animal)
+
+
+def actualizar_peticion(peticion, estado=None, leida=None):
+    """
+    Aplica los cambios de la empresa (`estado`, `leida`) a `peticion`.
+
+    Al aceptar, el animal pasa de 'No adoptado' a 'En proceso' y el resto de sus
+    peticiones pendientes se rechazan, todo en la misma transacción. Al devolver
+    una petición aceptada a 'Pendiente' o 'Rechazada', el animal vuelve de
+    'En proceso' a 'No adoptado' (si ya está 'Adoptado' no se toca). Lanza
+    `ConflictoEstado` si el animal ya no está disponible o si la petición ha
+    cambiado de estado desde que se leyó.
+    """
+    cambios = {}
+    if estado is not None and estado != peticion.estado:
+        cambios['estado'] = estado
+    if leida is not None and leida != peticion.leida:
+        cambios['leida'] = leida
+    if not cambios:
+        return peticion
+
+    aceptar = cambios.get('estado') == 'Aceptada'
+    liberar = 'estado' in cambios and peticion.estado == 'Aceptada'
+    usuarios = {peticion.usuario_id}
+    with transaction.atomic():
+        if aceptar:
+            reservado = Animal.objects.filter(pk=peticion.animal_id, estado='No adoptado').update(
+                estado='En proceso', fecha_actualizacion=timezone.now()
+            )
+            if not reservado:
+                raise ConflictoEstado('El animal ya no está disponible para adopción.')
+        elif liberar:
+            # Como al aceptar, el animal se bloquea antes que la petición
+            Animal.objects.filter(pk=peticion.animal_id, estado='En proceso').update(
+                estado='No adoptado', fecha_actualizacion=timezone.now()
+            )
+
+        actualizada = Peticion.objects.filter(pk=peticion.pk, estado=peticion.estado).update(**cambios)
+        if not actualizada:
+            # Sale de atomic() con excepción: también se deshace el cambio del animal
+            raise ConflictoEstado('La petición ha cambiado mientras se procesaba. Recárguela e inténtelo de nuevo.')
+
+        for campo, valor in cambios.items():
+            setattr(peticion, campo, valor)
+        empresa_id = peticion.animal.empresa_id
+        publicar(empresa_id, 'peticion_actualizada', peticion=datos_peticion(peticion))
+
+        if aceptar:
+            otras = Peticion.objects.filter(animal_id=peticion.animal_id, estado='Pendiente').exclude(pk=peticion.pk)
+            rechazadas = dict(otras.values_list('id', 'usuario_id'))
+            if rechazadas:
+                otras.filter(pk__in=rechazadas).update(estado='Rechazada')
+                usuarios.update(rechazadas.values())
+                publicar(empresa_id, 'peticiones_actualizadas', ids=list(rechazadas), cambios={'estado': 'Rechazada'})
+
+        _invalidar(empresa_id, usuarios, animal=aceptar or liberar)
+
+    return peticion
+
+
+def actualizar_lote(empresa, peticiones, estado=None, leida=None):
+    """
+    Aplica `estado` y/o `leida` a las peticiones de `peticiones` que pertenezcan
+    a `empresa` y aún no tengan esos valores. No admite 'Aceptada' (ver
+    actualizar_peticion) y un cambio de `estado` nunca toca las peticiones ya
+    aceptadas: dejaría el animal 'En proceso' sin petición aceptada. Devuelve el
+    número de peticiones modificadas.
+
+    Un solo UPDATE limitado a la empresa; antes se leen (y bloquean) los ids y
+    adoptantes afectados para invalidar sus cachés y publicar el evento.
+    """
+    cambios = {campo: valor for campo, valor in (('estado', estado), ('leida', leida)) if valor is not None}
+    if not cambios:
+        return 0
+    if cambios.get('estado') == 'Aceptada':
+        raise ValueError('Las peticiones se aceptan de una en una con actualizar_peticion.')
+
+    with transaction.atomic():
+        afectadas = peticiones.filter(animal__empresa=empresa).exclude(**cambios)
+        if 'estado' in cambios:
+            afectadas = afectadas.exclude(estado='Aceptada')
+        filas = dict(afectadas.select_for_update(of=('self',)).values_list('id', 'usuario_id'))
+        if not filas:
+            return 0
+        # El filtro se repite en el UPDATE: si una fila cambió entretanto, no se toca
+        actualizadas = afectadas.filter(pk__in=filas).update(**cambios)
+        publicar(empresa.pk, 'peticiones_actualizadas', ids=list(filas), cambios=cambios)
+        _invalidar(empresa.pk, set(filas.values()))
+    return actualizadas
+
+
+def cancelar_peticion(peticion):
+    """
+    Borra una petición del usuario solo si sigue pendiente (la comprobación y el
+    DELETE son la misma sentencia). Devuelve False si la empresa ya la procesó.
+    """
+    borradas, _ = Peticion.objects.filter(pk=peticion.pk, estado='Pendiente').delete()
+    return bool(borradas)
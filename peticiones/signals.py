@@ -0,0 +1,49 @@
+"""
+Versiones de los listados de peticiones (ETag, ver PeticionViewSet.get_version_scopes)
+y eventos en directo para el panel de la empresa (ver peticiones.eventos).
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from adoptaapi.versiones import bump
+from animales.models import Animal
+from usuarios.models import CustomUser
+from .eventos import datos_peticion, publicar
+from .models import Peticion
+
+
+def _empresa_de(peticion):
+    if Peticion.animal.is_cached(peticion):
+        return peticion.animal.empresa_id
+    return Animal.objects.filter(pk=peticion.animal_id).values_list('empresa_id', flat=True).first()
+
+
+@receiver(post_save, sender=Peticion)
+@receiver(post_delete, sender=Peticion)
+def invalidar_peticion(sender, instance, signal, created=False, **kwargs):
+    empresa_id = _empresa_de(instance)
+    ambitos = [f'peticiones:usuario:{instance.usuario_id}']
+    if empresa_id is not None:
+        ambitos.append(f'peticiones:empresa:{empresa_id}')
+        if signal is post_delete:
+            tipo = 'peticion_borrada'
+        else:
+            tipo = 'peticion_creada' if created else 'peticion_actualizada'
+        publicar(empresa_id, tipo, peticion=datos_peticion(instance))
+    bump(*ambitos)
+
+
+@receiver(post_save, sender=Animal)
+@receiver(post_delete, sender=Animal)
+def invalidar_peticiones_animal(sender, instance, **kwargs):
+    """Los listados de la empresa se pueden ordenar por campos del animal."""
+    bump(f'peticiones:empresa:{instance.empresa_id}')
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidar_peticiones_usuario(sender, instance, update_fields=None, **kwargs):
+    """Cada petición incluye los datos del adoptante: invalida las empresas a las que ha pedido."""
+    if instance.tipo != 'USUARIO' or update_fields == frozenset({'last_login'}):
+        return
+    empresas = Peticion.objects.filter(usuario=instance).values_list('animal__empresa_id', flat=True).distinct()
+    bump(*(f'peticiones:empresa:{pk}' for pk in empresas))
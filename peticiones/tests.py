@@ -1,3 +1,383 @@
-from django.test import TestCase
+import asyncio
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from animales.benchmarks import crear_adoptantes, crear_animales, crear_usuario
+from animales.models import Animal
+from .eventos import COLA_MAXIMA, RESYNC, InProcessBroker, canal_empresa, get_broker, publicar
+from .models import Peticion
+from .services import ConflictoEstado, actualizar_peticion
+
+
+class PeticionListadosConsultasTests(APITestCase):
+    """Los listados de peticiones hacen las mismas consultas con 2 que con 12 peticiones."""
+
+    URLS = [
+        '/api/peticiones/',
+        '/api/peticiones/?page_size=5',
+        '/api/peticiones/bandeja/',
+        '/api/peticiones/pendientes/',
+    ]
+
+    def setUp(self):
+        self.empresa = crear_usuario('protectora@example.com', 'EMPRESA', 'Madrid')
+        self.animales = crear_animales(self.empresa, 4)
+        self.adoptantes = crear_adoptantes(3, 'Madrid')
+
+    def _sembrar(self, n):
+        Peticion.objects.all().delete()
+        Peticion.objects.bulk_create([
+            Peticion(animal_id=self.animales[i % len(self.animales)],
+                     usuario=self.adoptantes[i // len(self.animales)],
+                     estado='Pendiente' if i % 2 else 'Rechazada')
+            for i in range(n)
+        ])
+
+    def _consultas(self, url, usuario):
+        self.client.force_authenticate(usuario)
+        with CaptureQueriesContext(connection) as capturadas:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(capturadas)
+
+    def test_empresa_consultas_constantes(self):
+        self._sembrar(2)
+        pocas = {url: self._consultas(url, self.empresa) for url in self.URLS}
+        self._sembrar(12)
+        muchas = {url: self._consultas(url, self.empresa) for url in self.URLS}
+        self.assertEqual(pocas, muchas)
+
+    def test_usuario_consultas_constantes(self):
+        adoptante = self.adoptantes[0]
+        self._sembrar(1)
+        pocas = self._consultas('/api/peticiones/', adoptante)
+        self._sembrar(12)
+        self.assertEqual(Peticion.objects.filter(usuario=adoptante).count(), 4)
+        with self.assertNumQueries(pocas):
+            self.client.get('/api/peticiones/')
+
+    def test_cursor_con_orden_por_campo_del_animal(self):
+        self._sembrar(12)
+        self.client.force_authenticate(self.empresa)
+        vistos, url = [], '/api/peticiones/?page_size=5&order_by=animal__nombre'
+        while url:
+            data = self.client.get(url).json()
+            vistos += [peticion['id'] for peticion in data['results']]
+            url = data['next']
+        self.assertEqual(sorted(vistos), sorted(Peticion.objects.values_list('id', flat=True)))
+
+
+class ExportacionTests(APITestCase):
+    def setUp(self):
+        self.empresa = crear_usuario('protectora@example.com', 'EMPRESA', 'Madrid')
+        animales = crear_animales(self.empresa, 3)
+        adoptantes = crear_adoptantes(5, 'Madrid')
+        self.adoptante = adoptantes[0]
+        Peticion.objects.bulk_create([
+            Peticion(animal_id=animales[i % 3], usuario=adoptante) for i, adoptante in enumerate(adoptantes)
+        ])
+        self.cabeceras = {'Authorization': f'Token {Token.objects.create(user=self.empresa).key}'}
+
+    async def _aexportar(self, url):
+        response = await AsyncClient().get(url, headers=self.cabeceras)
+        self.assertTrue(response.is_async)
+        return b''.join([trozo async for trozo in response.streaming_content])
+
+    def test_asgi_transmite_lo_mismo_con_un_iterador_asincrono(self):
+        for formato in ('csv', 'jsonl'):
+            with self.subTest(formato=formato):
+                url = f'/api/peticiones/exportar/?formato={formato}'
+                response = self.client.get(url, headers=self.cabeceras)
+                self.assertFalse(response.is_async)
+                sincrono = b''.join(response.streaming_content)
+                self.assertEqual(len(sincrono.splitlines()), 6 if formato == 'csv' else 5)
+                self.assertEqual(async_to_sync(self._aexportar)(url), sincrono)
+
+    def test_solo_empresas(self):
+        self.client.force_authenticate(self.adoptante)
+        self.assertEqual(self.client.get('/api/peticiones/exportar/').status_code, 403)
+
+
+class PeticionLoteTests(APITestCase):
+    def setUp(self):
+        self.empresa = crear_usuario('protectora@example.com', 'EMPRESA', 'Madrid')
+        otra = crear_usuario('otra@example.com', 'EMPRESA', 'Madrid')
+        animal, reservado = crear_animales(self.empresa, 2)
+        ajeno, = crear_animales(otra, 1, nombre='Ajeno')
+        Animal.objects.filter(pk=reservado).update(estado='En proceso')
+        adoptantes = crear_adoptantes(2, 'Madrid')
+        self.pendiente, self.rechazada, self.aceptada, self.ajena = Peticion.objects.bulk_create([
+            Peticion(animal_id=animal, usuario=adoptantes[0]),
+            Peticion(animal_id=animal, usuario=adoptantes[1], estado='Rechazada'),
+            Peticion(animal_id=reservado, usuario=adoptantes[0], estado='Aceptada'),
+            Peticion(animal_id=ajeno, usuario=adoptantes[1]),
+        ])
+        self.client.force_authenticate(self.empresa)
+
+    def _lote(self, datos):
+        return self.client.post('/api/peticiones/lote/', datos, format='json')
+
+    def _estados(self):
+        return dict(Peticion.objects.values_list('id', 'estado'))
+
+    def test_por_ids_ignora_las_de_otras_empresas(self):
+        response = self._lote({'ids': [self.pendiente.pk, self.ajena.pk], 'leida': True})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'actualizadas': 1})
+        self.assertEqual(set(Peticion.objects.filter(leida=True).values_list('id', flat=True)), {self.pendiente.pk})
+
+    def test_por_filtro(self):
+        response = self._lote({'filtro': {'estado': ['Pendiente', 'Rechazada']}, 'leida': True})
+        self.assertEqual(response.json(), {'actualizadas': 2})
+        self.assertEqual(set(Peticion.objects.filter(leida=True).values_list('id', flat=True)),
+                         {self.pendiente.pk, self.rechazada.pk})
+        # Las que ya tienen el valor no cuentan
+        self.assertEqual(self._lote({'filtro': {'leida': False}, 'leida': True}).json(), {'actualizadas': 1})
+
+    def test_cambio_de_estado_no_toca_las_aceptadas(self):
+        response = self._lote({'filtro': {}, 'estado': 'Rechazada'})
+        self.assertEqual(response.json(), {'actualizadas': 1})
+        estados = self._estados()
+        self.assertEqual(estados[self.pendiente.pk], 'Rechazada')
+        self.assertEqual(estados[self.aceptada.pk], 'Aceptada')
+        self.assertEqual(estados[self.ajena.pk], 'Pendiente')
+        self.assertEqual(self._lote({'ids': [self.aceptada.pk], 'estado': 'Pendiente'}).json(), {'actualizadas': 0})
+        self.assertEqual(self._estados()[self.aceptada.pk], 'Aceptada')
+        # Marcarlas como leídas sí se puede
+        self.assertEqual(self._lote({'ids': [self.aceptada.pk], 'leida': True}).json(), {'actualizadas': 1})
+
+    def test_validacion_y_permisos(self):
+        for datos in ({'filtro': {}, 'estado': 'Aceptada'}, {'filtro': {}}, {'leida': True},
+                      {'ids': [self.pendiente.pk], 'filtro': {}, 'leida': True}):
+            with self.subTest(datos=datos):
+                self.assertEqual(self._lote(datos).status_code, 400)
+        self.client.force_authenticate(self.pendiente.usuario)
+        self.assertEqual(self._lote({'filtro': {}, 'leida': True}).status_code, 403)
+
+
+class ResumenTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.empresa = crear_usuario('protectora@example.com', 'EMPRESA', 'Madrid')
+        self.animales = crear_animales(self.empresa, 3)
+        ajeno, = crear_animales(crear_usuario('otra@example.com', 'EMPRESA', 'Madrid'), 1)
+        adoptantes = crear_adoptantes(3, 'Madrid')
+        self.peticiones = Peticion.objects.bulk_create([
+            Peticion(animal_id=self.animales[0], usuario=adoptantes[0], estado='Aceptada', leida=True),
+            Peticion(animal_id=self.animales[0], usuario=adoptantes[1], estado='Rechazada'),
+            Peticion(animal_id=self.animales[0], usuario=adoptantes[2]),
+            Peticion(animal_id=self.animales[1], usuario=adoptantes[0], leida=True),
+            Peticion(animal_id=ajeno, usuario=adoptantes[1]),
+        ])
+        self.client.force_authenticate(self.empresa)
+
+    def _resumen(self, **params):
+        response = self.client.get('/api/peticiones/resumen/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_contadores(self):
+        data = self._resumen()
+        self.assertEqual({c: data[c] for c in ('total', 'pendientes', 'aceptadas', 'rechazadas', 'no_leidas')},
+                         {'total': 4, 'pendientes': 2, 'aceptadas': 1, 'rechazadas': 1, 'no_leidas': 2})
+        self.assertEqual(data['animales'], [
+            {'animal': self.animales[0], 'nombre': 'Animal 0', 'total': 3, 'pendientes': 1, 'aceptadas': 1,
+             'rechazadas': 1, 'no_leidas': 2},
+            {'animal': self.animales[1], 'nombre': 'Animal 1', 'total': 1, 'pendientes': 1, 'aceptadas': 0,
+             'rechazadas': 0, 'no_leidas': 0},
+        ])
+        por_animal = self._resumen(animal=self.animales[1])
+        self.assertEqual((por_animal['total'], len(por_animal['animales'])), (1, 1))
+
+    def test_animal_invalido_es_400(self):
+        for animal in ('abc', '0', '-1', '1.5'):
+            with self.subTest(animal=animal):
+                response = self.client.get('/api/peticiones/resumen/', {'animal': animal})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('animal', response.json())
+
+    @override_settings(VERSIONES_COMPARTIDAS=True)
+    def test_la_cache_se_invalida_al_cambiar_una_peticion(self):
+        self.assertEqual(self._resumen()['no_leidas'], 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(self._resumen()['no_leidas'], 2)
+        # La misma caché aunque la fila cambie sin pasar por la API...
+        Peticion.objects.filter(pk=self.peticiones[1].pk).update(leida=True)
+        self.assertEqual(self._resumen()['no_leidas'], 2)
+        # ...hasta que sube la versión de la empresa (p. ej. al marcarla leída por la API)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/peticiones/{self.peticiones[2].pk}/', {'leida': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._resumen()['no_leidas'], 0)
+
+
+class EventosTests(APITestCase):
+    """Canal SSE de peticiones (solo ASGI) con el InProcessBroker por defecto."""
+
+    def setUp(self):
+        cache.clear()
+        self.empresa = crear_usuario('protectora@example.com', 'EMPRESA', 'Madrid')
+        self.token = Token.objects.create(user=self.empresa).key
+
+    def _ticket(self, usuario=None):
+        self.client.force_authenticate(usuario or self.empresa)
+        response = self.client.post('/api/peticiones/eventos/ticket/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['ticket']
+
+    async def _aget(self, params=None, headers=None):
+        return await AsyncClient().get('/api/peticiones/eventos/', params or {}, headers=headers or {})
+
+    def _publicar_y_confirmar(self, tipo):
+        # Lo que se publica dentro de una transacción deshecha no llega nunca
+        try:
+            with transaction.atomic():
+                publicar(self.empresa.pk, 'deshecho')
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        with self.captureOnCommitCallbacks(execute=True):
+            publicar(self.empresa.pk, tipo, ids=[1])
+
+    async def _escuchar(self, params=None, headers=None):
+        response = await self._aget(params, headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        recibidos = asyncio.Queue()
+
+        async def consumir():
+            async for trozo in response.streaming_content:
+                await recibidos.put(trozo.decode())
+
+        tarea = asyncio.create_task(consumir())
+        conectado = await asyncio.wait_for(recibidos.get(), 5)
+        self.assertIn(canal_empresa(self.empresa.pk), get_broker()._suscriptores)
+        await sync_to_async(self._publicar_y_confirmar)('peticiones_actualizadas')
+        evento = await asyncio.wait_for(recibidos.get(), 5)
+        # El servidor cancela la respuesta cuando el cliente se desconecta
+        tarea.cancel()
+        await asyncio.gather(tarea, return_exceptions=True)
+        return conectado, evento
+
+    def test_entrega_al_confirmar_y_baja_al_desconectar(self):
+        conectado, evento = async_to_sync(self._escuchar)({'ticket': self._ticket()})
+        self.assertIn('event: conectado', conectado)
+        self.assertEqual(
+            evento, 'id: 1\nevent: peticiones_actualizadas\ndata: {"ids":[1],"tipo":"peticiones_actualizadas"}\n\n'
+        )
+        self.assertNotIn(canal_empresa(self.empresa.pk), get_broker()._suscriptores)
+
+    def test_cabecera_authorization(self):
+        conectado, _ = async_to_sync(self._escuchar)(headers={'Authorization': f'Token {self.token}'})
+        self.assertIn('event: conectado', conectado)
+
+    def test_ticket_de_un_solo_uso(self):
+        ticket = self._ticket()
+        async_to_sync(self._escuchar)({'ticket': ticket})
+        self.assertEqual(async_to_sync(self._aget)({'ticket': ticket}).status_code, 401)
+
+    def test_sin_credenciales_validas(self):
+        # El token de la API ya no se acepta en la URL
+        for params in ({}, {'token': self.token}, {'ticket': 'inventado'}):
+            with self.subTest(params=params):
+                self.assertEqual(async_to_sync(self._aget)(params).status_code, 401)
+        ticket = self._ticket()
+        self.empresa.is_active = False
+        self.empresa.save()
+        self.assertEqual(async_to_sync(self._aget)({'ticket': ticket}).status_code, 401)
+
+    def test_solo_empresas(self):
+        adoptante = crear_usuario('adoptante@example.com', 'USUARIO', 'Madrid')
+        self.client.force_authenticate(adoptante)
+        self.assertEqual(self.client.post('/api/peticiones/eventos/ticket/').status_code, 403)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.post('/api/peticiones/eventos/ticket/').status_code, 401)
+        key = Token.objects.create(user=adoptante).key
+        response = async_to_sync(self._aget)(headers={'Authorization': f'Token {key}'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_wsgi_es_501(self):
+        response = self.client.get('/api/peticiones/eventos/', {'ticket': self._ticket()})
+        self.assertEqual(response.status_code, 501)
+
+
+class InProcessBrokerTests(TestCase):
+    async def _desbordar(self):
+        broker = InProcessBroker()
+        async with broker.subscribe('canal') as siguiente:
+            for numero in range(COLA_MAXIMA + 1):
+                broker.publish('canal', {'tipo': 'evento', 'numero': numero})
+                broker.publish('otro', {'tipo': 'evento'})
+            await asyncio.sleep(0)
+            primero = await siguiente()
+        return primero, broker._suscriptores
+
+    def test_cliente_lento_recibe_resync(self):
+        primero, suscriptores = async_to_sync(self._desbordar)()
+        self.assertEqual(primero, RESYNC)
+        self.assertEqual(suscriptores, {})
+
+
+class ActualizarPeticionTests(APITestCase):
+    def setUp(self):
+        self.empresa = crear_usuario('protectora@example.com', 'EMPRESA', 'Madrid')
+        self.animal, otro = crear_animales(self.empresa, 2)
+        adoptantes = crear_adoptantes(3, 'Madrid')
+        self.primera, self.segunda, self.tercera, self.otra = Peticion.objects.bulk_create([
+            Peticion(animal_id=self.animal, usuario=adoptantes[0]),
+            Peticion(animal_id=self.animal, usuario=adoptantes[1]),
+            Peticion(animal_id=self.animal, usuario=adoptantes[2], estado='Rechazada'),
+            Peticion(animal_id=otro, usuario=adoptantes[1]),
+        ])
+        self.client.force_authenticate(self.empresa)
+
+    def _patch(self, peticion, estado):
+        return self.client.patch(f'/api/peticiones/{peticion.pk}/', {'estado': estado}, format='json')
+
+    def _estado_animal(self):
+        return Animal.objects.get(pk=self.animal).estado
+
+    def test_aceptar_reserva_el_animal_y_rechaza_las_pendientes(self):
+        response = self._patch(self.primera, 'Aceptada')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['estado'], 'Aceptada')
+        self.assertEqual(self._estado_animal(), 'En proceso')
+        estados = dict(Peticion.objects.values_list('id', 'estado'))
+        self.assertEqual(estados, {self.primera.pk: 'Aceptada', self.segunda.pk: 'Rechazada',
+                                   self.tercera.pk: 'Rechazada', self.otra.pk: 'Pendiente'})
+
+    def test_segunda_aceptacion_es_409(self):
+        self._patch(self.primera, 'Aceptada')
+        response = self._patch(self.segunda, 'Aceptada')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Peticion.objects.get(pk=self.segunda.pk).estado, 'Rechazada')
+
+    def test_peticion_cambiada_entretanto_es_conflicto(self):
+        leida = Peticion.objects.get(pk=self.primera.pk)
+        Peticion.objects.filter(pk=self.primera.pk).update(estado='Rechazada')
+        with self.assertRaises(ConflictoEstado):
+            actualizar_peticion(leida, estado='Aceptada')
+        # La reserva del animal se deshace con la transacción
+        self.assertEqual(self._estado_animal(), 'No adoptado')
+
+    def test_deshacer_la_aceptacion_libera_el_animal(self):
+        for estado in ('Pendiente', 'Rechazada'):
+            with self.subTest(estado=estado):
+                self.assertEqual(self._patch(self.primera, 'Aceptada').status_code, 200)
+                self.assertEqual(self._patch(self.primera, estado).status_code, 200)
+                self.assertEqual(self._estado_animal(), 'No adoptado')
+                Peticion.objects.filter(pk=self.primera.pk).update(estado='Pendiente')
+        # Y se puede aceptar otra
+        self.assertEqual(self._patch(self.primera, 'Aceptada').status_code, 200)
+
+    def test_animal_adoptado_no_vuelve_a_estar_disponible(self):
+        self._patch(self.primera, 'Aceptada')
+        Animal.objects.filter(pk=self.animal).update(estado='Adoptado')
+        self.assertEqual(self._patch(self.primera, 'Rechazada').status_code, 200)
+        self.assertEqual(self._estado_animal(), 'Adoptado')
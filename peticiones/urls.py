@@ -1,10 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import PeticionViewSet
+from .views import PeticionViewSet, eventos_peticiones
 
 router = DefaultRouter()
 router.register(r'peticiones', PeticionViewSet, basename='peticion')
 
 urlpatterns = [
+    # Before the router: 'eventos' would otherwise match the detail route
+    path('peticiones/eventos/', eventos_peticiones, name='peticion-eventos'),
     path('', include(router.urls)),
 ] 
\ No newline at end of file
@@ -1,9 +1,34 @@
+import asyncio
+import json
+import secrets
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from .models import Peticion, Animal
-from .serializers import PeticionListSerializer, PeticionCreateSerializer, PeticionUpdateSerializer
+from .serializers import (
+    PeticionListSerializer, PeticionCreateSerializer, PeticionUpdateSerializer, PeticionLoteSerializer,
+    PeticionResumenSerializer,
+)
+from .pagination import PeticionCursorPagination
+from .services import ConflictoEstado, crear_peticion, actualizar_peticion, actualizar_lote, cancelar_peticion
+from django.core.cache import cache
+from django.db.models import Count, F, Q
+from adoptaapi.asincrono import AsyncReadMixin
+from adoptaapi.condicional import ConditionalGetMixin
+from adoptaapi.routers import ReadReplicaMixin
+from adoptaapi.exportacion import FORMATOS as FORMATOS_EXPORTACION, exportar
+from adoptaapi.versiones import get_version
+from usuarios.authentication import CachedTokenAuthentication
+from usuarios.models import CustomUser
+from .eventos import canal_empresa, get_broker
 
 # Create your views here.
 
@@ -21,8 +46,9 @@ class IsUser(permissions.BasePermission):
     def has_permission(self, request, view):
         return request.user.is_authenticated and request.user.tipo == 'USUARIO'
 
-class PeticionViewSet(viewsets.ModelViewSet):
+class PeticionViewSet(AsyncReadMixin, ReadReplicaMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Peticion.objects.all()
+    pagination_class = PeticionCursorPagination  # opt-in: ?page_size=N / ?cursor=...
     # serializer_class will be determined by get_serializer_class
 
     def get_serializer_class(self):
@@ -47,6 +73,8 @@ class PeticionViewSet(viewsets.ModelViewSet):
             self.permission_classes = [IsCompany]
         elif self.action == 'destroy':
             self.permission_classes = [IsUser]
+        elif self.action in ['exportar', 'lote', 'resumen', 'ticket_eventos']:
+            self.permission_classes = [IsCompany]
         else: # Covers 'list', 'retrieve', etc.
             self.permission_classes = [permissions.IsAuthenticated]
         return super().get_permissions()
@@ -68,35 +96,78 @@ class PeticionViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(animal_id=animal_id)
         return queryset
 
+    def get_version_scopes(self):
+        """
+        Version scopes for conditional GETs, bumped by peticiones.signals.
+        A user's list can also be ordered by animal fields, so it depends on 'animales' too.
+        """
+        user = self.request.user
+        if user.tipo == 'EMPRESA':
+            return (f'peticiones:empresa:{user.pk}',)
+        if user.tipo == 'USUARIO':
+            return (f'peticiones:usuario:{user.pk}', 'animales')
+        return ()
+
+    def list(self, request, *args, **kwargs):
+        """
+        Lists the petitions visible to the user (see get_queryset), with the
+        same ordering and pagination options as the empresa actions.
+        """
+        return self._listar()
+
+    # Async versions of the list actions (ASGI server, see adoptaapi.asincrono)
+    async_actions = ('list', 'bandeja', 'default', 'pendientes', 'aceptadas', 'rechazadas')
+
+    async def alist(self, request, *args, **kwargs):
+        return await self._alistar()
+
+    async def abandeja(self, request):
+        estados = self._estados_bandeja(request)
+        if isinstance(estados, Response):
+            return estados
+        return await self._alistar(estados)
+
+    async def adefault(self, request):
+        return await self._alistar(self.ESTADOS_DEFAULT)
+
+    async def apendientes(self, request):
+        return await self._alistar(['Pendiente'])
+
+    async def aaceptadas(self, request):
+        return await self._alistar(['Aceptada'])
+
+    async def arechazadas(self, request):
+        return await self._alistar(['Rechazada'])
+
     def perform_create(self, serializer):
         """
-        Associate the petition with the logged-in user.
+        Associate the petition with the logged-in user (locking the animal, see crear_peticion).
         """
-        serializer.save(usuario=self.request.user)
+        crear_peticion(serializer, self.request.user)
 
     def update(self, request, *args, **kwargs):
         """
         Custom update logic for petitions.
         - A company can update the 'estado' and 'leida' fields.
-        - If a petition is accepted, the animal's estado is updated to 'En proceso'.
+        - If a petition is accepted, the animal's estado is updated to 'En proceso' and
+          the animal's other pending petitions are rejected, atomically (see actualizar_peticion).
+        - Moving an accepted petition back to 'Pendiente' or 'Rechazada' sets the animal back to 'No adoptado'.
+        - Returns 409 if the animal or the petition changed concurrently.
         """
         peticion = self.get_object()
         user = request.user
 
         # Security check: ensure the company owns the animal associated with the petition
-        if peticion.animal.empresa != user:
+        if peticion.animal.empresa_id != user.pk:
             return Response({'error': 'No tiene permiso para modificar esta petición.'}, status=status.HTTP_403_FORBIDDEN)
         
         serializer = self.get_serializer(peticion, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
-        
-        new_estado = serializer.validated_data.get('estado')
-        if new_estado == 'Aceptada':
-            animal = peticion.animal
-            animal.estado = 'En proceso'
-            animal.save()
-            
-        self.perform_update(serializer)
+
+        try:
+            actualizar_peticion(peticion, **serializer.validated_data)
+        except ConflictoEstado as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
         
         # After updating, return the detailed data using the ListSerializer
         return Response(PeticionListSerializer(peticion).data)
@@ -109,144 +180,370 @@ class PeticionViewSet(viewsets.ModelViewSet):
         """
         peticion = self.get_object() # This will raise 404 if not found for the user, due to get_queryset
 
-        if peticion.estado != 'Pendiente':
+        if not cancelar_peticion(peticion):
             return Response(
                 {'error': 'No se puede cancelar una petición que ya ha sido procesada por la empresa.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        self.perform_destroy(peticion)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-    def _get_base_queryset(self):
+    @action(detail=False, methods=['post'], permission_classes=[IsCompany])
+    def lote(self, request):
         """
-        Base queryset for empresa peticiones with ordering.
-        Supports dynamic ordering through query parameters:
+        Bulk 'leida' / 'estado' change, e.g. marking the whole inbox as read.
+        Body: {"ids": [1, 2, ...]} or {"filtro": {"estado": ["Pendiente"], "animal": 3, "leida": false}},
+        plus "leida" and/or "estado" ('Pendiente' or 'Rechazada'; accepting is one by one,
+        and accepted petitions keep their estado).
+        Petitions of other companies are ignored. Returns {"actualizadas": n}.
+        """
+        lote = PeticionLoteSerializer(data=request.data)
+        lote.is_valid(raise_exception=True)
+        datos = lote.validated_data
+
+        peticiones = Peticion.objects.all()
+        if 'ids' in datos:
+            peticiones = peticiones.filter(pk__in=datos['ids'])
+        else:
+            filtro = datos['filtro']
+            if 'estado' in filtro:
+                peticiones = peticiones.filter(estado__in=filtro['estado'])
+            if 'animal' in filtro:
+                peticiones = peticiones.filter(animal_id=filtro['animal'])
+            if 'leida' in filtro:
+                peticiones = peticiones.filter(leida=filtro['leida'])
+
+        actualizadas = actualizar_lote(request.user, peticiones, estado=datos.get('estado'), leida=datos.get('leida'))
+        return Response({'actualizadas': actualizadas})
+
+    # Campos por los que se puede ordenar -> alias anotado (la paginación por
+    # cursor necesita leer el valor de orden directamente de cada fila)
+    ORDERING_FIELDS = {
+        'fecha_peticion': 'fecha_peticion',
+        'animal__nombre': 'animal_nombre',
+        'animal__fecha_nacimiento': 'animal_fecha_nacimiento',
+    }
+    ESTADOS_DEFAULT = ['Aceptada', 'Pendiente']
+
+    def get_ordering(self):
+        """
+        Ordering from the query parameters, restricted to ORDERING_FIELDS:
         - order_by: field to order by ('fecha_peticion', 'animal__nombre', 'animal__fecha_nacimiento')
         - order_direction: 'asc' or 'desc' (defaults to 'desc' for fecha_peticion, 'asc' for others)
+        Always ends with `id` so the order is total and stable across pages.
         """
-        queryset = self.get_queryset().select_related('animal')
-        
-        # Get ordering parameters from request
         order_by = self.request.query_params.get('order_by', 'fecha_peticion')
-        order_direction = self.request.query_params.get('order_direction', 'desc' if order_by == 'fecha_peticion' else 'asc')
-        
-        # Validate order_by field
-        valid_fields = ['fecha_peticion', 'animal__nombre', 'animal__fecha_nacimiento']
-        if order_by not in valid_fields:
+        if order_by not in self.ORDERING_FIELDS:
             order_by = 'fecha_peticion'  # Default to fecha_peticion if invalid field
-        
-        # Apply ordering
+        default_direction = 'desc' if order_by == 'fecha_peticion' else 'asc'
+        order_direction = self.request.query_params.get('order_direction', default_direction)
+
         prefix = '-' if order_direction == 'desc' else ''
-        return queryset.order_by(f'{prefix}{order_by}')
+        return (f'{prefix}{self.ORDERING_FIELDS[order_by]}', f'{prefix}id')
+
+    def _get_base_queryset(self):
+        """
+        Base queryset for empresa peticiones with ordering (see get_ordering).
+        Loads each petition and its usuario in the same query, restricted to
+        the columns PeticionListSerializer needs.
+        """
+        return self.get_queryset().select_related('usuario').only(
+            *PeticionListSerializer.only_fields()
+        ).annotate(
+            animal_nombre=F('animal__nombre'),
+            animal_fecha_nacimiento=F('animal__fecha_nacimiento'),
+        ).order_by(*self.get_ordering())
+
+    def _listar(self, estados=None, animal_id=None):
+        """
+        Shared query plan for every peticion list action: estado set, optional
+        animal filter, whitelisted ordering and opt-in cursor pagination
+        (?page_size=N, then ?cursor=...) without a COUNT query.
+        """
+        queryset = self._listado(estados, animal_id)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    async def _alistar(self, estados=None, animal_id=None):
+        """_listar() with the async ORM (ASGI server, see adoptaapi.asincrono)."""
+        queryset = self._listado(estados, animal_id)
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer([peticion async for peticion in queryset], many=True)
+        return Response(serializer.data)
+
+    def _listado(self, estados, animal_id):
+        queryset = self._get_base_queryset()
+        if estados is not None:
+            queryset = queryset.filter(estado__in=estados)
+        if animal_id is not None:
+            queryset = queryset.filter(animal_id=animal_id)
+        return queryset
+
+    def _estados_bandeja(self, request):
+        """Estados requested in ?estado= (defaults to ESTADOS_DEFAULT), or a 400 response if any is invalid."""
+        estado = request.query_params.get('estado')
+        estados = estado.split(',') if estado else self.ESTADOS_DEFAULT
+        validos = {choice for choice, _ in Peticion.ESTADO_CHOICES}
+        if not set(estados) <= validos:
+            return Response(
+                {'error': f"Estado inválido. Valores permitidos: {', '.join(sorted(validos))}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return estados
+
+    @action(detail=False, methods=['get'], permission_classes=[IsCompany])
+    def bandeja(self, request):
+        """
+        Single filtered endpoint for the empresa dashboard.
+        Query parameters:
+        - estado: comma separated estados (defaults to 'Aceptada,Pendiente')
+        - animal: optional animal ID
+        - order_by / order_direction: see get_ordering
+        - page_size / cursor: optional cursor pagination
+        """
+        estados = self._estados_bandeja(request)
+        if isinstance(estados, Response):
+            return estados
+        # The 'animal' query parameter is already applied by get_queryset
+        return self._listar(estados)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsCompany])
+    def resumen(self, request):
+        """
+        Petition counts per animal of the empresa (unread badges, per-animal totals)
+        computed with one grouped query instead of downloading the petitions.
+        Query parameters:
+        - animal: optional animal ID (400 if it is not a positive integer)
+        Only animals with at least one petition are listed. The result is cached
+        under the empresa's peticiones version, so any petition change refreshes it.
+        """
+        parametros = PeticionResumenSerializer(data=request.query_params)
+        parametros.is_valid(raise_exception=True)
+        version = get_version(f'peticiones:empresa:{request.user.pk}')
+        clave = f'peticiones:resumen:{request.user.pk}:{version}:{parametros.validated_data.get("animal", "")}'
+        data = cache.get(clave)
+        if data is None:
+            data = self._resumen()
+            cache.set(clave, data, settings.PETICIONES_RESUMEN_CACHE_TTL)
+        return Response(data)
+
+    def _resumen(self):
+        # GROUP BY animal over peticion_resumen_idx (animal, estado, leida)
+        animales = list(
+            self.get_queryset()
+            .values('animal_id', 'animal__nombre')
+            .annotate(
+                total=Count('id'),
+                pendientes=Count('id', filter=Q(estado='Pendiente')),
+                aceptadas=Count('id', filter=Q(estado='Aceptada')),
+                rechazadas=Count('id', filter=Q(estado='Rechazada')),
+                no_leidas=Count('id', filter=Q(leida=False)),
+            )
+            .order_by('animal_id')
+        )
+        contadores = ('total', 'pendientes', 'aceptadas', 'rechazadas', 'no_leidas')
+        return {
+            **{campo: sum(fila[campo] for fila in animales) for campo in contadores},
+            'animales': [
+                {'animal': fila['animal_id'], 'nombre': fila['animal__nombre'], **{c: fila[c] for c in contadores}}
+                for fila in animales
+            ],
+        }
+
+    EXPORT_COLUMNS = ('id', 'animal_id', 'animal__nombre', 'usuario_id', 'usuario__email',
+                      'usuario__nombre', 'usuario__telefono', 'estado', 'leida', 'fecha_peticion')
+
+    @action(detail=False, methods=['get'], permission_classes=[IsCompany])
+    def exportar(self, request):
+        """
+        Streams every petition of the empresa as a file download.
+        Query parameters:
+        - formato: 'csv' (default) or 'jsonl'
+        - estado: optional comma separated estados
+        - animal: optional animal ID
+        """
+        formato = request.query_params.get('formato', 'csv')
+        if formato not in FORMATOS_EXPORTACION:
+            return Response(
+                {'error': f"Formato inválido. Valores permitidos: {', '.join(FORMATOS_EXPORTACION)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        queryset = self.get_queryset().order_by('fecha_peticion', 'id')
+        estado = request.query_params.get('estado')
+        if estado:
+            estados = estado.split(',')
+            validos = {choice for choice, _ in Peticion.ESTADO_CHOICES}
+            if not set(estados) <= validos:
+                return Response(
+                    {'error': f"Estado inválido. Valores permitidos: {', '.join(sorted(validos))}."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            queryset = queryset.filter(estado__in=estados)
+        return exportar(queryset, self.EXPORT_COLUMNS, formato, 'peticiones', request=request)
 
     @action(detail=False, methods=['get'], permission_classes=[IsCompany])
     def default(self, request):
         """
         Shows only Aceptadas or Pendientes peticiones for the empresa.
-        Supports ordering through query parameters:
-        - order_by: field to order by ('fecha_peticion', 'animal__nombre', 'animal__fecha_nacimiento')
-        - order_direction: 'asc' or 'desc'
+        Supports ordering and pagination (see bandeja).
         """
-        queryset = self._get_base_queryset().filter(
-            estado__in=['Aceptada', 'Pendiente']
-        )
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return self._listar(self.ESTADOS_DEFAULT)
 
     @action(detail=False, methods=['get'], permission_classes=[IsCompany])
     def rechazadas(self, request):
         """
         Shows only Rechazadas peticiones for the empresa.
-        Supports ordering through query parameters:
-        - order_by: field to order by ('fecha_peticion', 'animal__nombre', 'animal__fecha_nacimiento')
-        - order_direction: 'asc' or 'desc'
+        Supports ordering and pagination (see bandeja).
         """
-        queryset = self._get_base_queryset().filter(estado='Rechazada')
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return self._listar(['Rechazada'])
 
     @action(detail=False, methods=['get'], permission_classes=[IsCompany])
     def aceptadas(self, request):
         """
         Shows only Aceptadas peticiones for the empresa.
-        Supports ordering through query parameters:
-        - order_by: field to order by ('fecha_peticion', 'animal__nombre', 'animal__fecha_nacimiento')
-        - order_direction: 'asc' or 'desc'
+        Supports ordering and pagination (see bandeja).
         """
-        queryset = self._get_base_queryset().filter(estado='Aceptada')
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return self._listar(['Aceptada'])
 
     @action(detail=False, methods=['get'], permission_classes=[IsCompany])
     def pendientes(self, request):
         """
         Shows only Pendientes peticiones for the empresa.
-        Supports ordering through query parameters:
-        - order_by: field to order by ('fecha_peticion', 'animal__nombre', 'animal__fecha_nacimiento')
-        - order_direction: 'asc' or 'desc'
+        Supports ordering and pagination (see bandeja).
         """
-        queryset = self._get_base_queryset().filter(estado='Pendiente')
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return self._listar(['Pendiente'])
 
     # New endpoints for specific animal peticiones
     @action(detail=True, methods=['get'], permission_classes=[IsCompany])
     def default_animal(self, request, pk=None):
         """
         Shows only Aceptadas or Pendientes peticiones for a specific animal.
-        Supports ordering through query parameters:
-        - order_by: field to order by ('fecha_peticion', 'animal__nombre', 'animal__fecha_nacimiento')
-        - order_direction: 'asc' or 'desc'
+        Supports ordering and pagination (see bandeja).
         """
-        queryset = self._get_base_queryset().filter(
-            animal_id=pk,
-            estado__in=['Aceptada', 'Pendiente']
-        )
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return self._listar(self.ESTADOS_DEFAULT, animal_id=pk)
 
     @action(detail=True, methods=['get'], permission_classes=[IsCompany])
     def rechazadas_animal(self, request, pk=None):
         """
         Shows only Rechazadas peticiones for a specific animal.
-        Supports ordering through query parameters:
-        - order_by: field to order by ('fecha_peticion', 'animal__nombre', 'animal__fecha_nacimiento')
-        - order_direction: 'asc' or 'desc'
+        Supports ordering and pagination (see bandeja).
         """
-        queryset = self._get_base_queryset().filter(
-            animal_id=pk,
-            estado='Rechazada'
-        )
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return self._listar(['Rechazada'], animal_id=pk)
 
     @action(detail=True, methods=['get'], permission_classes=[IsCompany])
     def aceptadas_animal(self, request, pk=None):
         """
         Shows only Aceptadas peticiones for a specific animal.
-        Supports ordering through query parameters:
-        - order_by: field to order by ('fecha_peticion', 'animal__nombre', 'animal__fecha_nacimiento')
-        - order_direction: 'asc' or 'desc'
+        Supports ordering and pagination (see bandeja).
         """
-        queryset = self._get_base_queryset().filter(
-            animal_id=pk,
-            estado='Aceptada'
-        )
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return self._listar(['Aceptada'], animal_id=pk)
 
     @action(detail=True, methods=['get'], permission_classes=[IsCompany])
     def pendientes_animal(self, request, pk=None):
         """
         Shows only Pendientes peticiones for a specific animal.
-        Supports ordering through query parameters:
-        - order_by: field to order by ('fecha_peticion', 'animal__nombre', 'animal__fecha_nacimiento')
-        - order_direction: 'asc' or 'desc'
+        Supports ordering and pagination (see bandeja).
         """
-        queryset = self._get_base_queryset().filter(
-            animal_id=pk,
-            estado='Pendiente'
-        )
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return self._listar(['Pendiente'], animal_id=pk)
+
+    @action(detail=False, methods=['post'], url_path='eventos/ticket', permission_classes=[IsCompany])
+    def ticket_eventos(self, request):
+        """
+        Issues a single-use ticket to open the event stream from a browser:
+        GET /api/peticiones/eventos/?ticket=<ticket> (see eventos_peticiones).
+        Returns {"ticket": "...", "expira": seconds}.
+        """
+        ticket = secrets.token_urlsafe(32)
+        cache.set(_clave_ticket(ticket), request.user.pk, settings.PETICIONES_EVENTOS_TICKET_TTL)
+        return Response({'ticket': ticket, 'expira': settings.PETICIONES_EVENTOS_TICKET_TTL})
+
+
+def _clave_ticket(ticket):
+    return f'peticiones:eventos:ticket:{ticket}'
+
+
+def _token(request):
+    """Token from the Authorization header, if any."""
+    keyword = CachedTokenAuthentication.keyword
+    partes = request.headers.get('Authorization', '').split()
+    if len(partes) == 2 and partes[0].lower() == keyword.lower():
+        return partes[1]
+    return None
+
+
+async def _usuario_eventos(request):
+    """
+    User of the event stream: from the Authorization header or, since EventSource
+    cannot send headers, from a ?ticket= issued by PeticionViewSet.ticket_eventos.
+    A ticket works once and expires after PETICIONES_EVENTOS_TICKET_TTL seconds,
+    so the permanent API token never appears in URLs (access logs, proxies,
+    browser history). Raises AuthenticationFailed.
+    """
+    key = _token(request)
+    if key:
+        user, _ = await sync_to_async(CachedTokenAuthentication().authenticate_credentials)(key)
+        return user
+    ticket = request.GET.get('ticket')
+    if not ticket:
+        raise AuthenticationFailed('Las credenciales de autenticación no se proveyeron.')
+    clave = _clave_ticket(ticket)
+    user_id = await cache.aget(clave)
+    # Only the request that manages to delete the ticket gets to use it
+    if user_id is None or not await cache.adelete(clave):
+        raise AuthenticationFailed('Ticket inválido o caducado.')
+    user = await CustomUser.objects.filter(pk=user_id, is_active=True).afirst()
+    if user is None:
+        raise AuthenticationFailed('Usuario inactivo o eliminado.')
+    return user
+
+
+def _evento_sse(numero, evento):
+    datos = json.dumps(evento, ensure_ascii=False, separators=(',', ':'))
+    return f"id: {numero}\nevent: {evento['tipo']}\ndata: {datos}\n\n"
+
+
+@require_GET
+async def eventos_peticiones(request):
+    """
+    Server-Sent Events stream with the changes of the company's peticiones
+    (see peticiones.eventos). Only served under ASGI: each open connection is a
+    coroutine waiting on the broker, with no database access after authentication.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Los eventos en directo solo están disponibles en el servidor ASGI.'}, status=501)
+
+    try:
+        user = await _usuario_eventos(request)
+    except AuthenticationFailed as e:
+        return JsonResponse({'error': str(e.detail)}, status=401)
+    if user.tipo != 'EMPRESA':
+        return JsonResponse({'error': 'Solo las empresas pueden suscribirse a sus peticiones.'}, status=403)
+
+    keepalive = settings.PETICIONES_EVENTOS_KEEPALIVE
+
+    async def stream():
+        async with get_broker().subscribe(canal_empresa(user.pk)) as siguiente:
+            # Sent once subscribed: the dashboard (re)loads its list on this event,
+            # so nothing changed between that load and the first pushed event is missed.
+            yield f'retry: {keepalive * 1000}\nevent: conectado\ndata: {{}}\n\n'
+            numero = 0
+            while True:
+                try:
+                    evento = await asyncio.wait_for(siguiente(), keepalive)
+                except asyncio.TimeoutError:
+                    # Comment line: keeps proxies from closing an idle connection
+                    yield ': ping\n\n'
+                    continue
+                numero += 1
+                yield _evento_sse(numero, evento)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: send each event as soon as it is written
+    return response
@@ -0,0 +1,150 @@
+"""
+Autenticación por token con caché.
+
+`CachedTokenAuthentication` evita la consulta Token + CustomUser en cada
+petición guardando el resultado en dos niveles:
+
+1. Un LRU en memoria del proceso, con TTL corto (AUTH_TOKEN_CACHE_LOCAL_TTL).
+2. Opcionalmente, una caché compartida de Django (AUTH_TOKEN_CACHE, p. ej. Redis),
+   con TTL más largo (AUTH_TOKEN_CACHE_TTL).
+
+Las entradas se invalidan al borrar el token (logout) o al guardar el usuario
+(ver usuarios.signals). La invalidación del LRU solo alcanza al proceso que la
+ejecuta; en el resto de workers la entrada caduca con su TTL.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+
+
+class LRUCache:
+    """LRU con TTL, seguro entre hilos."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_local = LRUCache(
+    maxsize=getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'AUTH_TOKEN_CACHE_LOCAL_TTL', 30),
+)
+
+
+def _shared_cache():
+    alias = getattr(settings, 'AUTH_TOKEN_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def _token_key(key):
+    return f'authtoken:token:{key}'
+
+
+def _user_key(user_id):
+    return f'authtoken:usuario:{user_id}'
+
+
+def invalidate_token(key):
+    _local.delete(_token_key(key))
+    shared = _shared_cache()
+    if shared is not None:
+        shared.delete(_token_key(key))
+
+
+def invalidate_user(user_id):
+    """
+    Invalida el token cacheado de un usuario (si lo hay). La entrada usuario ->
+    token puede haber salido del LRU antes que la del token (los aciertos solo
+    renuevan la del token), así que también se busca el token en la base de datos.
+    """
+    shared = _shared_cache()
+    keys = {_local.get(_user_key(user_id))}
+    if shared is not None:
+        keys.add(shared.get(_user_key(user_id)))
+    keys.update(Token.objects.filter(user_id=user_id).values_list('key', flat=True))
+    _local.delete(_user_key(user_id))
+    if shared is not None:
+        shared.delete(_user_key(user_id))
+    for key in keys - {None}:
+        invalidate_token(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication de DRF con caché de (usuario, token) por clave de token."""
+
+    def authenticate_credentials(self, key):
+        cache_key = _token_key(key)
+        cached = _local.get(cache_key)
+        if cached is None:
+            shared = _shared_cache()
+            if shared is not None:
+                cached = shared.get(cache_key)
+                if cached is not None:
+                    _local.set(cache_key, cached)
+            if cached is None:
+                # Raises AuthenticationFailed for unknown tokens or inactive users
+                cached = super().authenticate_credentials(key)
+                user = cached[0]
+                _local.set(cache_key, cached)
+                _local.set(_user_key(user.pk), key)
+                if shared is not None:
+                    ttl = getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 300)
+                    shared.set(cache_key, cached, ttl)
+                    shared.set(_user_key(user.pk), key, ttl)
+        # Cada petición recibe su propia copia: las vistas pueden modificar request.user
+        return copy.deepcopy(cached)
+
+    async def aauthenticate(self, request):
+        """
+        authenticate() para vistas asíncronas (adoptaapi.asincrono): si el token
+        está en el LRU del proceso no sale del bucle de eventos; si no, la
+        consulta se hace en un hilo.
+        """
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        try:
+            key = auth[1].decode() if len(auth) == 2 else None
+        except UnicodeError:
+            key = None
+        cached = _local.get(_token_key(key)) if key else None
+        if cached is not None:
+            return copy.deepcopy(cached)
+        # Incluye los casos de cabecera mal formada, para dar los mismos errores
+        return await sync_to_async(self.authenticate)(request)
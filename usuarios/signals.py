@@ -0,0 +1,19 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from adoptaapi.versiones import bump
+from .authentication import invalidate_token, invalidate_user
+from .models import CustomUser
+
+
+@receiver(post_delete, sender=Token)
+def invalidar_token_borrado(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidar_token_usuario(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+    bump(f'usuario:{instance.pk}')  # ETag del perfil (UserProfileView)
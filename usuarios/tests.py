@@ -1,3 +1,76 @@
-from django.test import TestCase
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient, APIRequestFactory
 
-# Create your tests here.
+from .authentication import CachedTokenAuthentication, _local, _user_key
+from .models import CustomUser
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Ningún acierto de la caché de tokens debe sobrevivir al logout, al borrado del token o a la desactivación."""
+
+    def setUp(self):
+        _local.clear()
+        self.addCleanup(_local.clear)
+        self.user = CustomUser.objects.create_user(
+            username='adoptante@example.com', email='adoptante@example.com', password='secreta', tipo='USUARIO'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def _perfil(self):
+        return self.client.get('/api/auth/profile/').status_code
+
+    def _autenticar(self):
+        return CachedTokenAuthentication().authenticate_credentials(self.token.key)
+
+    def test_segunda_autenticacion_sin_consultas(self):
+        self._autenticar()
+        with self.assertNumQueries(0):
+            user, token = self._autenticar()
+        self.assertEqual((user.pk, token.key), (self.user.pk, self.token.key))
+
+    def test_logout(self):
+        self.assertEqual(self._perfil(), 200)
+        self.assertEqual(self.client.post('/api/auth/logout/').status_code, 200)
+        self.assertEqual(self._perfil(), 401)
+
+    def test_borrar_el_token(self):
+        self.assertEqual(self._perfil(), 200)
+        Token.objects.filter(user=self.user).delete()
+        self.assertEqual(self._perfil(), 401)
+
+    def test_desactivar_el_usuario(self):
+        self.assertEqual(self._perfil(), 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self._perfil(), 401)
+
+    def test_desactivar_aunque_el_lru_haya_expulsado_la_entrada_del_usuario(self):
+        self._autenticar()
+        _local.delete(_user_key(self.user.pk))
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self._autenticar()
+
+    def test_ruta_asincrona(self):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        aauthenticate = async_to_sync(CachedTokenAuthentication().aauthenticate)
+        self.assertEqual(aauthenticate(request)[0].pk, self.user.pk)
+        self.token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            aauthenticate(request)
+
+    @override_settings(AUTH_TOKEN_CACHE='default')
+    def test_cache_compartida(self):
+        self._autenticar()
+        self.user.is_active = False
+        self.user.save()
+        # Otro proceso, con su LRU vacío, solo tiene la caché compartida
+        _local.clear()
+        with self.assertRaises(AuthenticationFailed):
+            self._autenticar()
@@ -14,7 +14,8 @@ from usuarios.models import CustomUser
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
-from django.core.mail import send_mail
+from correos.cola import encolar_correo
+from adoptaapi.condicional import ConditionalGetMixin
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.urls import reverse
@@ -377,13 +378,17 @@ class UserLogoutView(generics.CreateAPIView):
         return Response({"message": "Cierre de sesión exitoso."}, status=status.HTTP_200_OK)
 
 
-class UserProfileView(generics.RetrieveUpdateAPIView):
+class UserProfileView(ConditionalGetMixin, generics.RetrieveUpdateAPIView):
     """
     API view for retrieving and updating the authenticated user's profile.
+    GET supports If-None-Match (304 while the profile is unchanged).
     """
     serializer_class = UserDetailSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_version_scopes(self):
+        return (f'usuario:{self.request.user.pk}',)  # bumped by usuarios.signals
+
     def get_object(self):
         return self.request.user
 
@@ -497,44 +502,22 @@ class PasswordResetRequestView(generics.GenericAPIView):
             'site_name': 'AdoptaAPI'
         }
         
-        try:
-            # Usar nuestros templates personalizados con la ruta correcta
-            email_html_message = render_to_string('registration/password_reset_email.html', context)
-            email_plain_message = render_to_string('registration/password_reset_email.txt', context)
-            
-            # Print debug information
-            print(f"\nAttempting to send email to: {email}")
-            print(f"From: {settings.EMAIL_HOST_USER}")
-            print(f"Reset URL: {frontend_url}")
-            
-            send_mail(
-                'Reseteo de contraseña - AdoptaAPI',
-                email_plain_message,
-                settings.EMAIL_HOST_USER,
-                [email],
-                html_message=email_html_message,
-                fail_silently=False,
-            )
-            return Response(
-                {'message': 'Si el email existe, recibirás instrucciones para resetear tu contraseña'},
-                status=status.HTTP_200_OK
-            )
-        except Exception as e:
-            # Print detailed error information
-            print(f"\nError sending email:")
-            print(f"Error type: {type(e).__name__}")
-            print(f"Error message: {str(e)}")
-            print(f"Email settings:")
-            print(f"  HOST: {settings.EMAIL_HOST}")
-            print(f"  PORT: {settings.EMAIL_PORT}")
-            print(f"  USE_TLS: {settings.EMAIL_USE_TLS}")
-            print(f"  HOST_USER: {settings.EMAIL_HOST_USER}")
-            print(f"  HOST_PASSWORD: {'*' * len(settings.EMAIL_HOST_PASSWORD) if settings.EMAIL_HOST_PASSWORD else 'Not set'}")
-            
-            return Response(
-                {'error': f'Error al enviar el email: {str(e)}'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        # Usar nuestros templates personalizados con la ruta correcta
+        email_html_message = render_to_string('registration/password_reset_email.html', context)
+        email_plain_message = render_to_string('registration/password_reset_email.txt', context)
+
+        # El email se encola y lo envía el worker enviar_correos, fuera de la petición
+        encolar_correo(
+            'Reseteo de contraseña - AdoptaAPI',
+            email_plain_message,
+            [email],
+            remitente=settings.EMAIL_HOST_USER,
+            cuerpo_html=email_html_message,
+        )
+        return Response(
+            {'message': 'Si el email existe, recibirás instrucciones para resetear tu contraseña'},
+            status=status.HTTP_200_OK
+        )
 
 class PasswordResetVerifyView(generics.GenericAPIView):
     """